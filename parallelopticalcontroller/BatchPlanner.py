@@ -0,0 +1,178 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+[CHAFI-THESIS-START]
+Batch Planner Module for Parallel Optical Controller
+
+Plans many lightpath demands against one topology snapshot (BatchProvision).
+The planner works on a private copy of the snapshot's links, cache and graph
+views: every successful RSA provisionally reserves its slots and links in
+that copy, so later demands of the batch see what earlier ones took. The
+shared snapshot is only patched after the batch has been written to Context.
+The copy is taken without the manager lock: a published snapshot is never
+modified (patches install a new version), so it cannot change mid-copy.
+
+Classes:
+    - BatchPlanner: Sorts demands and runs path + RSA with provisional reservations
+[CHAFI-THESIS-END]
+"""
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import networkx as nx
+
+from .RSA import get_required_bandwidth, DEFAULT_MODULATION, DEFAULT_ROLL_OFF_FACTOR
+from .Metrics import record_rsa_result, timed_phase
+from .RSAHelper import TopologyHelper, TRACE_LEVEL_NONE
+from .SlotAcquisition import allocation_endpoint_masks, get_link_uuid
+from .topology import find_paths
+
+LOGGER = logging.getLogger(__name__)
+
+# [CHAFI-THESIS] Order in which the demands of a batch are planned
+SORT_POLICY_NONE = 'none'                              # request order
+SORT_POLICY_LARGEST_FIRST = 'largest_first'            # highest bitrate first
+SORT_POLICY_LONGEST_PATH_FIRST = 'longest_path_first'  # most shortest-path hops first
+SORT_POLICIES = (SORT_POLICY_NONE, SORT_POLICY_LARGEST_FIRST, SORT_POLICY_LONGEST_PATH_FIRST)
+DEFAULT_SORT_POLICY = SORT_POLICY_LARGEST_FIRST
+
+
+class BatchPlanner:
+    """
+    [CHAFI-THESIS] Runs path finding and RSA for a batch of demands on a working copy.
+
+    Attributes:
+        snapshot: TopologySnapshot the batch is planned against
+        optical_links: Deep copy of the snapshot's enriched links (mutated by reservations)
+        cache: OpticalLinksCache over optical_links
+        views: GraphViews over a copy of the snapshot graph
+        held_masks: Slots reserved by other requests (see ReservationLedger.held_masks())
+    """
+
+    def __init__(self, snapshot, held_masks: Optional[Dict[str, int]] = None):
+        self.snapshot = snapshot
+        self.held_masks = held_masks or {}
+        # Published snapshots are immutable: no lock needed to copy one
+        working_copy = snapshot.copy(snapshot.version)
+        self.optical_links = working_copy.optical_links
+        self.cache = working_copy.cache
+        self.views = working_copy.views
+
+    def sort_demands(self, demands: List[Dict], policy: str = DEFAULT_SORT_POLICY) -> List[int]:
+        """
+        Returns the positions of demands in planning order (ties keep request order).
+
+        Demands without a path are planned last under SORT_POLICY_LONGEST_PATH_FIRST.
+        """
+        positions = list(range(len(demands)))
+        if policy == SORT_POLICY_LARGEST_FIRST:
+            positions.sort(key=lambda i: -float(demands[i].get('bitrate', 100) or 0))
+        elif policy == SORT_POLICY_LONGEST_PATH_FIRST:
+            hops = [self._shortest_hops(demand) for demand in demands]
+            positions.sort(key=lambda i: -hops[i])
+        return positions
+
+    def _shortest_hops(self, demand: Dict) -> int:
+        """Hop count of the shortest free path of a demand (-1 if none)."""
+        try:
+            return nx.shortest_path_length(
+                self.views.G_simple_free, source=demand.get('src'), target=demand.get('dst'))
+        except (nx.NetworkXNoPath, nx.NodeNotFound):
+            return -1
+
+    def plan_demand(self, demand: Dict, trace_level: str = TRACE_LEVEL_NONE) -> Dict:
+        """
+        Finds paths and runs RSA for one demand, stopping at the first path that fits.
+
+        The dijkstra path is tried first, then the alternative paths in
+        hop-count order. A successful result is reserved in the working copy.
+
+        Args:
+            demand: Lightpath parameters (src, dst, src_index, dst_index, bitrate, ...)
+            trace_level: RSA trace verbosity
+
+        Returns:
+            dict: bandwidth_result, paths_info, dijkstra_rsa_result, and 'selected'
+                  ({'path_type', 'path_index', 'rsa_result'}) or None if nothing fits
+        """
+        bandwidth_result = get_required_bandwidth(
+            bitrate=demand.get('bitrate', 100),
+            modulation=DEFAULT_MODULATION,
+            roll_off_factor=DEFAULT_ROLL_OFF_FACTOR
+        )
+        bandwidth = bandwidth_result['required_slots_ceil'] * bandwidth_result['slot_granularity_ghz']
+
+        paths_result = find_paths(
+            demand.get('src'), demand.get('src_index'), demand.get('dst'), demand.get('dst_index'),
+            additional_hops=demand.get('additional_hops', 0), views=self.views,
+            k_paths=demand.get('k_paths'))
+        paths_info = {
+            "dijkstra": paths_result.get('dijkstra', []),
+            "all_paths": paths_result.get('all_paths', []),
+            "error": paths_result.get('error')
+        }
+
+        planned = {
+            'bandwidth_result': bandwidth_result,
+            'paths_info': paths_info,
+            'dijkstra_rsa_result': {"success": False, "error": "No dijkstra path found", "failure_reason": "no_path"},
+            'selected': None
+        }
+
+        candidates = [('dijkstra', None, path) for path in paths_info['dijkstra'][:1]]
+        candidates += [("alternative_{}".format(i), i, path) for i, path in enumerate(paths_info['all_paths'])]
+
+        rsa_result = planned['dijkstra_rsa_result']
+        for path_type, path_index, path_obj in candidates:
+            with timed_phase('rsa'):
+                rsa_result = TopologyHelper.perform_rsa(
+                    path_obj=path_obj, bandwidth=bandwidth, cache=self.cache, trace_level=trace_level,
+                    held_masks=self.held_masks, spectrum_policy=demand.get('spectrum_policy'),
+                    preferred_band=demand.get('preferred_band'))
+            if rsa_result is None:
+                rsa_result = {"success": False, "error": "perform_rsa returned None"}
+            if path_index is None:
+                planned['dijkstra_rsa_result'] = rsa_result
+            if rsa_result.get('success'):
+                self.reserve(rsa_result)
+                planned['selected'] = {
+                    'path_type': path_type,
+                    'path_index': path_index,
+                    'rsa_result': rsa_result
+                }
+                break
+
+        # One outcome per demand: the selected result, or the last path that did not fit
+        record_rsa_result(rsa_result)
+        return planned
+
+    def reserve(self, rsa_result: Dict) -> Tuple[List[str], Dict[str, int]]:
+        """
+        Provisionally reserves a successful RSA result in the working copy.
+
+        Returns:
+            tuple: (used_link_uuids, endpoint_masks) as later passed to apply_acquisition()
+        """
+        used_link_uuids = [uuid for uuid in (get_link_uuid(link) for link in rsa_result.get('links', [])) if uuid]
+        endpoint_masks = allocation_endpoint_masks(rsa_result)
+
+        for link_uuid in used_link_uuids:
+            self.views.set_link_used(link_uuid, True)
+            self.cache.set_link_used(link_uuid, True)
+        for endpoint_uuid, native_mask in endpoint_masks.items():
+            self.cache.clear_endpoint_slots(endpoint_uuid, native_mask)
+
+        return used_link_uuids, endpoint_masks
@@ -0,0 +1,134 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+[CHAFI-THESIS-START]
+ContextClient Pool for Parallel Optical Controller
+
+Keeps a small set of connected ContextClient instances (warm gRPC channels)
+and hands them out to helpers, so PerformRSA, snapshot builds and
+AcquireSlots do not pay a TCP/HTTP2 handshake per call.
+
+Usage:
+    with CONTEXT_CLIENT_POOL.client() as ctx_client:
+        ctx_client.ListDevices(Empty())
+[CHAFI-THESIS-END]
+"""
+
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, List
+
+from context.client.ContextClient import ContextClient
+
+LOGGER = logging.getLogger(__name__)
+
+# [CHAFI-THESIS] Maximum number of ContextClient connections kept by the pool
+CONTEXT_CLIENT_POOL_SIZE = int(os.environ.get('CONTEXT_CLIENT_POOL_SIZE', '4'))
+
+
+class ContextClientPool:
+    """
+    [CHAFI-THESIS] Bounded pool of connected ContextClient instances.
+
+    Clients are created lazily up to max_size and reused afterwards. When all
+    clients are in use, acquire() blocks until one is released. A client whose
+    caller raised is closed and replaced on demand instead of being reused.
+    """
+
+    def __init__(self, max_size: int = CONTEXT_CLIENT_POOL_SIZE,
+                 client_factory: Callable[[], ContextClient] = ContextClient):
+        self._max_size = max(1, max_size)
+        self._client_factory = client_factory
+        self._idle = []  # type: List[ContextClient]
+        self._created = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> ContextClient:
+        """Take a connected client from the pool, dialing a new one if needed."""
+        with self._cond:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._created < self._max_size:
+                    self._created += 1
+                    break
+                self._cond.wait()
+
+        # Dial outside the lock; ContextClient connects in its constructor
+        try:
+            return self._client_factory()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, ctx_client: ContextClient, discard: bool = False) -> None:
+        """Return a client to the pool, or close it if discard is True."""
+        with self._cond:
+            if discard:
+                self._created -= 1
+            else:
+                self._idle.append(ctx_client)
+            self._cond.notify()
+
+        if discard:
+            self._close_client(ctx_client)
+
+    @contextmanager
+    def client(self) -> Iterator[ContextClient]:
+        """Context manager yielding a pooled client; it must not be closed by the caller."""
+        ctx_client = self.acquire()
+        failed = True
+        try:
+            yield ctx_client
+            failed = False
+        finally:
+            self.release(ctx_client, discard=failed)
+
+    def dial(self) -> ContextClient:
+        """New client outside the pool (long-lived event streams); the caller closes it."""
+        with self._cond:
+            client_factory = self._client_factory
+        return client_factory()
+
+    def set_client_factory(self, client_factory: Callable[[], ContextClient]) -> None:
+        """Replace the factory used to dial new clients and drop the idle ones."""
+        with self._cond:
+            self._client_factory = client_factory
+        self.close_idle()
+
+    def close_idle(self) -> None:
+        """Close all idle clients (clients currently in use are not affected)."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._cond.notify_all()
+
+        for ctx_client in idle:
+            self._close_client(ctx_client)
+
+    @staticmethod
+    def _close_client(ctx_client: ContextClient) -> None:
+        try:
+            ctx_client.close()
+        except Exception as e:
+            LOGGER.warning(f"[CHAFI-POOL] Error closing ContextClient: {e}")
+
+
+# [CHAFI-THESIS] Process-wide pool shared by the controller, topology and snapshot modules
+CONTEXT_CLIENT_POOL = ContextClientPool()
@@ -0,0 +1,225 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+[CHAFI-THESIS-START]
+Lightpath Store Module for Parallel Optical Controller
+
+Keeps db_flows bounded and, with the SQLite backend, durable across restarts.
+
+db_flows stays the resident dict the endpoints work on. The store persists a
+compact record of each flow (request parameters, status, acquired path) -
+never computed paths, RSA results or traces, which are recomputed by
+PerformRSA. At startup load() rebuilds db_flows from those records in one
+query. expire() archives FAILED and PLANNED flows older than
+LIGHTPATH_TTL_SEC: they leave the resident set (and, on disk, are kept with
+archived = 1 but not reloaded). A flow's age counts from its last save() or
+touch(); requests that read a flow or run RSA on it touch it, and flows
+holding slot reservations are never archived.
+
+Backend selection (LIGHTPATH_STORE_BACKEND):
+    - memory: Nothing is persisted (previous behaviour, plus TTL)
+    - sqlite: Embedded database at LIGHTPATH_STORE_PATH
+
+Classes:
+    - LightpathStore: In-memory backend and store interface
+    - SQLiteLightpathStore: On-disk backend (sqlite3, WAL journal)
+
+Functions:
+    - compact_record: Persistable subset of a flow
+    - create_lightpath_store: Builds the backend selected by the environment
+[CHAFI-THESIS-END]
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Container, Dict, List
+
+LOGGER = logging.getLogger(__name__)
+
+# [CHAFI-THESIS] Store configuration
+LIGHTPATH_STORE_BACKEND = os.environ.get('LIGHTPATH_STORE_BACKEND', 'memory')
+LIGHTPATH_STORE_PATH = os.environ.get(
+    'LIGHTPATH_STORE_PATH', '/var/lib/parallelopticalcontroller/lightpaths.db')
+LIGHTPATH_TTL_SEC = float(os.environ.get('LIGHTPATH_TTL_SEC', '3600'))  # 0 disables archival
+LIGHTPATH_SWEEP_INTERVAL_SEC = float(os.environ.get('LIGHTPATH_SWEEP_INTERVAL_SEC', '60'))
+
+# [CHAFI-THESIS] Flow statuses that expire; ACTIVE flows stay resident until deleted, and so do
+# PARTIAL flows (a failed commit left slots allocated in Context that still need cleaning up)
+EXPIRING_STATUSES = ('PLANNED', 'FAILED')
+
+# [CHAFI-THESIS] Fields of a flow that survive a restart
+COMPACT_FIELDS = (
+    'flow_id', 'service_uuid', 'src', 'dst', 'src_index', 'dst_index', 'bitrate', 'bidir',
+    'constraint_type', 'additional_hops', 'k_paths', 'spectrum_policy', 'preferred_band',
+    'op-mode', 'slots', 'path', 'band', 'freq', 'n_slots', 'status', 'timestamp', 'updated_at', 'acquired_path_type', 'acquired_path_links'
+)
+
+
+def compact_record(flow: Dict) -> Dict:
+    """Persistable subset of a flow (COMPACT_FIELDS that are set)."""
+    return {key: flow[key] for key in COMPACT_FIELDS if key in flow}
+
+
+class LightpathStore:
+    """
+    [CHAFI-THESIS] In-memory lightpath store (base class of the persistent backends).
+
+    Persistent backends override _load_records(), _write() and _archive().
+    """
+
+    def __init__(self, ttl_sec: float = LIGHTPATH_TTL_SEC):
+        self.ttl_sec = ttl_sec
+        self._next_sweep = 0.0
+
+    def load(self) -> Dict[int, Dict]:
+        """Resident flows at startup (flow_id -> flow), read in a single pass."""
+        t_start = time.time()
+        flows = {record['flow_id']: record for record in self._load_records()}
+        if flows:
+            LOGGER.info("[CHAFI-STORE] Reloaded {} flows in {:.4f}s".format(len(flows), time.time() - t_start))
+        return flows
+
+    def max_flow_id(self) -> int:
+        """Highest flow_id ever stored (archived included), so restarted counters never reuse ids."""
+        return 0
+
+    def save(self, flow: Dict) -> None:
+        """Persist the compact record of a flow after it was created or changed status."""
+        flow['updated_at'] = time.time()
+        self._write(compact_record(flow))
+
+    def touch(self, flow: Dict) -> None:
+        """Mark a flow as in use so expire() keeps it for another ttl_sec (nothing is written)."""
+        flow['updated_at'] = time.time()
+
+    def expire(self, flows: Dict[int, Dict], now: float = None, retained: Container = ()) -> List[int]:
+        """
+        Archive PLANNED/FAILED flows not updated for ttl_sec and drop them from flows.
+
+        Scans at most once per LIGHTPATH_SWEEP_INTERVAL_SEC. The caller must
+        hold the lock that guards flows.
+
+        Args:
+            flows: Resident flows (flow_id -> flow)
+            now: Current time (defaults to time.time())
+            retained: flow_ids kept regardless of age (e.g. flows holding reservations)
+
+        Returns:
+            list: Archived flow_ids
+        """
+        now = now or time.time()
+        if not self.ttl_sec or now < self._next_sweep:
+            return []
+        self._next_sweep = now + LIGHTPATH_SWEEP_INTERVAL_SEC
+        cutoff = now - self.ttl_sec
+        expired = [flow_id for flow_id, flow in flows.items()
+                   if flow.get('status') in EXPIRING_STATUSES and flow.get('updated_at', cutoff) < cutoff
+                   and flow_id not in retained]
+        if not expired:
+            return []
+        self._archive(expired)
+        for flow_id in expired:
+            del flows[flow_id]
+        LOGGER.info("[CHAFI-STORE] Archived {} expired flows".format(len(expired)))
+        return expired
+
+    def close(self) -> None:
+        pass
+
+    def _load_records(self) -> List[Dict]:
+        return []
+
+    def _write(self, record: Dict) -> None:
+        pass
+
+    def _archive(self, flow_ids: List[int]) -> None:
+        pass
+
+
+class SQLiteLightpathStore(LightpathStore):
+    """
+    [CHAFI-THESIS] Lightpath store backed by an embedded SQLite database.
+
+    One connection is shared by the request threads and serialized by a lock;
+    every write is a single-row upsert.
+    """
+
+    def __init__(self, path: str = LIGHTPATH_STORE_PATH, ttl_sec: float = LIGHTPATH_TTL_SEC):
+        super().__init__(ttl_sec)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS lightpaths ('
+            ' flow_id INTEGER PRIMARY KEY,'
+            ' status TEXT NOT NULL,'
+            ' updated_at REAL NOT NULL,'
+            ' archived INTEGER NOT NULL DEFAULT 0,'
+            ' record TEXT NOT NULL)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS lightpaths_archived ON lightpaths (archived)')
+
+    def max_flow_id(self) -> int:
+        with self._lock:
+            row = self._conn.execute('SELECT MAX(flow_id) FROM lightpaths').fetchone()
+        return row[0] or 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _load_records(self) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT record FROM lightpaths WHERE archived = 0 ORDER BY flow_id').fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def _write(self, record: Dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO lightpaths (flow_id, status, updated_at, archived, record) VALUES (?, ?, ?, 0, ?) '
+                'ON CONFLICT(flow_id) DO UPDATE SET status = excluded.status, '
+                'updated_at = excluded.updated_at, archived = 0, record = excluded.record',
+                (record['flow_id'], record.get('status', ''), record['updated_at'], json.dumps(record)))
+
+    def _archive(self, flow_ids: List[int]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                'UPDATE lightpaths SET archived = 1 WHERE flow_id = ?', [(flow_id,) for flow_id in flow_ids])
+
+
+def create_lightpath_store() -> LightpathStore:
+    """Backend selected by LIGHTPATH_STORE_BACKEND (falls back to memory if SQLite cannot open)."""
+    if LIGHTPATH_STORE_BACKEND == 'sqlite':
+        try:
+            return SQLiteLightpathStore(LIGHTPATH_STORE_PATH)
+        except Exception as e:
+            LOGGER.error("[CHAFI-STORE] Cannot open {}: {}; flows will not persist".format(LIGHTPATH_STORE_PATH, e))
+    elif LIGHTPATH_STORE_BACKEND != 'memory':
+        LOGGER.warning("[CHAFI-STORE] Unknown LIGHTPATH_STORE_BACKEND '{}', using memory".format(
+            LIGHTPATH_STORE_BACKEND))
+    return LightpathStore()
+
+
+# [CHAFI-THESIS] Process-wide store backing db_flows
+LIGHTPATH_STORE = create_lightpath_store()
@@ -0,0 +1,144 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+[CHAFI-THESIS-START]
+Metrics Module for Parallel Optical Controller
+
+Prometheus metrics served on /metrics (text exposition format), so per-phase
+p50/p99 latencies come from histogram_quantile() instead of the
+[CHAFI-TIMING] log lines.
+
+    poc_phase_duration_seconds{phase}        devices, links, graph, routes, dijkstra,
+                                             all_paths, rsa, acquisition
+    poc_rsa_results_total{outcome, reason}   success, or failure by reason
+                                             (no_path, no_spectrum, contended, error)
+    poc_snapshot_rebuilds_total              topology snapshot builds
+    poc_cache_lookups_total{cache, result}   hit/miss per registered cache
+    poc_db_flows, poc_reservations           resident flows / slot reservations
+    process_resident_memory_bytes            from prometheus_client's process collector
+
+Durations are measured with time.perf_counter(). Hot-path caches keep plain
+integer counters that are only read at scrape time (register_cache_stats()).
+This module imports nothing from the controller, so any module can use it.
+
+Functions:
+    - timed_phase: Context manager observing a phase duration
+    - observe_phase: Observe an already measured phase duration
+    - disable_phase_observation: Stop observing phases (RSA worker processes)
+    - record_rsa_result: Count an RSA outcome
+    - register_cache_stats: Expose a cache's (hits, misses) counters
+    - set_gauge_function: Bind a gauge to a callable evaluated at scrape time
+    - render_metrics: Prometheus text exposition of the registry
+[CHAFI-THESIS-END]
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily
+
+# [CHAFI-THESIS] From 100 us (cached RSA) to 30 s (cold snapshot build)
+PHASE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PHASE_DURATION = Histogram(
+    'poc_phase_duration_seconds', 'Duration of controller phases', ['phase'], buckets=PHASE_BUCKETS)
+RSA_RESULTS = Counter(
+    'poc_rsa_results_total', 'RSA computations by outcome and failure reason', ['outcome', 'reason'])
+SNAPSHOT_REBUILDS = Counter(
+    'poc_snapshot_rebuilds_total', 'Topology snapshot builds')
+DB_FLOWS = Gauge('poc_db_flows', 'Resident flows in db_flows')
+RESERVATIONS = Gauge('poc_reservations', 'Active slot reservations')
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# [CHAFI-THESIS] False in RSA worker processes: nothing scrapes them, the front observes their timings
+_observe_phases = True
+
+
+@contextmanager
+def timed_phase(phase: str):
+    """Observe the duration of the with-block as poc_phase_duration_seconds{phase}."""
+    t_start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_phase(phase, time.perf_counter() - t_start)
+
+
+def observe_phase(phase: str, seconds: float) -> None:
+    """Observe a phase duration measured elsewhere (e.g. find_paths() timing)."""
+    if _observe_phases:
+        PHASE_DURATION.labels(phase=phase).observe(seconds)
+
+
+def disable_phase_observation() -> None:
+    """
+    Turn timed_phase()/observe_phase() into no-ops for this process.
+
+    Called in forked RSA workers: their registry is never scraped, and a
+    metric lock held by a front thread at fork time stays held in the copy.
+    """
+    global _observe_phases
+    _observe_phases = False
+
+
+def record_rsa_result(rsa_result: Optional[Dict]) -> None:
+    """Count an RSA result; failures are labelled with rsa_result['failure_reason'] (default: error)."""
+    if rsa_result and rsa_result.get('success'):
+        RSA_RESULTS.labels(outcome='success', reason='').inc()
+    else:
+        reason = (rsa_result or {}).get('failure_reason') or 'error'
+        RSA_RESULTS.labels(outcome='failure', reason=reason).inc()
+
+
+class _CacheStatsCollector:
+    """Reads registered (hits, misses) callables at scrape time."""
+
+    def __init__(self):
+        self._sources = {}  # type: Dict[str, Callable[[], Tuple[int, int]]]
+
+    def register(self, cache: str, stats: Callable[[], Tuple[int, int]]) -> None:
+        self._sources[cache] = stats
+
+    def collect(self):
+        family = CounterMetricFamily(
+            'poc_cache_lookups', 'Cache lookups by cache and result', labels=['cache', 'result'])
+        for cache, stats in self._sources.items():
+            hits, misses = stats()
+            family.add_metric([cache, 'hit'], hits)
+            family.add_metric([cache, 'miss'], misses)
+        yield family
+
+
+_CACHE_STATS = _CacheStatsCollector()
+REGISTRY.register(_CACHE_STATS)
+
+
+def register_cache_stats(cache: str, stats: Callable[[], Tuple[int, int]]) -> None:
+    """Expose a cache as poc_cache_lookups_total{cache, result=hit|miss}."""
+    _CACHE_STATS.register(cache, stats)
+
+
+def set_gauge_function(gauge: Gauge, function: Callable[[], float]) -> None:
+    """Evaluate function at scrape time for gauge."""
+    gauge.set_function(function)
+
+
+def render_metrics() -> bytes:
+    """Prometheus text exposition of all registered metrics."""
+    return generate_latest(REGISTRY)
@@ -17,8 +17,9 @@
 # [CHAFI-THESIS-END]
 
 import logging
+import threading
 import time
-from flask import Flask, request
+from flask import Flask, Response, request
 from flask_restplus import Resource, Api
 
 # [CHAFI-THESIS-START] - Import RSA Helper Module
@@ -26,26 +27,38 @@ from .RSA import get_required_bandwidth, DEFAULT_MODULATION, DEFAULT_ROLL_OFF_FA
 # [CHAFI-THESIS-END]
 
 # [CHAFI-THESIS-START] - Import Topology Module for NetworkX graph building
-from .topology import build_graph, fetch_optical_links_for_rsa, find_paths
+from .topology import find_paths
+from .TopologySnapshot import SNAPSHOT_MANAGER
 # [CHAFI-THESIS-END]
 
 # [CHAFI-THESIS-START] - Import RSAHelper for spectrum assignment computation
-from .RSAHelper import OpticalLinksCache, TopologyHelper
+from .RSAHelper import TopologyHelper, TRACE_LEVELS, TRACE_LEVEL_NONE, DEFAULT_TRACE_LEVEL
 # [CHAFI-THESIS-END]
 
 
-# [CHAFI-THESIS-START] - Import ContextClient for DB updates
-from context.client.ContextClient import ContextClient
+# [CHAFI-THESIS-START] - Pooled ContextClient connections for DB updates
+from .ContextClientPool import CONTEXT_CLIENT_POOL
+from .SlotAcquisition import (
+    SlotConflictError, allocation_endpoint_masks, get_link_uuid, group_acquisition_by_device,
+    mark_links_and_activate_services, prepare_device_allocations, prepare_device_release
+)
+from .BatchPlanner import BatchPlanner, SORT_POLICIES, DEFAULT_SORT_POLICY
+from .ReservationLedger import RESERVATION_LEDGER, RESERVATION_MAX_ATTEMPTS
+from .LightpathStore import LIGHTPATH_STORE
+from .SpectrumPolicy import SPECTRUM_POLICIES, DEFAULT_SPECTRUM_POLICY
+from .RSAContext import RSA_CONTEXTS, candidate_paths, evaluate_paths
+from .Replay import REQUEST_RECORDER
+from .RSAWorkerPool import RSA_WORKER_POOL
+from .PathCache import PATH_CACHE
+from .SnapshotEvents import SNAPSHOT_EVENTS, SNAPSHOT_SUBSCRIBER
+from common.ITUStandards import FreqeuncyRanges
+from .Metrics import (
+    CONTENT_TYPE, DB_FLOWS, RESERVATIONS, observe_phase, record_rsa_result, render_metrics,
+    set_gauge_function, timed_phase
+)
 # [CHAFI-THESIS-END]
 
-# [CHAFI-THESIS-START] - Import Common Proto and Tools
-from common.proto.context_pb2 import (
-    OpticalConfig, OpticalConfigId, Empty, ServiceId,
-    ServiceStatusEnum, ContextId, LinkId
-)
-from common.tools.context_queries.OpticalConfig import opticalconfig_uuid_get_duuid
-from common.DeviceTypes import DeviceTypeEnum
-import json
+# [CHAFI-THESIS-START] - Import Common Tools
 import traceback
 # [CHAFI-THESIS-END]
 
@@ -72,8 +85,314 @@ optical = api.namespace('ParallelOpticalTFS',
 
 # [CHAFI-THESIS-START] - In-memory storage for lightpaths (similar to opticalcontroller's rsa.db_flows)
 # Storage structure mirrors opticalcontroller for compatibility
-db_flows = {}  # flow_id -> lightpath data
-flow_counter = 0  # Auto-increment flow ID
+# [CHAFI-THESIS] Resident flows are reloaded from LIGHTPATH_STORE (warm restart, compact records)
+db_flows = LIGHTPATH_STORE.load()  # flow_id -> lightpath data
+flow_counter = max(max(db_flows, default=0), LIGHTPATH_STORE.max_flow_id())  # Auto-increment flow ID
+FLOWS_LOCK = threading.Lock()  # guards flow_counter and insertions into db_flows
+set_gauge_function(DB_FLOWS, lambda: len(db_flows))
+set_gauge_function(RESERVATIONS, lambda: len(RESERVATION_LEDGER))
+# [CHAFI-THESIS-END]
+
+
+# [CHAFI-THESIS-START] - RSA trace verbosity from the query string
+def get_trace_level():
+    """Return ?trace_level=none|summary|full (default DEFAULT_TRACE_LEVEL), or None if invalid."""
+    trace_level = request.args.get('trace_level', DEFAULT_TRACE_LEVEL)
+    return trace_level if trace_level in TRACE_LEVELS else None
+# [CHAFI-THESIS-END]
+
+
+# [CHAFI-THESIS-START] - Response projection (?view=full|compact and ?fields=a,b,c)
+VIEW_FULL = 'full'
+VIEW_COMPACT = 'compact'
+RESPONSE_VIEWS = (VIEW_FULL, VIEW_COMPACT)
+LIGHTPATH_FILTERS = ('status', 'src', 'dst', 'service_uuid')
+
+
+def get_response_view():
+    """Return (view, fields) from ?view= and ?fields=, or (None, None) if view is invalid."""
+    view = request.args.get('view', VIEW_FULL)
+    if view not in RESPONSE_VIEWS:
+        return None, None
+    fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+    return view, fields or None
+
+
+def project_fields(payload, fields):
+    """Keep only the requested top-level keys of a response (all of them if fields is None)."""
+    if not fields:
+        return payload
+    return {key: payload[key] for key in fields if key in payload}
+
+
+def compact_rsa_result(rsa_result):
+    """What ServiceService needs from an RSA result: slots, band and link ids."""
+    if not rsa_result:
+        return rsa_result
+    band_info = rsa_result.get('band_info') or {}
+    return {
+        "success": rsa_result.get('success', False),
+        "error": rsa_result.get('error'),
+        "num_slots": rsa_result.get('num_slots'),
+        "start_slot": rsa_result.get('start_slot'),
+        "end_slot": rsa_result.get('end_slot'),
+        "reference_slots": rsa_result.get('reference_slots'),
+        "band": band_info.get('band_name'),
+        "link_ids": [get_link_uuid(link) for link in rsa_result.get('links', [])],
+        "reservation_id": rsa_result.get('reservation_id')
+    }
+
+
+def compact_flow(flow):
+    """Identity, status and acquired link ids of a flow (no paths, RSA results or traces)."""
+    return {
+        "flow_id": flow.get('flow_id'),
+        "service_uuid": flow.get('service_uuid'),
+        "src": flow.get('src'),
+        "dst": flow.get('dst'),
+        "src_index": flow.get('src_index'),
+        "dst_index": flow.get('dst_index'),
+        "bitrate": flow.get('bitrate'),
+        "status": flow.get('status'),
+        "snapshot_version": flow.get('snapshot_version'),
+        "acquired_path_type": flow.get('acquired_path_type'),
+        "acquired_link_ids": [get_link_uuid(link) for link in flow.get('acquired_path_links') or []]
+    }
+
+
+def render_flow(flow, view, fields):
+    """Flow as returned by GetLightpath(s) for the requested view and fields."""
+    return project_fields(compact_flow(flow) if view == VIEW_COMPACT else flow, fields)
+# [CHAFI-THESIS-END]
+
+
+# [CHAFI-THESIS-START] - Lightpath registration (shared by AddLightpath and BatchProvision)
+def create_flow(data):
+    """
+    Store a new PLANNED lightpath in db_flows and return its flow_id.
+
+    Args:
+        data: Lightpath parameters (see AddLightpath for the accepted keys)
+    """
+    global flow_counter
+
+    src = data.get("src", "unknown")
+    dst = data.get("dst", "unknown")
+    src_index = data.get("src_index", "")
+    dst_index = data.get("dst_index", "")
+    bitrate = data.get("bitrate", 100)
+    bidir = data.get("bidir", 0)
+    constraint_type = data.get("constraint_type", "flexi_grid")
+    # [CHAFI-PARALLEL-OPTICAL] Extract service_uuid
+    service_uuid = data.get("service_uuid", "")
+    # [CHAFI-THESIS] Extract additional_hops (0 = use default in topology.py)
+    additional_hops = data.get("additional_hops", 0)
+    # [CHAFI-THESIS] Extract k_paths (None = use default in topology.py)
+    k_paths = data.get("k_paths")
+    # [CHAFI-THESIS] Spectrum assignment policy (see SpectrumPolicy.py)
+    spectrum_policy = data.get("spectrum_policy") or DEFAULT_SPECTRUM_POLICY
+    preferred_band = data.get("preferred_band")
+
+    # [CHAFI-THESIS] Store lightpath in db_flows (structure matches opticalcontroller)
+    # Status options: PLANNED (initial), ACTIVE (RSA success), FAILED (RSA failed)
+    flow = {
+        "flow_id": None,
+        # [CHAFI-PARALLEL-OPTICAL] Store service_uuid
+        "service_uuid": service_uuid,
+        "src": src,
+        "dst": dst,
+        "src_index": src_index,
+        "dst_index": dst_index,
+        "bitrate": bitrate,
+        "bidir": bidir,
+        "constraint_type": constraint_type,
+        "additional_hops": additional_hops,  # [CHAFI-THESIS] Dynamic hop limit
+        "k_paths": k_paths,  # [CHAFI-THESIS] Alternative path search bound
+        "spectrum_policy": spectrum_policy,  # [CHAFI-THESIS] Start slot selection policy
+        "preferred_band": preferred_band,    # [CHAFI-THESIS] Band for band_preferring
+        # RSA results (placeholder - TODO: implement custom RSA)
+        "op-mode": 0,  # 0 = pending, 1 = success, -1 = failed
+        "slots": [],
+        "path": [],
+        "band": 0,
+        "freq": 0,
+        "n_slots": 0,
+        "status": "PLANNED",  # PLANNED | ACTIVE | FAILED | PARTIAL (slots left allocated by a failed commit)
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+    # [CHAFI-THESIS] Generate flow ID (auto-increment like opticalcontroller)
+    reserved_flow_ids = RESERVATION_LEDGER.flow_ids()
+    with FLOWS_LOCK:
+        flow_counter += 1
+        flow_id = flow_counter
+        flow["flow_id"] = flow_id
+        db_flows[flow_id] = flow
+        # [CHAFI-THESIS] Keep the resident set bounded: archive stale PLANNED/FAILED flows
+        expired_flow_ids = LIGHTPATH_STORE.expire(db_flows, retained=reserved_flow_ids)
+
+    for expired_flow_id in expired_flow_ids:
+        RESERVATION_LEDGER.release_flow(expired_flow_id)
+        RSA_CONTEXTS.discard(expired_flow_id)
+    LIGHTPATH_STORE.save(flow)
+
+    return flow_id
+
+
+def touch_flow(flow_id):
+    """Flow of flow_id, refreshed so expiry keeps it while a request works on it (None if unknown)."""
+    with FLOWS_LOCK:
+        flow = db_flows.get(flow_id)
+        if flow is not None:
+            LIGHTPATH_STORE.touch(flow)
+    return flow
+
+
+def validate_spectrum_policy(data):
+    """Return an error message if spectrum_policy or preferred_band of a lightpath is unknown, else None."""
+    spectrum_policy = data.get("spectrum_policy")
+    if spectrum_policy and spectrum_policy not in SPECTRUM_POLICIES:
+        return "spectrum_policy must be one of {}".format(", ".join(SPECTRUM_POLICIES))
+    preferred_band = data.get("preferred_band")
+    if preferred_band and preferred_band not in FreqeuncyRanges.__members__:
+        return "preferred_band must be one of {}".format(", ".join(FreqeuncyRanges.__members__))
+    return None
+
+
+def mark_flow_paths_used(flow_id, used_link_uuids):
+    """Mark the acquired links as USED in a flow's cached computed_paths and invalidate those paths."""
+    computed_paths = db_flows[flow_id].get('computed_paths')
+    if not computed_paths:
+        return
+
+    for list_name in ('all_paths', 'dijkstra'):
+        for path in computed_paths.get(list_name, []):
+            path_invalidated = False
+            for link in path.get('links', []):
+                if link.get('id') in used_link_uuids:
+                    link['used'] = True
+                    link['status'] = 'USED'
+                    path_invalidated = True
+            if path_invalidated:
+                path['is_valid'] = False
+
+
+def group_batch_allocations(demand_allocations, positions):
+    """device_uuid -> allocations of the given BatchProvision demands (demand order kept)."""
+    device_allocations = {}
+    for position in positions:
+        for device_uuid, allocations in demand_allocations[position].items():
+            device_allocations.setdefault(device_uuid, []).extend(allocations)
+    return device_allocations
+
+
+def activate_flow(flow_id, path_type, path_index=None):
+    """Mark a flow ACTIVE and store the links of the acquired path for display."""
+    flow_data = db_flows[flow_id]
+    flow_data['status'] = 'ACTIVE'
+    flow_data['acquired_path_type'] = path_type
+    # [CHAFI-THESIS] No further RSA on this flow: drop its memoized RSA context
+    RSA_CONTEXTS.discard(flow_id)
+    # [CHAFI-THESIS] Store acquired path links for display
+    computed = flow_data.get('computed_paths', {})
+    if path_type == "dijkstra":
+        dijkstra = computed.get('dijkstra', [])
+        flow_data['acquired_path_links'] = dijkstra[0].get('links', []) if dijkstra else []
+    elif path_index is not None:
+        all_paths = computed.get('all_paths', [])
+        flow_data['acquired_path_links'] = all_paths[path_index].get('links', []) if path_index < len(all_paths) else []
+    LIGHTPATH_STORE.save(flow_data)
+
+
+def fail_flow(flow_id, status='FAILED'):
+    """Mark a flow FAILED (or PARTIAL if a failed commit left some of its slots allocated) and persist it."""
+    flow_data = db_flows[flow_id]
+    flow_data['status'] = status
+    LIGHTPATH_STORE.save(flow_data)
+# [CHAFI-THESIS-END]
+
+
+# [CHAFI-THESIS-START] - RSA with a provisional slot reservation (concurrent PerformRSA requests)
+def current_snapshot_cache():
+    """
+    (OpticalLinksCache, version) of the current snapshot, for RSA on the stored paths of a flow.
+
+    The version the paths were computed on may be older: its bitmaps could miss
+    slots acquired since, so RSA always runs on the current snapshot.
+    """
+    snapshot = SNAPSHOT_MANAGER.get_snapshot()
+    return snapshot.cache, snapshot.version
+
+
+def perform_reserved_rsa(flow_id, path_type, path_obj, bandwidth, trace_level, get_cache):
+    """
+    Run RSA treating slots reserved by other flows as occupied, then reserve the chosen slots.
+
+    The reservation is a compare-and-set against the snapshot version the RSA
+    read; if a concurrent request won the race the RSA is re-run, up to
+    RESERVATION_MAX_ATTEMPTS times. Hop bitmaps are memoized in the flow's
+    RSAContext, so paths of the same flow only intersect shared hops once.
+    With RSA workers the RSA runs in a worker on the current version (what
+    get_cache() resolves to for a flow) and get_cache is not called.
+
+    Args:
+        flow_id: Flow the RSA is computed for
+        path_type: 'dijkstra' or 'alternative_<i>'
+        path_obj: Path object with 'links' list
+        bandwidth: Requested bandwidth (required_slots_ceil * slot_granularity_ghz)
+        trace_level: RSA trace verbosity
+        get_cache: Callable returning (OpticalLinksCache, snapshot_version) for an attempt;
+                   a None version skips the version check
+
+    Returns:
+        dict: RSA result (with reservation_id/reservation_expires_at on success), or None
+    """
+    lightpath = db_flows.get(flow_id, {})
+    rsa_context = RSA_CONTEXTS.get(flow_id)
+    for attempt in range(1, RESERVATION_MAX_ATTEMPTS + 1):
+        held_masks = RESERVATION_LEDGER.held_masks(exclude_flow_id=flow_id)
+        with timed_phase('rsa'):
+            if RSA_WORKER_POOL.enabled:
+                rsa_result, snapshot_version = RSA_WORKER_POOL.perform_rsa(
+                    flow_id, path_obj, bandwidth, held_masks, trace_level=trace_level,
+                    spectrum_policy=lightpath.get('spectrum_policy'),
+                    preferred_band=lightpath.get('preferred_band'))
+            else:
+                cache, snapshot_version = get_cache()
+                rsa_result = TopologyHelper.perform_rsa(
+                    path_obj=path_obj, bandwidth=bandwidth, cache=cache,
+                    trace_level=trace_level, held_masks=held_masks,
+                    spectrum_policy=lightpath.get('spectrum_policy'),
+                    preferred_band=lightpath.get('preferred_band'),
+                    hop_memo=rsa_context.hop_memo(snapshot_version))
+        if not rsa_result or not rsa_result.get('success'):
+            return rsa_result
+
+        reservation = RESERVATION_LEDGER.reserve(
+            flow_id, path_type, allocation_endpoint_masks(rsa_result), snapshot_version)
+        if reservation is not None:
+            rsa_result['reservation_id'] = reservation.reservation_id
+            rsa_result['reservation_expires_at'] = reservation.expires_at
+            return rsa_result
+        LOGGER.info("[CHAFI-RSA] flow_id={} {}: reservation attempt {} lost a race, re-running RSA".format(
+            flow_id, path_type, attempt))
+
+    return {"success": False, "error": "Slots contended by concurrent requests, retry later",
+            "failure_reason": "contended"}
+# [CHAFI-THESIS-END]
+
+
+# [CHAFI-THESIS-START] - Request stream recording for offline replay (POC_REQUEST_LOG, see Replay.py)
+@app.after_request
+def record_request(response):
+    if REQUEST_RECORDER.enabled:
+        try:
+            REQUEST_RECORDER.record(
+                request.method, request.full_path.rstrip('?'), request.get_json(silent=True),
+                response.status_code, response.get_json(silent=True))
+        except Exception as e:
+            LOGGER.warning(f"[CHAFI-REPLAY] Request not recorded: {e}")
+    return response
 # [CHAFI-THESIS-END]
 
 
@@ -83,6 +402,14 @@ def health():
     return {"status": "healthy"}, 200
 
 
+# [CHAFI-THESIS-START] - Prometheus scrape endpoint (see Metrics.py)
+@app.route('/metrics')
+def metrics():
+    """Phase latency histograms, RSA outcome and cache counters, flow gauges (text format)"""
+    return Response(render_metrics(), mimetype=CONTENT_TYPE)
+# [CHAFI-THESIS-END]
+
+
 @optical.route('/GetStatus')
 @optical.response(200, 'Success')
 class GetStatus(Resource):
@@ -95,23 +422,88 @@ class GetStatus(Resource):
             "service": "parallelopticalcontroller",
             "status": "running",
             "version": "1.0.0",
-            "lightpaths_count": len(db_flows)
+            "lightpaths_count": len(db_flows),
+            "reservations_count": len(RESERVATION_LEDGER),
+            "snapshot_version": SNAPSHOT_MANAGER.version,
+            "rsa_workers": RSA_WORKER_POOL.processes,
+            "path_cache": {"entries": len(PATH_CACHE), "hits": PATH_CACHE.hits,
+                           "misses": PATH_CACHE.misses, "coalesced": PATH_CACHE.coalesced},
+            "snapshot_events": SNAPSHOT_SUBSCRIBER.stats()
         }, 200
 
 
 # [CHAFI-THESIS-START] - Endpoint to sync topology from TFS
 @optical.route('/GetTopology/<path:context_id>/<path:topology_id>')
 @optical.response(200, 'Success')
+@optical.response(304, 'Snapshot unchanged (If-None-Match)')
+@optical.response(500, 'Error, snapshot build failed')
 class GetTopology(Resource):
     @staticmethod
     def get(context_id, topology_id):
         """
         [CHAFI-PARALLEL-OPTICAL] Sync topology from TFS context service.
         This is called by ServiceService to initialize the controller.
+
+        Builds the shared topology snapshot if needed (devices, enriched links,
+        graph, OpticalLinksCache) and its transponder route table, so the first
+        PerformRSA after a deploy is not a cold start.
+
+        The ETag response header identifies the snapshot version. A request with
+        If-None-Match set to the current ETag gets 304 without any work, which is
+        how callers check cheaply whether the controller's view is current.
         """
         # LOGGER.info(
         #     "[CHAFI-RSA] GetTopology: context={}, topology={}".format(context_id, topology_id))
-        return {"message": "Hello from ParallelOpticalController GetTopology!", "context_id": context_id, "topology_id": topology_id}, 200
+        etag = SNAPSHOT_MANAGER.current_etag()
+        if etag is not None and request.if_none_match.contains(etag):
+            return None, 304, {'ETag': '"{}"'.format(etag)}
+
+        t_start = time.perf_counter()
+        try:
+            snapshot, rebuilt = SNAPSHOT_MANAGER.warm_up(context_id, topology_id)
+        except Exception as e:
+            LOGGER.error("[CHAFI-RSA] GetTopology error: {}".format(e))
+            return {"error": str(e)}, 500
+
+        return {
+            "context_id": context_id,
+            "topology_id": topology_id,
+            "version": snapshot.version,
+            "etag": snapshot.etag,
+            "rebuilt": rebuilt,
+            "devices_count": len(snapshot.optical_devices),
+            "links_count": len(snapshot.optical_links),
+            "nodes_count": snapshot.graph.number_of_nodes(),
+            "edges_count": snapshot.graph.number_of_edges(),
+            "routes_count": snapshot.views.route_count(),
+            "build_timing": snapshot.build_timing if rebuilt else {},
+            "elapsed_time": time.perf_counter() - t_start
+        }, 200, {'ETag': '"{}"'.format(snapshot.etag)}
+# [CHAFI-THESIS-END]
+
+
+# [CHAFI-THESIS-START] - Endpoint to force a topology snapshot rebuild
+@optical.route('/RefreshTopology')
+@optical.response(200, 'Success')
+@optical.response(500, 'Error, snapshot rebuild failed')
+class RefreshTopology(Resource):
+    @staticmethod
+    def get():
+        """
+        [CHAFI-PARALLEL-OPTICAL] Invalidate and rebuild the shared topology snapshot.
+        Use after link/config changes made outside AcquireSlots.
+        """
+        try:
+            snapshot = SNAPSHOT_MANAGER.refresh()
+        except Exception as e:
+            LOGGER.error("[CHAFI-RSA] RefreshTopology error: {}".format(e))
+            return {"error": str(e)}, 500
+        return {
+            "version": snapshot.version,
+            "devices_count": len(snapshot.optical_devices),
+            "links_count": len(snapshot.optical_links),
+            "build_timing": snapshot.build_timing
+        }, 200
 # [CHAFI-THESIS-END]
 
 
@@ -135,52 +527,18 @@ class AddLightpath(Resource):
             bitrate: Required bandwidth in Gbps
             bidir: Bidirectionality flag (0=unidirectional, 1=bidirectional)
             constraint_type: Service type (e.g., "flexi_grid")
+            additional_hops: Extra hops allowed beyond the shortest path (optional)
+            k_paths: Max alternative node sequences to search (optional)
+            spectrum_policy: first_fit | last_fit | exact_fit | random | most_used |
+                             band_preferring (optional, default RSA_SPECTRUM_POLICY)
+            preferred_band: Band of band_preferring, e.g. "C_BAND" (optional)
         """
-        global flow_counter, db_flows
-
         # [CHAFI-PARALLEL-OPTICAL] Parse JSON body
         data = request.get_json() or {}
-
-        src = data.get("src", "unknown")
-        dst = data.get("dst", "unknown")
-        src_index = data.get("src_index", "")
-        dst_index = data.get("dst_index", "")
-        bitrate = data.get("bitrate", 100)
-        bidir = data.get("bidir", 0)
-        constraint_type = data.get("constraint_type", "flexi_grid")
-        # [CHAFI-PARALLEL-OPTICAL] Extract service_uuid
-        service_uuid = data.get("service_uuid", "")
-        # [CHAFI-THESIS] Extract additional_hops (0 = use default in topology.py)
-        additional_hops = data.get("additional_hops", 0)
-
-        # [CHAFI-THESIS] Generate flow ID (auto-increment like opticalcontroller)
-        flow_counter += 1
-        flow_id = flow_counter
-
-        # [CHAFI-THESIS] Store lightpath in db_flows (structure matches opticalcontroller)
-        # Status options: PLANNED (initial), ACTIVE (RSA success), FAILED (RSA failed)
-        db_flows[flow_id] = {
-            "flow_id": flow_id,
-            # [CHAFI-PARALLEL-OPTICAL] Store service_uuid
-            "service_uuid": service_uuid,
-            "src": src,
-            "dst": dst,
-            "src_index": src_index,
-            "dst_index": dst_index,
-            "bitrate": bitrate,
-            "bidir": bidir,
-            "constraint_type": constraint_type,
-            "additional_hops": additional_hops,  # [CHAFI-THESIS] Dynamic hop limit
-            # RSA results (placeholder - TODO: implement custom RSA)
-            "op-mode": 0,  # 0 = pending, 1 = success, -1 = failed
-            "slots": [],
-            "path": [],
-            "band": 0,
-            "freq": 0,
-            "n_slots": 0,
-            "status": "PLANNED",  # PLANNED | ACTIVE | FAILED
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
-        }
+        error = validate_spectrum_policy(data)
+        if error:
+            return {"error": error}, 400
+        flow_id = create_flow(data)
 
         # LOGGER.info("[CHAFI-RSA] AddLightpath: flow_id={} | {}:{} -> {}:{} | {}Gbps".format(
         #     flow_id, src, src_index, dst, dst_index, bitrate))
@@ -192,6 +550,7 @@ class AddLightpath(Resource):
 # [CHAFI-THESIS-START] - GetLightpaths endpoint to retrieve all stored lightpaths
 @optical.route('/GetLightpaths')
 @optical.response(200, 'Success')
+@optical.response(400, 'Bad Request')
 @optical.response(404, 'Error, not found')
 class GetLightpaths(Resource):
     @staticmethod
@@ -199,11 +558,41 @@ class GetLightpaths(Resource):
         """
         [CHAFI-PARALLEL-OPTICAL] Get all stored lightpaths.
         Returns db_flows dictionary (same format as opticalcontroller).
+
+        Query parameters:
+            - status, src, dst, service_uuid: Return only flows with these values
+            - offset, limit: Page of the matching flows (in flow_id order); the
+              X-Total-Count and X-Next-Offset headers describe the remaining pages
+            - view: full (default) | compact (ids, status and acquired link ids)
+            - fields: Comma-separated keys to keep in every flow
         """
         # LOGGER.info(
         #     "[CHAFI-RSA] GetLightpaths: {} flows".format(len(db_flows)))
+        view, fields = get_response_view()
+        if view is None:
+            return {"error": "view must be one of {}".format(", ".join(RESPONSE_VIEWS))}, 400
         try:
-            return db_flows, 200
+            offset = int(request.args.get('offset', 0))
+            limit = request.args.get('limit')
+            limit = int(limit) if limit is not None else None
+        except ValueError:
+            return {"error": "offset and limit must be integers"}, 400
+        if offset < 0 or (limit is not None and limit < 0):
+            return {"error": "offset and limit must not be negative"}, 400
+        filters = {key: request.args[key] for key in LIGHTPATH_FILTERS if key in request.args}
+
+        try:
+            # Copy under the lock: a concurrent AddLightpath may insert while the response is serialized
+            with FLOWS_LOCK:
+                flows = list(db_flows.values())
+            matched = [flow for flow in flows
+                       if all(str(flow.get(key)) == value for key, value in filters.items())]
+            page = matched[offset:None if limit is None else offset + limit]
+
+            headers = {"X-Total-Count": str(len(matched))}
+            if limit is not None and offset + limit < len(matched):
+                headers["X-Next-Offset"] = str(offset + limit)
+            return {flow['flow_id']: render_flow(flow, view, fields) for flow in page}, 200, headers
         except Exception as e:
             LOGGER.error("[CHAFI-RSA] GetLightpaths error: {}".format(e))
             return {"error": str(e)}, 404
@@ -213,16 +602,22 @@ class GetLightpaths(Resource):
 # [CHAFI-THESIS-START] - GetLightpath endpoint to retrieve a specific lightpath by ID
 @optical.route('/GetLightpath/<int:flow_id>')
 @optical.response(200, 'Success')
+@optical.response(400, 'Bad Request')
 @optical.response(404, 'Error, not found')
 class GetLightpath(Resource):
     @staticmethod
     def get(flow_id):
         """
         [CHAFI-PARALLEL-OPTICAL] Get a specific lightpath by flow ID.
+        Supports the view and fields query parameters of GetLightpaths.
         """
-        if flow_id in db_flows:
+        view, fields = get_response_view()
+        if view is None:
+            return {"error": "view must be one of {}".format(", ".join(RESPONSE_VIEWS))}, 400
+        flow = touch_flow(flow_id)
+        if flow is not None:
             # LOGGER.info("[CHAFI-RSA] GetLightpath: flow_id={}".format(flow_id))
-            return db_flows[flow_id], 200
+            return render_flow(flow, view, fields), 200
         else:
             LOGGER.warning(
                 "[CHAFI-RSA] GetLightpath: flow_id={} not found".format(flow_id))
@@ -249,15 +644,27 @@ class PerformRSA(Resource):
             - dst_index: Destination endpoint index
             - bitrate: Required bandwidth in Gbps
             - constraint_type: Service type (e.g., flexi_grid)
+
+        Query parameters:
+            - trace_level: none | summary | full (RSA trace verbosity)
+            - view: full (default) | compact (ids, slots, band and link ids only)
+            - fields: Comma-separated top-level keys to keep in the response
         """
-        start_time = time.time()
+        start_time = time.perf_counter()
         LOGGER.info("[CHAFI-CRASH-DEBUG] PerformRSA START flow_id={}".format(flow_id))
-        # [CHAFI-THESIS] Validate flow_id exists in db_flows
-        if flow_id not in db_flows:
+        # [CHAFI-THESIS] Validate flow_id exists in db_flows (and keep it from expiring meanwhile)
+        if touch_flow(flow_id) is None:
             LOGGER.warning(
                 "[CHAFI-RSA] PerformRSA: flow_id={} not found".format(flow_id))
             return {"error": "flow_id {} not found".format(flow_id), "success": False}, 404
 
+        trace_level = get_trace_level()
+        if trace_level is None:
+            return {"error": "trace_level must be one of {}".format(", ".join(TRACE_LEVELS)), "success": False}, 400
+        view, fields = get_response_view()
+        if view is None:
+            return {"error": "view must be one of {}".format(", ".join(RESPONSE_VIEWS)), "success": False}, 400
+
         # [CHAFI-THESIS] Retrieve lightpath parameters
         lightpath = db_flows[flow_id]
         src = lightpath.get("src", "unknown")
@@ -268,6 +675,7 @@ class PerformRSA(Resource):
         bidir = lightpath.get("bidir", 0)
         constraint_type = lightpath.get("constraint_type", "flexi_grid")
         additional_hops = lightpath.get("additional_hops", 0)
+        k_paths = lightpath.get("k_paths")
         status = lightpath.get("status", "PLANNED")
 
         # LOGGER.info("[CHAFI-RSA] PerformRSA: flow_id={} | {}:{} -> {}:{} | {}Gbps".format(
@@ -275,77 +683,44 @@ class PerformRSA(Resource):
 
         # [CHAFI-THESIS] Step 1: Calculate required bandwidth and slots
         LOGGER.info("[CHAFI-CRASH-DEBUG] Step 1: bandwidth calculation")
-        t_step1_start = time.time()
+        t_step1_start = time.perf_counter()
         bandwidth_result = get_required_bandwidth(
             bitrate=bitrate,
             modulation=DEFAULT_MODULATION,
             roll_off_factor=DEFAULT_ROLL_OFF_FACTOR
         )
-        t_step1 = time.time() - t_step1_start
-
-        # [CHAFI-THESIS] Step 2: Fetch optical devices once (to avoid duplicate queries)
-        LOGGER.info("[CHAFI-CRASH-DEBUG] Step 2: fetching optical devices")
-        t_step2_start = time.time()
-        OPTICAL_DEVICE_TYPES = {
-            DeviceTypeEnum.OPTICAL_ROADM.value,
-            DeviceTypeEnum.EMULATED_OPTICAL_ROADM.value,
-            DeviceTypeEnum.OPEN_ROADM.value,
-            DeviceTypeEnum.EMULATED_OPEN_ROADM.value,
-            DeviceTypeEnum.OPTICAL_TRANSPONDER.value,
-            DeviceTypeEnum.EMULATED_OPTICAL_TRANSPONDER.value,
-        }
+        t_step1 = time.perf_counter() - t_step1_start
 
+        # [CHAFI-THESIS] Steps 2-3: Get the shared topology snapshot (devices, links, graph, cache).
+        # The snapshot is only rebuilt when it was invalidated; otherwise FETCH costs nothing.
+        LOGGER.info("[CHAFI-CRASH-DEBUG] Steps 2-3: getting topology snapshot")
         try:
-            ctx_client = ContextClient()
-            ctx_client.connect()
-            device_list = ctx_client.ListDevices(Empty())
-            all_devices = list(device_list.devices)
-            optical_devices = [
-                d for d in all_devices if d.device_type in OPTICAL_DEVICE_TYPES]
-            ctx_client.close()
+            snapshot, rebuilt = SNAPSHOT_MANAGER.ensure_snapshot()
         except Exception as e:
-            LOGGER.error(f"[CHAFI-RSA] Device fetch error: {e}")
-            optical_devices = []
-        t_step2 = time.time() - t_step2_start
+            LOGGER.error("[CHAFI-RSA] Snapshot error: {}".format(e))
+            return {"error": "Topology snapshot unavailable: {}".format(e), "success": False}, 500
 
-        # [CHAFI-THESIS] Step 3a: Fetch optical links from context (DB-dependent)
-        LOGGER.info("[CHAFI-CRASH-DEBUG] Step 3a: fetching optical links from context")
-        t_step3a_start = time.time()
-        try:
-            optical_links_json = fetch_optical_links_for_rsa(optical_devices)
-        except Exception as e:
-            LOGGER.error("[CHAFI-RSA] Fetch links error: {}".format(e))
-            optical_links_json = []
-        t_step3a = time.time() - t_step3a_start
-
-        # [CHAFI-THESIS] Step 3b: Build NetworkX graph (pure computation)
-        LOGGER.info("[CHAFI-CRASH-DEBUG] Step 3b: building graph from pre-fetched data")
-        t_step3b_start = time.time()
-        try:
-            G, _ = build_graph(directed=False, optical_devices=optical_devices, optical_links=optical_links_json)
-            graph_nodes = list(G.nodes(data=True))
-            graph_edges = list(G.edges(data=True, keys=True))
-
-            graph_info = {
-                "nodes_count": len(graph_nodes),
-                "edges_count": len(graph_edges),
-                "nodes": [{"name": n, "type": a.get('type'), "category": a.get('category')}
-                          for n, a in graph_nodes],
-                "edges": [{"src": src, "dst": dst, "name": a.get('name'),
-                           "transport_type": a.get('transport_type'), "used": a.get('used')}
-                          for src, dst, key, a in graph_edges]
-            }
-        except Exception as e:
-            LOGGER.error("[CHAFI-RSA] Graph error: {}".format(e))
-            graph_info = {"error": str(e), "nodes_count": 0, "edges_count": 0}
-        t_step3b = time.time() - t_step3b_start
+        build_timing = snapshot.build_timing if rebuilt else {}
+        t_step2 = build_timing.get('devices_sec', 0)
+        t_step3a = build_timing.get('links_sec', 0)
+        t_step3b = build_timing.get('graph_sec', 0)
+        G = snapshot.graph
 
         # [CHAFI-THESIS] Step 5: Find all paths between source and destination
         LOGGER.info("[CHAFI-CRASH-DEBUG] Step 5: find_paths START")
         paths_info = {"dijkstra": [], "all_paths": [], "error": None}
         paths_timing = {}
         try:
-            paths_result = find_paths(src, src_index, dst, dst_index, G, additional_hops=additional_hops)
+            def search_paths():
+                if RSA_WORKER_POOL.enabled:
+                    return RSA_WORKER_POOL.find_paths(
+                        src, src_index, dst, dst_index, additional_hops=additional_hops, k_paths=k_paths)[0]
+                return find_paths(src, src_index, dst, dst_index, G, additional_hops=additional_hops,
+                                  views=snapshot.views, k_paths=k_paths)
+
+            # [CHAFI-THESIS] Identical requests on the same version share one search
+            paths_result = PATH_CACHE.get(
+                (src, src_index, dst, dst_index, additional_hops, k_paths), snapshot.version, search_paths)
             paths_info = {
                 "dijkstra": paths_result.get('dijkstra', []),
                 "all_paths": paths_result.get('all_paths', []),
@@ -361,21 +736,21 @@ class PerformRSA(Resource):
         # [CHAFI-THESIS] Step 6: Perform RSA on dijkstra path
         LOGGER.info("[CHAFI-CRASH-DEBUG] Step 6: RSA on dijkstra path")
         rsa_result = {"success": False, "error": None}
-        t_rsa_start = time.time()
+        t_rsa_start = time.perf_counter()
         try:
             # why the cache?
-            #   during the RSA computation we are gonna use endpoint details, channel information,etc frequently. Since querying the database is a heavy task and in this context it is unnecessary, we just built a cache until the computation. The data remains in memory and finally the bitmap_value is updated.
-            cache = OpticalLinksCache(optical_links_json)
+            #   during the RSA computation we are gonna use endpoint details, channel information,etc frequently. Since querying the database is a heavy task and in this context it is unnecessary, the snapshot keeps a cache that is shared until the next rebuild.
+            def get_cache():
+                current = SNAPSHOT_MANAGER.get_snapshot()
+                return current.cache, current.version
 
             if paths_info.get('dijkstra') and len(paths_info['dijkstra']) > 0:
                 dijkstra_path = paths_info['dijkstra'][0]
 
-                result = TopologyHelper.perform_rsa(
-                    path_obj=dijkstra_path,
-                    bandwidth=bandwidth_result['required_slots_ceil'] *
-                    bandwidth_result['slot_granularity_ghz'],
-                    cache=cache
-                )
+                result = perform_reserved_rsa(
+                    flow_id, 'dijkstra', dijkstra_path,
+                    bandwidth_result['required_slots_ceil'] * bandwidth_result['slot_granularity_ghz'],
+                    trace_level, get_cache)
 
                 # Check if perform_rsa returned None
                 if result is not None:
@@ -384,17 +759,21 @@ class PerformRSA(Resource):
                     rsa_result['error'] = "perform_rsa returned None"
             else:
                 rsa_result['error'] = "No dijkstra path found"
+                rsa_result['failure_reason'] = "no_path"
 
         except Exception as e:
             LOGGER.error("[CHAFI-RSA] RSA error: {}".format(e))
             rsa_result = {"success": False, "error": str(e)}
-        t_rsa_end = time.time()
+        t_rsa_end = time.perf_counter()
+        record_rsa_result(rsa_result)
 
         # [CHAFI-THESIS] Store computed data in db_flows for additional path RSA
         LOGGER.info("[CHAFI-CRASH-DEBUG] Step 7: storing results in db_flows")
         # Note: We don't store bandwidth_calculation - it's recalculated from bitrate to ensure consistency
+        # [CHAFI-THESIS] The flow references the snapshot version instead of copying its links
         db_flows[flow_id]['computed_paths'] = paths_info
-        db_flows[flow_id]['optical_links'] = optical_links_json
+        db_flows[flow_id]['snapshot_version'] = snapshot.version
+        LIGHTPATH_STORE.touch(db_flows[flow_id])
 
         # [CHAFI-RSA-SLOT] Persist RSA result (containing acquisition metadata)
         if 'dijkstra_rsa_result' not in db_flows[flow_id]:
@@ -415,7 +794,7 @@ class PerformRSA(Resource):
 
         # [CHAFI-THESIS] Return parameters with bandwidth calculation, graph info, paths, and RSA result
         # [CHAFI-THESIS] Return parameters with bandwidth calculation, graph info, paths, and RSA result
-        elapsed_time = time.time() - start_time
+        elapsed_time = time.perf_counter() - start_time
         # LOGGER.info("[CHAFI-POC: PerformRSA] PerformRSA completed in {:.4f} seconds".format(elapsed_time))
 
         # [CHAFI-TIMING] Performance timing summary (per-step breakdown)
@@ -425,17 +804,29 @@ class PerformRSA(Resource):
         t_fetch_total = t_step2 + t_step3a  # all DB/gRPC overhead
         t_compute_total = t_step1 + t_step3b + t_dijkstra + t_rsa + t_allpaths  # pure computation
         LOGGER.info(
-            "[CHAFI-TIMING] PerformRSA flow_id={} | "
+            "[CHAFI-TIMING] PerformRSA flow_id={} | snapshot v{} ({}) | "
             "FETCH[devices: {:.4f}s, links: {:.4f}s] = {:.4f}s | "
             "COMPUTE[graph: {:.4f}s, dijkstra: {:.4f}s, rsa: {:.4f}s, alt_paths: {:.4f}s] = {:.4f}s | "
             "TOTAL: {:.4f}s".format(
-                flow_id,
+                flow_id, snapshot.version, "rebuilt" if rebuilt else "cached",
                 t_step2, t_step3a, t_fetch_total,
                 t_step3b, t_dijkstra, t_rsa, t_allpaths, t_compute_total,
                 elapsed_time)
         )
 
-        return {
+        if view == VIEW_COMPACT:
+            return project_fields({
+                "success": True,
+                "flow_id": flow_id,
+                "status": status,
+                "snapshot_version": db_flows[flow_id]['snapshot_version'],
+                "required_slots": bandwidth_result['required_slots_ceil'],
+                "paths_count": len(paths_info['dijkstra']) + len(paths_info['all_paths']),
+                "rsa_result": compact_rsa_result(rsa_result),
+                "elapsed_time": elapsed_time
+            }, fields), 200
+
+        return project_fields({
             "success": True,
             "message": "RSA computation completed",
             "flow_id": flow_id,
@@ -458,15 +849,14 @@ class PerformRSA(Resource):
                 "required_slots_exact": bandwidth_result['required_slots'],
                 "required_slots": bandwidth_result['required_slots_ceil']
             },
-            "topology_graph": graph_info,
+            "topology_graph": snapshot.graph_info,
             "paths": paths_info,
-            "rsa_result": rsa_result,
-            "rsa_result": rsa_result,
+            "rsa_result": TopologyHelper.render_rsa_result(rsa_result),
             "status": status,
             "acquired_path_type": lightpath.get("acquired_path_type"),
             "acquired_path_links": PerformRSA._get_acquired_path_links(lightpath),
             "elapsed_time": elapsed_time
-        }, 200
+        }, fields), 200
 
     @staticmethod
     def _get_acquired_path_links(lightpath):
@@ -487,21 +877,33 @@ class PerformAdditionalPathRSA(Resource):
 
         Uses stored data from main PerformRSA to avoid re-computation:
         - Retrieves path from db_flows['computed_paths']['all_paths'][path_index]
-        - Reuses optical_links and bandwidth_calculation
+        - Reuses the prebuilt OpticalLinksCache of the current snapshot
         - Performs RSA using TopologyHelper.perform_rsa()
 
         Args:
             flow_id: Flow identifier
             path_index: Index in all_paths list (0-based)
+
+        Query parameters:
+            trace_level: none | summary | full (RSA trace verbosity)
+            view: full (default) | compact (ids, slots, band and link ids only)
+            fields: Comma-separated top-level keys to keep in the response
         """
-        # [CHAFI-THESIS] Validate flow_id exists
-        if flow_id not in db_flows:
+        # [CHAFI-THESIS] Validate flow_id exists (and keep it from expiring meanwhile)
+        if touch_flow(flow_id) is None:
             LOGGER.warning(
                 "[CHAFI-RSA] AdditionalPathRSA: flow_id={} not found".format(flow_id))
             return {"error": "flow_id {} not found".format(flow_id), "success": False}, 404
 
+        trace_level = get_trace_level()
+        if trace_level is None:
+            return {"error": "trace_level must be one of {}".format(", ".join(TRACE_LEVELS)), "success": False}, 400
+        view, fields = get_response_view()
+        if view is None:
+            return {"error": "view must be one of {}".format(", ".join(RESPONSE_VIEWS)), "success": False}, 400
+
         # [CHAFI-THESIS] Check if computed data exists
-        if 'computed_paths' not in db_flows[flow_id] or 'optical_links' not in db_flows[flow_id]:
+        if 'computed_paths' not in db_flows[flow_id] or 'snapshot_version' not in db_flows[flow_id]:
             LOGGER.warning(
                 "[CHAFI-RSA] AdditionalPathRSA: flow_id={} missing computed data. Run main PerformRSA first.".format(flow_id))
             return {
@@ -511,7 +913,6 @@ class PerformAdditionalPathRSA(Resource):
 
         # [CHAFI-THESIS] Retrieve stored data
         computed_paths = db_flows[flow_id]['computed_paths']
-        optical_links = db_flows[flow_id]['optical_links']
         lightpath = db_flows[flow_id]
 
         # [CHAFI-THESIS] Recalculate bandwidth from source bitrate (ensures consistency with main RSA)
@@ -545,19 +946,17 @@ class PerformAdditionalPathRSA(Resource):
         # [CHAFI-THESIS] Perform RSA using stored data
         rsa_result = {"success": False, "error": None}
         try:
-            # Build transient cache from stored optical_links
-            cache = OpticalLinksCache(optical_links)
+            # [CHAFI-THESIS] Nothing is rebuilt: the current snapshot's cache is reused
+            get_cache = current_snapshot_cache
 
             # Calculate bandwidth (reuse from stored calculation)
             bandwidth_gbps = bandwidth_calc['required_slots_ceil'] * \
                 bandwidth_calc['slot_granularity_ghz']
 
             # Perform RSA on selected path
-            result = TopologyHelper.perform_rsa(
-                path_obj=path_obj,
-                bandwidth=bandwidth_gbps,
-                cache=cache
-            )
+            result = perform_reserved_rsa(
+                flow_id, "alternative_{}".format(path_index), path_obj, bandwidth_gbps,
+                trace_level, get_cache)
 
             if result is not None:
                 rsa_result = result
@@ -567,6 +966,7 @@ class PerformAdditionalPathRSA(Resource):
         except Exception as e:
             LOGGER.error("[CHAFI-RSA] AdditionalPathRSA error: {}".format(e))
             rsa_result = {"success": False, "error": str(e)}
+        record_rsa_result(rsa_result)
 
         # [CHAFI-RSA-SLOT] Persist RSA result (containing acquisition metadata)
         # We key it by the path index so we can retrieve it later
@@ -583,8 +983,18 @@ class PerformAdditionalPathRSA(Resource):
         #         "[CHAFI-RSA] AdditionalPath Result: FAILED - {}".format(rsa_result.get('error')))
 
         # [CHAFI-THESIS] Return RSA result with path info
+        if view == VIEW_COMPACT:
+            return project_fields({
+                "success": True,
+                "flow_id": flow_id,
+                "path_index": path_index,
+                "status": lightpath.get("status", "PLANNED"),
+                "required_slots": bandwidth_calc['required_slots_ceil'],
+                "rsa_result": compact_rsa_result(rsa_result)
+            }, fields), 200
+
         # Format bandwidth_calculation to match PerformRSA structure
-        return {
+        return project_fields({
             "success": True,
             "flow_id": flow_id,
             "path_index": path_index,
@@ -606,9 +1016,157 @@ class PerformAdditionalPathRSA(Resource):
                 "required_slots_exact": bandwidth_calc['required_slots'],
                 "required_slots": bandwidth_calc['required_slots_ceil']
             },
-            "rsa_result": rsa_result,
+            "rsa_result": TopologyHelper.render_rsa_result(rsa_result),
             "status": lightpath.get("status", "PLANNED"),
             "acquired_path_type": lightpath.get("acquired_path_type")
+        }, fields), 200
+# [CHAFI-THESIS-END]
+
+
+# [CHAFI-THESIS-START] - EvaluatePaths endpoint (RSA on all candidate paths in one call)
+@optical.route('/EvaluatePaths/<int:flow_id>')
+@optical.response(200, 'Success')
+@optical.response(400, 'Bad Request')
+@optical.response(404, 'Error, not found')
+class EvaluatePaths(Resource):
+    @staticmethod
+    def get(flow_id):
+        """
+        [CHAFI-PARALLEL-OPTICAL] Perform RSA on the dijkstra and all alternative paths of a flow.
+
+        Uses the paths stored by PerformRSA and the flow's RSAContext, so hops
+        shared between paths are intersected once. Paths are ranked: feasible
+        first, then by lowest start frequency, then by hop count. Every result
+        is stored like PerformRSA/PerformAdditionalPathRSA would store it (so
+        AcquireSlots works for any of them); the best path is also reserved.
+
+        Query parameters:
+            trace_level: none | summary | full (RSA trace verbosity)
+            view: full (default) | compact (ids, slots, band and link ids only)
+            fields: Comma-separated top-level keys to keep in the response
+        """
+        if touch_flow(flow_id) is None:
+            LOGGER.warning(
+                "[CHAFI-RSA] EvaluatePaths: flow_id={} not found".format(flow_id))
+            return {"error": "flow_id {} not found".format(flow_id), "success": False}, 404
+
+        trace_level = get_trace_level()
+        if trace_level is None:
+            return {"error": "trace_level must be one of {}".format(", ".join(TRACE_LEVELS)), "success": False}, 400
+        view, fields = get_response_view()
+        if view is None:
+            return {"error": "view must be one of {}".format(", ".join(RESPONSE_VIEWS)), "success": False}, 400
+
+        lightpath = db_flows[flow_id]
+        if 'computed_paths' not in lightpath or 'snapshot_version' not in lightpath:
+            return {
+                "error": "Computed paths not found. Please run main RSA first.",
+                "success": False
+            }, 404
+
+        candidates = candidate_paths(lightpath['computed_paths'])
+        if not candidates:
+            return {"error": "No candidate paths for flow {}".format(flow_id), "success": False}, 404
+
+        bandwidth_calc = get_required_bandwidth(
+            bitrate=lightpath.get('bitrate', 0),
+            modulation=DEFAULT_MODULATION,
+            roll_off_factor=DEFAULT_ROLL_OFF_FACTOR
+        )
+        bandwidth_gbps = bandwidth_calc['required_slots_ceil'] * bandwidth_calc['slot_granularity_ghz']
+        snapshot_version = lightpath['snapshot_version']
+
+        try:
+            held_masks = RESERVATION_LEDGER.held_masks(exclude_flow_id=flow_id)
+            with timed_phase('rsa'):
+                if RSA_WORKER_POOL.enabled:
+                    evaluations, _ = RSA_WORKER_POOL.evaluate_paths(
+                        flow_id, candidates, bandwidth_gbps, held_masks, trace_level=trace_level,
+                        spectrum_policy=lightpath.get('spectrum_policy'),
+                        preferred_band=lightpath.get('preferred_band'))
+                else:
+                    cache, cache_version = current_snapshot_cache()
+                    evaluations = evaluate_paths(
+                        RSA_CONTEXTS.get(flow_id), candidates, bandwidth_gbps, cache, cache_version,
+                        held_masks=held_masks,
+                        spectrum_policy=lightpath.get('spectrum_policy'),
+                        preferred_band=lightpath.get('preferred_band'),
+                        trace_level=trace_level)
+
+            # [CHAFI-THESIS] Reserve the best path (its hops are memoized, the RSA re-run is cheap)
+            best = evaluations[0]
+            if best['success']:
+                path_obj = dict(candidates)[best['path_type']]
+                reserved = perform_reserved_rsa(
+                    flow_id, best['path_type'], path_obj, bandwidth_gbps, trace_level,
+                    current_snapshot_cache)
+                best['rsa_result'] = reserved or {"success": False, "error": "perform_rsa returned None"}
+                best['success'] = bool(best['rsa_result'].get('success'))
+        except Exception as e:
+            LOGGER.error("[CHAFI-RSA] EvaluatePaths error: {}".format(e))
+            return {"error": str(e), "success": False}, 500
+
+        ranking = []
+        for evaluation in evaluations:
+            path_type = evaluation['path_type']
+            rsa_result = evaluation['rsa_result']
+            record_rsa_result(rsa_result)
+            # [CHAFI-RSA-SLOT] Persist under the key AcquireSlots reads for this path
+            result_key = 'dijkstra_rsa_result' if path_type == 'dijkstra' else "{}_rsa_result".format(path_type)
+            db_flows[flow_id][result_key] = rsa_result
+            ranking.append({
+                "rank": evaluation['rank'],
+                "path_type": path_type,
+                "path_index": None if path_type == 'dijkstra' else int(path_type.rsplit('_', 1)[1]),
+                "success": evaluation['success'],
+                "start_position": evaluation['start_position'],
+                "num_hops": evaluation['num_hops'],
+                "rsa_result": compact_rsa_result(rsa_result) if view == VIEW_COMPACT
+                else TopologyHelper.render_rsa_result(rsa_result)
+            })
+
+        return project_fields({
+            "success": True,
+            "flow_id": flow_id,
+            "status": lightpath.get("status", "PLANNED"),
+            "snapshot_version": snapshot_version,
+            "required_slots": bandwidth_calc['required_slots_ceil'],
+            "best_path_type": ranking[0]['path_type'] if ranking[0]['success'] else None,
+            "ranking": ranking
+        }, fields), 200
+# [CHAFI-THESIS-END]
+
+
+# [CHAFI-THESIS-START] - GetRSATrace endpoint (renders stored RSA traces on demand)
+@optical.route('/GetRSATrace/<int:flow_id>', '/GetRSATrace/<int:flow_id>/<int:path_index>')
+@optical.response(200, 'Success')
+@optical.response(404, 'Error, not found')
+class GetRSATrace(Resource):
+    @staticmethod
+    def get(flow_id, path_index=None):
+        """
+        [CHAFI-PARALLEL-OPTICAL] Get the RSA trace of the dijkstra path or an alternative path.
+
+        Bitmaps are only rendered as binary strings here; PerformRSA and
+        PerformAdditionalPathRSA store them as integers. The RSA must have run
+        with trace_level=full for per-endpoint bitmaps to be available.
+        """
+        if touch_flow(flow_id) is None:
+            return {"error": "flow_id {} not found".format(flow_id)}, 404
+
+        result_key = 'dijkstra_rsa_result' if path_index is None else "alternative_{}_rsa_result".format(path_index)
+        rsa_result = db_flows[flow_id].get(result_key)
+        if not rsa_result:
+            return {"error": "No RSA result found for {} of flow {}".format(result_key, flow_id)}, 404
+
+        rendered = TopologyHelper.render_rsa_result(rsa_result)
+        return {
+            "flow_id": flow_id,
+            "path_index": path_index,
+            "trace_level": rendered.get("trace_level"),
+            "reference_slots": rendered.get("reference_slots"),
+            "band_info": rendered.get("band_info"),
+            "trace_steps": rendered.get("trace_steps", [])
         }, 200
 # [CHAFI-THESIS-END]
 
@@ -625,6 +1183,9 @@ class DeleteLightpath(Resource):
         """
         if flow_id in db_flows:
             db_flows[flow_id]["status"] = "FAILED"
+            RESERVATION_LEDGER.release_flow(flow_id)
+            RSA_CONTEXTS.discard(flow_id)
+            LIGHTPATH_STORE.save(db_flows[flow_id])
             # LOGGER.info(
         #     "[CHAFI-RSA] DeleteLightpath: flow_id={} marked FAILED".format(flow_id))
             return {"message": "Lightpath {} deleted".format(flow_id), "flow": db_flows[flow_id]}, 200
@@ -641,6 +1202,7 @@ class DeleteLightpath(Resource):
 @optical.response(207, 'Partial Success')
 @optical.response(400, 'Bad Request')
 @optical.response(404, 'Not Found')
+@optical.response(409, 'Slots reserved by another request or already in use')
 class AcquireSlots(Resource):
     def get(self, flow_id, path_index=None):
         """
@@ -651,8 +1213,8 @@ class AcquireSlots(Resource):
         return self._process_acquisition(flow_id, path_index)
 
     def _process_acquisition(self, flow_id, path_index):
-        start_time = time.time()
-        if flow_id not in db_flows:
+        start_time = time.perf_counter()
+        if touch_flow(flow_id) is None:
             return {"error": f"flow_id {flow_id} not found"}, 404
 
         flow_data = db_flows[flow_id]
@@ -683,352 +1245,437 @@ class AcquireSlots(Resource):
         if not acquisition_metadata:
             return {"error": "No acquisition metadata found. Re-run RSA."}, 400
 
+        # Allocated slots in the reference frame
+        allocation_mask = ((1 << num_slots) - 1) << start_slot
+
         # LOGGER.info(f"[POC:AcquireSlots] Starting acquisition for {path_type}: {len(acquisition_metadata)} endpoints to update")
 
-        # 3. Connect to Context Service
-        # 3. Connect to Context Service
-        # Imports moved to top
-        context_client = ContextClient()  # Assuming default connection params
+        # [CHAFI-THESIS] Turn the provisional reservation into a hold (released in finally)
+        if RESERVATION_LEDGER.claim(flow_id, path_type, allocation_endpoint_masks(rsa_result)) is None:
+            return {"error": f"Slots of {path_type} are reserved by another request. Re-run RSA."}, 409
+
+        # 3. Borrow a warm connection to Context Service (returned in finally)
+        try:
+            context_client = CONTEXT_CLIENT_POOL.acquire()
+        except Exception as e:
+            LOGGER.error(f"[POC:AcquireSlots] Context connection error: {e}")
+            RESERVATION_LEDGER.release_flow(flow_id)
+            return {"error": str(e)}, 500
 
         updated_endpoints = []
+        endpoint_masks = {}  # endpoint_uuid -> allocated native mask (to patch the snapshot)
         errors = []
+        conflicts = []
 
         try:
-            # Imports moved to top
-
-            for meta in acquisition_metadata:
+            # [CHAFI-THESIS] One read-modify-write per device (a transit ROADM has 2 path endpoints).
+            # Every device is read and checked first: if Context has any allocated slot in use,
+            # nothing is written.
+            device_updates = []
+            for device_uuid, device_metas in group_acquisition_by_device(acquisition_metadata).items():
                 try:
-                    endpoint_name = meta['endpoint_name']
-                    device_uuid = meta['device_uuid']
-                    device_type = meta['device_type']
-                    aligned_bitmap_str = meta['aligned_bitmap']
-                    offset_slots = meta['offset_slots']
-                    native_flex_slots = meta['native_flex_slots']
-
-                    # 3a. Apply allocation mask to aligned bitmap (Set slots to 0)
-                    # Convert string to list for mutability
-                    aligned_bits = list(aligned_bitmap_str)
-
-                    for i in range(num_slots):
-                        # The slot index in reference frame (0..N-1)
-                        slot_idx = start_slot + i
-
-                        # Convert to string index (MSB first string)
-                        string_idx = reference_slots - 1 - slot_idx
-
-                        if 0 <= string_idx < len(aligned_bits):
-                            aligned_bits[string_idx] = '0'
-
-                    # 3b. Extract native portion
-                    modified_aligned_str = "".join(aligned_bits)
-
-                    # Convert modified aligned string back to full integer
-                    full_bitmap_int = int(modified_aligned_str, 2)
-
-                    # Shift right by offset to drop lower frequency padding
-                    shifted_int = full_bitmap_int >> offset_slots
-
-                    # Mask to keep only native width
-                    native_mask = (1 << native_flex_slots) - 1
-                    native_bitmap_int = shifted_int & native_mask
-
-                    native_bitmap_str = str(native_bitmap_int)
-
-                    # 3c. Fetch current config to map Endpoint to Channel
-                    opticalconfig_id = OpticalConfigId()
-                    opticalconfig_id.opticalconfig_uuid = opticalconfig_uuid_get_duuid(
-                        device_uuid)
-                    current_config_obj = context_client.SelectOpticalConfig(
-                        opticalconfig_id)
-
-                    if not current_config_obj or not current_config_obj.config:
-                        raise Exception(
-                            f"Could not fetch config for device {device_uuid}")
-
-                    # Parse config safely
-                    current_config = json.loads(current_config_obj.config) if isinstance(
-                        current_config_obj.config, str) else current_config_obj.config
-
-                    target_channel_name = None
-
-                    # [CHAFI-RSA-SLOT] Improved Channel Lookup (Sync with RSATools)
-                    if device_type in [DeviceTypeEnum.OPTICAL_TRANSPONDER.value, DeviceTypeEnum.EMULATED_OPTICAL_TRANSPONDER.value]:
-                        # Transponder: Match by endpoint_index (from metadata)
-                        endpoint_index = meta.get('endpoint_index')
-
-                        if endpoint_index:
-                            # 1. Map endpoint_index -> channel_name using config['endpoints']
-                            # config['endpoints'] list of dicts: {'endpoint_uuid': {'index': '1', 'channel': 'channel-0'}, ...}
-                            mapped_channel_name = None
-                            for ep in current_config.get('endpoints', []):
-                                ep_uuid = ep.get('endpoint_uuid', {})
-                                if str(ep_uuid.get('index')) == str(endpoint_index):
-                                    mapped_channel_name = ep_uuid.get(
-                                        'channel')
-                                    break
-
-                            if mapped_channel_name:
-                                # 2. Validate channel exists in config['channels']
-                                for ch in current_config.get('channels', []):
-                                    ch_name = ch.get('name', {})
-                                    # channel name index matches mapped channel name
-                                    if ch_name.get('index') == mapped_channel_name:
-                                        target_channel_name = mapped_channel_name
-                                        break
-
-                        if not target_channel_name:
-                            LOGGER.warning(
-                                f"[POC:AcquireSlots] Could not find channel for TR endpoint_index {endpoint_index}, trying name {endpoint_name}")
-                            # Fallback to name map if index logic failed
-                            # ... (could implement name fallback here if needed)
-
-                    elif device_type in [DeviceTypeEnum.OPTICAL_ROADM.value, DeviceTypeEnum.EMULATED_OPTICAL_ROADM.value,
-                                         DeviceTypeEnum.OPEN_ROADM.value, DeviceTypeEnum.EMULATED_OPEN_ROADM.value]:
-                        # ROADM: Match by endpoint.name (channel_index == endpoint_name)
-                        for channel in current_config.get('channels', []):
-                            ch_index = channel.get('channel_index')
-                            if not ch_index and isinstance(channel.get('name'), dict):
-                                ch_index = channel['name'].get('index')
-
-                            if str(ch_index) == str(endpoint_name):
-                                target_channel_name = ch_index
-                                break
-
-                    if not target_channel_name:
-                        # Fallback or Error
-                        LOGGER.error(
-                            f"[POC:AcquireSlots] Failed. DeviceType={device_type}, Name={endpoint_name}, Index={meta.get('endpoint_index')}")
-                        raise Exception(
-                            f"Could not find channel for endpoint {endpoint_name}")
-
-                    # LOGGER.info(f"[CHAFI-RSA-SLOT-NEW-BITMAP] Device={device_type} Endpoint={endpoint_name} NativeBitmap={native_bitmap_str} FlexSlots={native_flex_slots}")
-
-                    # 3d. Construct Update Payload
-                    # [CHAFI-RSA-SLOT] Must include ALL mandatory fields (type, channel_namespace, endpoints)
-                    # because Context Service uses UPSERT (INSERT keys ... ON CONFLICT UPDATE)
-                    # [CHAFI-RSA-SLOT] Retrieve existing channel data to preserve state
-                    existing_channel_data = {}
-                    if 'channels' in current_config:
-                        for ch in current_config['channels']:
-                            # Check match by name/index
-                            ch_idx = ch.get('name', {}).get('index') if isinstance(
-                                ch.get('name'), dict) else ch.get('name')
-                            if not ch_idx and 'channel_index' in ch:
-                                ch_idx = ch['channel_index']
-
-                            if str(ch_idx) == str(target_channel_name):
-                                existing_channel_data = ch
-                                break
-
-                    update_payload = {
-                        "new_config": {
-                            "type": current_config.get('type'),
-                            "channel_namespace": current_config.get('channel_namespace'),
-                            "endpoints": current_config.get('endpoints', []),
-                            "channels": [
-                                {
-                                    "name": {"index": target_channel_name},
-                                    "bitmap_value": native_bitmap_str,
-                                    "flex_slots": native_flex_slots,
-                                    # Preserve existing values or default to 0 if not found
-                                    "frequency": existing_channel_data.get("frequency", 0),
-                                    "operational-mode": existing_channel_data.get("operational-mode", 0),
-                                    "target-output-power": existing_channel_data.get("target-output-power", ""),
-                                    "status": existing_channel_data.get("status", ""),
-                                    # [CHAFI-RSA-SLOT] Preserve Transponder frequency bounds
-                                    "min_frequency": existing_channel_data.get("min_frequency", 0),
-                                    "max_frequency": existing_channel_data.get("max_frequency", 0),
-                                    # [CHAFI-RSA-SLOT] Preserve ROADM specific fields
-                                    "lower_frequency": int(existing_channel_data["lower_frequency"]) if "lower_frequency" in existing_channel_data else 0,
-                                    "upper_frequency": int(existing_channel_data["upper_frequency"]) if "upper_frequency" in existing_channel_data else 0,
-                                    "dest_port": existing_channel_data.get("dest_port"),
-                                    "src_port": existing_channel_data.get("src_port"),
-                                    "band_name": existing_channel_data.get("band_name"),
-                                    "type": existing_channel_data.get("type", "media_channel"),
-                                }
-                            ]
-                        }
-                    }
+                    device_updates.append(prepare_device_allocations(
+                        context_client, device_uuid,
+                        [(meta, allocation_mask, reference_slots) for meta in device_metas]))
 
-                    config_update = OpticalConfig()
-                    config_update.opticalconfig_id.CopyFrom(opticalconfig_id)
-                    # Start of Fix for gRPC Error: ensure device_id is set
-                    if hasattr(current_config_obj, 'device_id'):
-                        config_update.device_id.CopyFrom(
-                            current_config_obj.device_id)
-                    # End of Fix
-                    config_update.config = json.dumps(update_payload)
-
-                    # 3e. Perform Update
-                    context_client.UpdateOpticalConfig(config_update)
-
-                    # LOGGER.info(f"[POC:AcquireSlots] Updated {endpoint_name} (Channel {target_channel_name}): {native_bitmap_str}")
-                    updated_endpoints.append({
-                        "device": device_uuid,
-                        "endpoint": endpoint_name,
-                        "channel": target_channel_name,
-                        "new_bitmap": native_bitmap_str
-                    })
+                except SlotConflictError as ex:
+                    LOGGER.error(
+                        f"[POC:AcquireSlots] Slot conflict on device {device_uuid}: {ex}")
+                    conflicts.append(str(ex))
 
                 except Exception as ex:
                     LOGGER.error(
-                        f"[POC:AcquireSlots] Error updating endpoint {meta.get('endpoint_name')}: {ex}")
+                        f"[POC:AcquireSlots] Error updating device {device_uuid}: {ex}")
+                    errors.append(str(ex))
+
+            if conflicts:
+                # Context has the slots in use although the snapshot had them free
+                SNAPSHOT_MANAGER.invalidate("AcquireSlots flow {} (slot conflict)".format(flow_id))
+                return {"error": f"Slots of {path_type} are already in use. Re-run RSA.",
+                        "errors": conflicts + errors}, 409
+
+            for device_update in device_updates:
+                try:
+                    device_updated, device_masks = device_update.write(context_client)
+                    updated_endpoints.extend(device_updated)
+                    endpoint_masks.update(device_masks)
+
+                except Exception as ex:
+                    LOGGER.error(
+                        f"[POC:AcquireSlots] Error updating device {device_update.device_uuid}: {ex}")
                     errors.append(str(ex))
 
             if errors:
+                if updated_endpoints:
+                    SNAPSHOT_MANAGER.invalidate(
+                        "AcquireSlots flow {} (partial)".format(flow_id))
                 return {"status": "partial_success", "updated": updated_endpoints, "errors": errors}, 207
 
-            # [CHAFI-RSA-SLOT] Step 4: Update OpticalLink status to 'used'
+            # [CHAFI-RSA-SLOT] Step 4: Update OpticalLink status to 'used' and (Step 6) Service status to ACTIVE
+            # [CHAFI-THESIS] Both are independent RPCs: issued concurrently on a bounded pool.
+            # A failed link/service update does not fail the whole request; its error is reported.
             path_links = rsa_result.get('links', [])
-            # LOGGER.info(f"[LINKMARK-DEBUG] ===== STEP 4: Marking links in DB =====")
-            # LOGGER.info(f"[LINKMARK-DEBUG] flow_id={flow_id}, path_index={path_index}, path_type={path_type}")
-            # LOGGER.info(f"[LINKMARK-DEBUG] rsa_result has {len(path_links)} links to mark")
+            used_link_uuids = set()
             for link_item in path_links:
-                try:
-                    # 1. Get current link
-                    # Imports moved to top
-                    link_id = LinkId()
-
-                    # Check if link_item is a dict (from db_flows) or string (uuid)
-                    if isinstance(link_item, dict):
-                        # Extract UUID from 'id' field
-                        target_uuid = link_item.get('id')
-                        link_name = link_item.get('name', 'N/A')
-                        link_src = link_item.get('src', 'N/A')
-                        link_dst = link_item.get('dst', 'N/A')
-                        link_src_port = link_item.get('src_port', 'N/A')
-                        link_dst_port = link_item.get('dst_port', 'N/A')
-                        # LOGGER.info(f"[LINKMARK-DEBUG] Link: {link_name} | {link_src}:{link_src_port} -> {link_dst}:{link_dst_port} | uuid={target_uuid}")
-                        if not target_uuid:
-                            LOGGER.warning(
-                                f"[POC:AcquireSlots] Link dict missing 'id': {link_item}")
-                            continue
-                    else:
-                        # Assume it's a UUID string
-                        target_uuid = str(link_item)
-                        # LOGGER.info(f"[LINKMARK-DEBUG] Link UUID (string): {target_uuid}")
-
-                    link_id.link_uuid.uuid = target_uuid
-                    optical_link = context_client.GetOpticalLink(link_id)
-
-                    # 2. Update used status
-                    # The OpticalLink message structure (common.proto.context_pb2)
-                    # usually has optical_details inside.
-                    if hasattr(optical_link, 'optical_details'):
-                        optical_link.optical_details.used = True
-                        context_client.SetOpticalLink(optical_link)
-                        # LOGGER.info(f"[LINKMARK-DEBUG] DB UPDATED: link {target_uuid} marked used=True")
-                    else:
-                        LOGGER.warning(
-                            f"[POC:AcquireSlots] Link {target_uuid} has no optical_details")
-
-                except Exception as link_ex:
-                    LOGGER.error(
-                        f"[POC:AcquireSlots] Error updating link {target_uuid}: {link_ex}")
-                    # We don't fail the whole request for a link update failure, but we log it
+                target_uuid = get_link_uuid(link_item)
+                if not target_uuid:
+                    LOGGER.warning(
+                        f"[POC:AcquireSlots] Link dict missing 'id': {link_item}")
+                    continue
+                used_link_uuids.add(target_uuid)
+
+            service_uuid = db_flows[flow_id].get('service_uuid')
+            if not service_uuid:
+                LOGGER.warning(
+                    f"[POC:AcquireSlots] No service_uuid found for flow {flow_id}, skipping status update")
+
+            link_errors, failed_link_uuids = mark_links_and_activate_services(
+                context_client, list(used_link_uuids), [service_uuid])
+
+            # [CHAFI-THESIS] Patch the shared snapshot in place (link flags, graph views, bitmaps);
+            # links whose SetOpticalLink failed stay unused there, as in Context
+            SNAPSHOT_MANAGER.apply_acquisition(list(used_link_uuids - set(failed_link_uuids)), endpoint_masks)
 
             # [CHAFI-RSA-SLOT] Step 5: Update cached computed_paths to reflect used status
-            # LOGGER.info(f"[LINKMARK-DEBUG] ===== STEP 5: Updating in-memory cache =====")
             try:
-                used_link_uuids = set()
-                for link_item in path_links:
-                    if isinstance(link_item, dict):
-                        used_link_uuids.add(link_item.get('id'))
-                    else:
-                        used_link_uuids.add(str(link_item))
-
-                # LOGGER.info(f"[LINKMARK-DEBUG] used_link_uuids to mark in cache: {used_link_uuids}")
-
-                if 'computed_paths' in db_flows[flow_id]:
-                    def update_path_list(path_list, list_name):
-                        for path_idx, path in enumerate(path_list):
-                            path_invalidated = False
-                            for link in path.get('links', []):
-                                link_id_in_path = link.get('id')
-                                if link_id_in_path in used_link_uuids:
-                                    link['used'] = True
-                                    link['status'] = 'USED'
-                                    path_invalidated = True
-                                    # LOGGER.info(f"[LINKMARK-DEBUG] CACHE MATCH: {list_name}[{path_idx}] link {link.get('name')} (uuid={link_id_in_path}) marked USED")
-
-                            if path_invalidated:
-                                path['is_valid'] = False
-
-                    update_path_list(db_flows[flow_id]['computed_paths'].get(
-                        'all_paths', []), 'all_paths')
-                    update_path_list(db_flows[flow_id]['computed_paths'].get(
-                        'dijkstra', []), 'dijkstra')
-                    # LOGGER.info(f"[POC:AcquireSlots] Updated cached paths for flow {flow_id} to reflect used links")
-
+                mark_flow_paths_used(flow_id, used_link_uuids)
             except Exception as cache_ex:
                 LOGGER.warning(
                     f"[POC:AcquireSlots] Error updating cached paths: {cache_ex}")
 
-            # [CHAFI-RSA-SLOT] Step 6: Update Service Status to ACTIVE
-            try:
-                service_uuid = db_flows[flow_id].get('service_uuid')
-                if service_uuid:
-                    # Helper to update service status
-                    # Imports moved to top
-
-                    ctx_client = ContextClient()
-                    ctx_client.connect()
-                    try:
-                        # 1. Create ServiceId
-                        # We assume default context for now or extract from somewhere if needed
-                        # But GetService requires ServiceId which needs ContextId
-                        # ParallelOpticalTools uses DEFAULT_CONTEXT_NAME
-                        # Let's try to construct it.
-                        c_id = ContextId()
-                        c_id.context_uuid.uuid = "admin"  # DEFAULT_CONTEXT_NAME
-                        s_id = ServiceId()
-                        s_id.context_id.CopyFrom(c_id)
-                        s_id.service_uuid.uuid = service_uuid
-
-                        # 2. Get Service
-                        svc = ctx_client.GetService(s_id)
-
-                        # 3. Update Status
-                        svc.service_status.service_status = ServiceStatusEnum.SERVICESTATUS_ACTIVE
-
-                        # 4. Set Service (Update)
-                        ctx_client.SetService(svc)
-                        # LOGGER.info(f"[POC:AcquireSlots] Updated Service {service_uuid} status to ACTIVE")
-                    except Exception as e:
-                        LOGGER.error(
-                            f"[POC:AcquireSlots] Failed to update service status: {e}")
-                    finally:
-                        ctx_client.close()
-                else:
-                    LOGGER.warning(
-                        f"[POC:AcquireSlots] No service_uuid found for flow {flow_id}, skipping status update")
-            except Exception as svc_ex:
-                LOGGER.error(
-                    f"[POC:AcquireSlots] Error during service status update: {svc_ex}")
-
             # [CHAFI-RSA-SLOT] Step 7: Mark Flow as ACTIVE
-            db_flows[flow_id]['status'] = 'ACTIVE'
-            db_flows[flow_id]['acquired_path_type'] = path_type
-            # [CHAFI-THESIS] Store acquired path links for display
-            computed = flow_data.get('computed_paths', {})
-            if path_type == "dijkstra":
-                dijkstra = computed.get('dijkstra', [])
-                db_flows[flow_id]['acquired_path_links'] = dijkstra[0].get('links', []) if dijkstra else []
-            elif path_index is not None:
-                all_paths = computed.get('all_paths', [])
-                db_flows[flow_id]['acquired_path_links'] = all_paths[path_index].get('links', []) if path_index < len(all_paths) else []
-
-            elapsed_time = time.time() - start_time
+            activate_flow(flow_id, path_type, path_index)
+
+            elapsed_time = time.perf_counter() - start_time
             # LOGGER.info(f"[POC:AcquireSlots] Flow {flow_id} status updated to ACTIVE (Path: {path_type}). Total time: {elapsed_time:.4f} seconds")
 
-            return {"status": "success", "updated": updated_endpoints, "flow_status": "ACTIVE", "elapsed_time": elapsed_time}, 200
+            return {"status": "success", "updated": updated_endpoints, "flow_status": "ACTIVE", "errors": link_errors,
+                    "elapsed_time": elapsed_time}, 200
 
         except Exception as e:
             LOGGER.error(f"[POC:AcquireSlots] Context connection error: {e}")
             LOGGER.error(traceback.format_exc())
             return {"error": str(e)}, 500
 
+        finally:
+            CONTEXT_CLIENT_POOL.release(context_client)
+            # The snapshot is patched (or invalidated) by now, so the hold is no longer needed
+            RESERVATION_LEDGER.release_flow(flow_id)
+            observe_phase('acquisition', time.perf_counter() - start_time)
+
+
+# [CHAFI-THESIS-START] - BatchProvision endpoint
+@optical.route('/BatchProvision')
+@optical.response(200, 'Success')
+@optical.response(207, 'Partial Success')
+@optical.response(400, 'Bad Request')
+@optical.response(409, 'Slots of every planned demand reserved by other requests')
+@optical.response(500, 'Error')
+class BatchProvision(Resource):
+    @staticmethod
+    def post():
+        """
+        [CHAFI-PARALLEL-OPTICAL] Plan and acquire many lightpaths against one topology snapshot.
+
+        Demands are registered as flows, sorted by sort_policy and planned one
+        after the other on a working copy of the snapshot: each successful RSA
+        reserves its slots and links before the next demand is planned, so the
+        batch never double-books spectrum. Each plan is also reserved in the
+        reservation ledger (kept until AcquireSlots when commit=false). With
+        commit=true every device is read and checked first, demands touching a
+        conflicting device are dropped, and the rest is written with one
+        OpticalConfig update per device. A demand whose write fails gives its
+        slots back on the devices already written (PARTIAL if that fails too).
+
+        JSON Body:
+            demands: List of AddLightpath bodies
+            sort_policy: none | largest_first | longest_path_first (optional)
+            commit: Acquire the planned slots in Context (optional, default true)
+            trace_level: none | summary | full (optional, default none)
+        """
+        start_time = time.perf_counter()
+        data = request.get_json() or {}
+
+        demands = data.get('demands')
+        if not isinstance(demands, list) or not demands:
+            return {"error": "demands must be a non-empty list"}, 400
+        sort_policy = data.get('sort_policy', DEFAULT_SORT_POLICY)
+        if sort_policy not in SORT_POLICIES:
+            return {"error": "sort_policy must be one of {}".format(", ".join(SORT_POLICIES))}, 400
+        trace_level = data.get('trace_level', TRACE_LEVEL_NONE)
+        if trace_level not in TRACE_LEVELS:
+            return {"error": "trace_level must be one of {}".format(", ".join(TRACE_LEVELS))}, 400
+        commit = bool(data.get('commit', True))
+        for demand in demands:
+            error = validate_spectrum_policy(demand)
+            if error:
+                return {"error": error}, 400
+
+        try:
+            snapshot = SNAPSHOT_MANAGER.get_snapshot()
+        except Exception as e:
+            LOGGER.error("[CHAFI-RSA] Snapshot error: {}".format(e))
+            return {"error": "Topology snapshot unavailable: {}".format(e)}, 500
+
+        # [CHAFI-THESIS] 1. Plan every demand on the working copy (provisional reservations)
+        # Slots reserved by concurrent PerformRSA requests count as occupied
+        snapshot_version = snapshot.version
+        planner = BatchPlanner(snapshot, RESERVATION_LEDGER.held_masks())
+        flow_ids = [create_flow(demand) for demand in demands]
+        results = [None] * len(demands)
+        selected_results = {}  # position -> successful RSA result
+        t_plan_start = time.perf_counter()
+
+        for position in planner.sort_demands(demands, sort_policy):
+            flow_id = flow_ids[position]
+            try:
+                planned = planner.plan_demand(db_flows[flow_id], trace_level)
+            except Exception as e:
+                LOGGER.error("[CHAFI-RSA] BatchProvision flow_id={} planning error: {}".format(flow_id, e))
+                results[position] = {"flow_id": flow_id, "status": "FAILED", "error": str(e)}
+                fail_flow(flow_id)
+                continue
+
+            db_flows[flow_id]['computed_paths'] = planned['paths_info']
+            db_flows[flow_id]['snapshot_version'] = snapshot.version
+            db_flows[flow_id]['dijkstra_rsa_result'] = planned['dijkstra_rsa_result']
+
+            selected = planned['selected']
+            if selected is None:
+                results[position] = {
+                    "flow_id": flow_id, "status": "FAILED",
+                    "error": planned['dijkstra_rsa_result'].get('error') or "No path with enough free slots"
+                }
+                fail_flow(flow_id)
+                continue
+            # [CHAFI-THESIS] Compare-and-set: fails if the snapshot moved on while the batch was planned
+            rsa_result = selected['rsa_result']
+            reservation = RESERVATION_LEDGER.reserve(
+                flow_id, selected['path_type'], allocation_endpoint_masks(rsa_result), snapshot_version)
+            if reservation is None:
+                results[position] = {
+                    "flow_id": flow_id, "status": "FAILED",
+                    "error": "Topology changed while the batch was planned, retry"
+                }
+                fail_flow(flow_id)
+                continue
+            rsa_result['reservation_id'] = reservation.reservation_id
+            rsa_result['reservation_expires_at'] = reservation.expires_at
+
+            if selected['path_index'] is not None:
+                db_flows[flow_id]["alternative_{}_rsa_result".format(selected['path_index'])] = rsa_result
+            selected_results[position] = rsa_result
+            results[position] = {
+                "flow_id": flow_id, "status": "PLANNED",
+                "path_type": selected['path_type'],
+                "path_index": selected['path_index'],
+                "rsa_result": TopologyHelper.render_rsa_result(selected['rsa_result'])
+            }
+        t_plan = time.perf_counter() - t_plan_start
+
+        planned_positions = sorted(selected_results)
+        response = {
+            "sort_policy": sort_policy,
+            "snapshot_version": snapshot.version,
+            "committed": False,
+            "results": results,
+            "planned_count": len(planned_positions),
+            "failed_count": len(demands) - len(planned_positions)
+        }
+        if not commit or not planned_positions:
+            response["elapsed_time"] = time.perf_counter() - start_time
+            return response, 200
+
+        # [CHAFI-THESIS] 2. Claim every planned demand and group its allocations by device
+        # A demand whose slots were taken by another flow meanwhile is left out (409)
+        demand_allocations = {}  # position -> device_uuid -> [(meta, allocation_mask, reference_slots)]
+        claimed_positions = []
+        for position in planned_positions:
+            rsa_result = selected_results[position]
+            if RESERVATION_LEDGER.claim(
+                    flow_ids[position], results[position]['path_type'], allocation_endpoint_masks(rsa_result)) is None:
+                RESERVATION_LEDGER.release_flow(flow_ids[position])
+                results[position] = {
+                    "flow_id": flow_ids[position], "status": "FAILED", "status_code": 409,
+                    "error": "Slots of {} are reserved by another request. Re-run RSA.".format(
+                        results[position]['path_type'])
+                }
+                fail_flow(flow_ids[position])
+                continue
+            claimed_positions.append(position)
+            by_device = group_acquisition_by_device(rsa_result.get('acquisition_metadata', []))
+            demand_allocations[position] = {
+                device_uuid: [(meta, rsa_result['mask'], rsa_result.get('reference_slots', 0)) for meta in device_metas]
+                for device_uuid, device_metas in by_device.items()
+            }
+        conflicts = len(planned_positions) - len(claimed_positions)
+        planned_positions = claimed_positions
+        response["planned_count"] = len(planned_positions)
+        response["failed_count"] = len(demands) - len(planned_positions)
+        if not planned_positions:
+            response["elapsed_time"] = time.perf_counter() - start_time
+            return response, 409
+
+        try:
+            context_client = CONTEXT_CLIENT_POOL.acquire()
+        except Exception as e:
+            LOGGER.error(f"[POC:BatchProvision] Context connection error: {e}")
+            for position in planned_positions:
+                RESERVATION_LEDGER.release_flow(flow_ids[position])
+            return {"error": str(e)}, 500
+
+        try:
+            # [CHAFI-THESIS] 3. Read and check every device before writing any (one read per device)
+            # A demand on a device with slots in use (or unreadable) is left out; the devices it
+            # shares with other demands are read again for those alone.
+            t_commit_start = time.perf_counter()
+            device_allocations = group_batch_allocations(demand_allocations, planned_positions)
+            device_updates = {}  # device_uuid -> DeviceSlotUpdate
+            conflict_devices = set()
+            pending = set(device_allocations)
+            while pending:
+                rejected = {}  # device_uuid -> (status_code, error)
+                for device_uuid in pending:
+                    try:
+                        device_updates[device_uuid] = prepare_device_allocations(
+                            context_client, device_uuid, device_allocations[device_uuid])
+                    except SlotConflictError as ex:
+                        LOGGER.error(f"[POC:BatchProvision] Slot conflict on device {device_uuid}: {ex}")
+                        rejected[device_uuid] = (409, str(ex))
+                        conflict_devices.add(device_uuid)
+                    except Exception as ex:
+                        LOGGER.error(f"[POC:BatchProvision] Error reading device {device_uuid}: {ex}")
+                        rejected[device_uuid] = (500, str(ex))
+
+                pending = set()
+                for position in list(planned_positions):
+                    rejected_devices = sorted(set(demand_allocations[position]) & set(rejected))
+                    if not rejected_devices:
+                        continue
+                    planned_positions.remove(position)
+                    conflicts += 1
+                    RESERVATION_LEDGER.release_flow(flow_ids[position])
+                    results[position] = {
+                        "flow_id": flow_ids[position], "status": "FAILED",
+                        "status_code": max(rejected[device_uuid][0] for device_uuid in rejected_devices),
+                        "errors": [rejected[device_uuid][1] for device_uuid in rejected_devices]
+                    }
+                    fail_flow(flow_ids[position])
+                    pending.update(set(demand_allocations[position]) - set(rejected))
+                device_allocations = group_batch_allocations(demand_allocations, planned_positions)
+                device_updates = {d: u for d, u in device_updates.items() if d in device_allocations}
+                pending &= set(device_allocations)
+
+            response["planned_count"] = len(planned_positions)
+            response["failed_count"] = len(demands) - len(planned_positions)
+            if not planned_positions:
+                if conflict_devices:
+                    SNAPSHOT_MANAGER.invalidate("BatchProvision (slot conflicts)")
+                response["elapsed_time"] = time.perf_counter() - start_time
+                return response, 409
+
+            # [CHAFI-THESIS] 4. One write per device for the whole batch
+            written_devices = set()
+            failed_devices = {}
+            for device_uuid, device_update in device_updates.items():
+                try:
+                    device_update.write(context_client)
+                    written_devices.add(device_uuid)
+                except Exception as ex:
+                    LOGGER.error(f"[POC:BatchProvision] Error updating device {device_uuid}: {ex}")
+                    failed_devices[device_uuid] = str(ex)
+
+            # [CHAFI-THESIS] 5. A demand with a failed device gives its slots back on the written ones;
+            # slots that cannot be given back are reported (PARTIAL) instead of leaking silently
+            committed_positions = []
+            for position in planned_positions:
+                flow_id = flow_ids[position]
+                failed = sorted(set(demand_allocations[position]) & set(failed_devices))
+                if not failed:
+                    committed_positions.append(position)
+                    continue
+                orphaned_devices = []
+                for device_uuid in sorted(set(demand_allocations[position]) & written_devices):
+                    try:
+                        prepare_device_release(
+                            context_client, device_uuid, demand_allocations[position][device_uuid]
+                        ).write(context_client)
+                    except Exception as ex:
+                        LOGGER.error(f"[POC:BatchProvision] Slots of flow {flow_id} left allocated "
+                                     f"on device {device_uuid}: {ex}")
+                        orphaned_devices.append(device_uuid)
+                results[position]['status'] = 'PARTIAL' if orphaned_devices else 'FAILED'
+                fail_flow(flow_id, results[position]['status'])
+                results[position]['errors'] = [failed_devices[d] for d in failed]
+                if orphaned_devices:
+                    results[position]['orphaned_devices'] = orphaned_devices
+
+            # [CHAFI-THESIS] 6. Links and services of fully written demands, issued concurrently
+            used_link_uuids = set()
+            service_uuids = []
+            endpoint_masks = {}
+            for position in committed_positions:
+                rsa_result = selected_results[position]
+                used_link_uuids.update(uuid for uuid in map(get_link_uuid, rsa_result.get('links', [])) if uuid)
+                service_uuids.append(db_flows[flow_ids[position]].get('service_uuid'))
+                for endpoint_uuid, native_mask in allocation_endpoint_masks(rsa_result).items():
+                    endpoint_masks[endpoint_uuid] = endpoint_masks.get(endpoint_uuid, 0) | native_mask
+
+            link_errors, failed_link_uuids = mark_links_and_activate_services(
+                context_client, list(used_link_uuids), service_uuids)
+
+            # [CHAFI-THESIS] 7. Patch the shared snapshot (or drop it if Context had the slots in use
+            # although the snapshot had them free, or was rolled back / is partial)
+            if failed_devices:
+                SNAPSHOT_MANAGER.invalidate("BatchProvision ({} device updates failed)".format(len(failed_devices)))
+            elif conflict_devices:
+                SNAPSHOT_MANAGER.invalidate("BatchProvision (slot conflicts)")
+            else:
+                SNAPSHOT_MANAGER.apply_acquisition(list(used_link_uuids - set(failed_link_uuids)), endpoint_masks)
+
+            for position in committed_positions:
+                flow_id = flow_ids[position]
+                try:
+                    mark_flow_paths_used(flow_id, used_link_uuids)
+                except Exception as cache_ex:
+                    LOGGER.warning(
+                        f"[POC:BatchProvision] Error updating cached paths of flow {flow_id}: {cache_ex}")
+                activate_flow(flow_id, results[position]['path_type'], results[position]['path_index'])
+                results[position]['status'] = 'ACTIVE'
+            t_commit = time.perf_counter() - t_commit_start
+            observe_phase('acquisition', t_commit)
+
+        except Exception as e:
+            LOGGER.error(f"[POC:BatchProvision] Commit error: {e}")
+            LOGGER.error(traceback.format_exc())
+            SNAPSHOT_MANAGER.invalidate("BatchProvision commit error")
+            return {"error": str(e), "results": results}, 500
+
+        finally:
+            CONTEXT_CLIENT_POOL.release(context_client)
+            for position in planned_positions:
+                RESERVATION_LEDGER.release_flow(flow_ids[position])
+
+        elapsed_time = time.perf_counter() - start_time
+        LOGGER.info(
+            "[CHAFI-TIMING] BatchProvision | snapshot v{} | demands={} planned={} active={} devices={} | "
+            "PLAN: {:.4f}s | COMMIT: {:.4f}s | TOTAL: {:.4f}s".format(
+                snapshot.version, len(demands), len(planned_positions), len(committed_positions),
+                len(device_updates), t_plan, t_commit, elapsed_time))
+
+        response.update({
+            "committed": True,
+            "active_count": len(committed_positions),
+            "devices_updated": len(written_devices),
+            "errors": list(failed_devices.values()) + link_errors,
+            "elapsed_time": elapsed_time
+        })
+        return response, (207 if failed_devices or conflicts else 200)
+# [CHAFI-THESIS-END]
+
 
 if __name__ == '__main__':
     # LOGGER.info("Starting Parallel Optical Controller on port 10075...")
+    if SNAPSHOT_EVENTS:
+        SNAPSHOT_SUBSCRIBER.start()
     app.run(host='0.0.0.0', port=10075, debug=False)
@@ -0,0 +1,152 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+[CHAFI-THESIS-START]
+Path Cache Module for Parallel Optical Controller
+
+When TFS re-creates services it sends bursts of PerformRSA requests for the
+same endpoints against an unchanged topology, and each of them would repeat
+the same dijkstra and k-shortest path search. PathCache keys find_paths()
+results on (src, src_index, dst, dst_index, additional_hops, k_paths) plus
+the snapshot version:
+
+    - single flight: concurrent requests for a key wait for the one search
+      in progress instead of starting their own
+    - cache: results of the current version are kept until the version
+      moves (acquisition, invalidation or rebuild), PATH_CACHE_MAX_ENTRIES
+      at most (least recently used ones are dropped)
+
+Only the path search is shared; spectrum assignment still runs per request.
+Callers get a deep copy, since flows mark their own paths USED later on.
+Requests on an older version than the cache's are coalesced but not cached.
+
+Classes:
+    - PathCache: Single-flight, version-keyed cache of find_paths() results
+[CHAFI-THESIS-END]
+"""
+
+import copy
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+from .Metrics import register_cache_stats
+
+LOGGER = logging.getLogger(__name__)
+
+# [CHAFI-THESIS] Path sets kept for the current snapshot version
+PATH_CACHE_MAX_ENTRIES = int(os.environ.get('PATH_CACHE_MAX_ENTRIES', '4096'))
+
+
+class _Search:
+    """A find_paths() call in progress and the requests waiting for it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None  # type: Optional[Dict]
+        self.error = None   # type: Optional[BaseException]
+
+
+class PathCache:
+    """
+    [CHAFI-THESIS] Single-flight, version-keyed cache of find_paths() results.
+
+    Attributes:
+        version: Snapshot version the cached results belong to
+        hits: Requests served from the cache
+        misses: Requests that ran the search
+        coalesced: Requests that waited for a search started by another request
+    """
+
+    def __init__(self, max_entries: int = PATH_CACHE_MAX_ENTRIES):
+        self._max_entries = max_entries
+        self._entries = OrderedDict()  # type: OrderedDict
+        self._in_flight = {}  # type: Dict[tuple, _Search]
+        self._lock = threading.Lock()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key: Hashable, snapshot_version: Optional[int], search: Callable[[], Dict]) -> Dict:
+        """
+        find_paths() result for key on snapshot_version, searching at most once per version.
+
+        Args:
+            key: (src, src_index, dst, dst_index, additional_hops, k_paths)
+            snapshot_version: Version of the graph search() reads (None disables caching)
+            search: Callable running find_paths() on that version
+
+        Returns:
+            dict: Copy of the result; 'timing' is zero unless this request ran the search
+        """
+        if snapshot_version is None:
+            return search()
+
+        flight_key = (snapshot_version, key)
+        with self._lock:
+            if self.version is None or snapshot_version > self.version:
+                self.version = snapshot_version
+                self._entries.clear()
+            if snapshot_version == self.version and key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._copy(self._entries[key])
+            pending = self._in_flight.get(flight_key)
+            if pending is None:
+                pending = self._in_flight[flight_key] = _Search()
+                leader = True
+                self.misses += 1
+            else:
+                leader = False
+                self.coalesced += 1
+
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return self._copy(pending.result)
+
+        try:
+            pending.result = search()
+        except BaseException as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[flight_key]
+                if pending.error is None and snapshot_version == self.version:
+                    self._entries[key] = pending.result
+                    while len(self._entries) > self._max_entries:
+                        self._entries.popitem(last=False)
+            pending.done.set()
+        return copy.deepcopy(pending.result)
+
+    @staticmethod
+    def _copy(result: Dict) -> Dict:
+        result = copy.deepcopy(result)
+        result['timing'] = {name: 0.0 for name in result.get('timing', {})}
+        return result
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+# [CHAFI-THESIS] Process-wide path cache (PerformRSA)
+PATH_CACHE = PathCache()
+register_cache_stats('paths', lambda: (PATH_CACHE.hits + PATH_CACHE.coalesced, PATH_CACHE.misses))
@@ -0,0 +1,188 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+[CHAFI-THESIS-START]
+RSA Context Module for Parallel Optical Controller
+
+The dijkstra path and the alternative paths of a flow share most of their
+hops, and every hop costs a parallel-link lookup plus the intersection of the
+aligned bitmaps on both of its sides. A flow's RSAContext keeps those hop
+bitmaps (without held slots) for the snapshot version the flow last read,
+keyed by (link_uuid, band), so PerformRSA, PerformAdditionalPathRSA and
+EvaluatePaths only intersect each hop once per version. Moving to another
+version drops the memo: its bitmaps may miss slots acquired since.
+
+evaluate_paths() runs RSA on all candidate paths of a flow in one pass and
+ranks them: feasible paths first, then by the absolute frequency of the
+chosen start slot (reference frames differ between bands), then by hop count.
+
+Classes:
+    - RSAContext: Per-flow hop bitmap memo
+    - RSAContextRegistry: Bounded flow_id -> RSAContext map
+
+Functions:
+    - candidate_paths: (path_type, path_obj) of the dijkstra and alternative paths
+    - evaluate_paths: RSA on every candidate path, ranked
+[CHAFI-THESIS-END]
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from common.ITUStandards import BAND_SLOT_RANGES
+
+from .RSAHelper import TopologyHelper, TRACE_LEVEL_NONE
+
+LOGGER = logging.getLogger(__name__)
+
+# [CHAFI-THESIS] Flows whose RSA context is kept (least recently used ones are dropped)
+RSA_CONTEXT_MAX_FLOWS = int(os.environ.get('RSA_CONTEXT_MAX_FLOWS', '1024'))
+
+
+class RSAContext:
+    """
+    [CHAFI-THESIS] Hop bitmaps of one flow for one snapshot version.
+
+    Attributes:
+        flow_id: Flow the context belongs to
+        snapshot_version: Version the memo was filled from (None until first use)
+    """
+
+    def __init__(self, flow_id):
+        self.flow_id = flow_id
+        self.snapshot_version = None
+        self._hops = {}  # type: Dict[Tuple[str, str], Dict]
+        self._lock = threading.Lock()
+
+    def hop_memo(self, snapshot_version: Optional[int]) -> Optional[Dict]:
+        """
+        Hop memo for a snapshot version, for TopologyHelper.perform_rsa(hop_memo=...).
+
+        Returns:
+            dict: (link_uuid, band_enum_name) -> hop bitmaps, or None for an unversioned cache
+        """
+        if snapshot_version is None:
+            return None
+        with self._lock:
+            if snapshot_version != self.snapshot_version:
+                self.snapshot_version = snapshot_version
+                self._hops = {}
+            return self._hops
+
+    def __len__(self):
+        return len(self._hops)
+
+
+class RSAContextRegistry:
+    """[CHAFI-THESIS] Thread-safe flow_id -> RSAContext map, bounded to max_flows (LRU)."""
+
+    def __init__(self, max_flows: int = RSA_CONTEXT_MAX_FLOWS):
+        self._max_flows = max_flows
+        self._contexts = OrderedDict()  # type: OrderedDict
+        self._lock = threading.Lock()
+
+    def get(self, flow_id) -> RSAContext:
+        """RSAContext of a flow, created on first use."""
+        with self._lock:
+            context = self._contexts.get(flow_id)
+            if context is None:
+                context = RSAContext(flow_id)
+                self._contexts[flow_id] = context
+                while len(self._contexts) > self._max_flows:
+                    self._contexts.popitem(last=False)
+            else:
+                self._contexts.move_to_end(flow_id)
+            return context
+
+    def discard(self, flow_id) -> None:
+        """Drop a flow's context (flow activated, expired or deleted)."""
+        with self._lock:
+            self._contexts.pop(flow_id, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._contexts)
+
+
+def candidate_paths(computed_paths: Dict) -> List[Tuple[str, Dict]]:
+    """(path_type, path_obj) of the dijkstra path and every alternative path, in that order."""
+    candidates = [('dijkstra', path) for path in computed_paths.get('dijkstra', [])[:1]]
+    candidates.extend(
+        ('alternative_{}'.format(index), path) for index, path in enumerate(computed_paths.get('all_paths', [])))
+    return candidates
+
+
+def _start_position(rsa_result: Dict) -> int:
+    """Start slot of a result in the WHOLE_BAND frame (comparable across bands)."""
+    band_info = rsa_result.get('band_info') or {}
+    band_low = BAND_SLOT_RANGES.get(band_info.get('band_enum_name'), (0, 0))[0]
+    return band_low + rsa_result['start_slot']
+
+
+def evaluate_paths(context: RSAContext, candidates: List[Tuple[str, Dict]], bandwidth: float, cache,
+                   snapshot_version: Optional[int], held_masks: Optional[Dict[str, int]] = None,
+                   spectrum_policy: Optional[str] = None, preferred_band: Optional[str] = None,
+                   trace_level: str = TRACE_LEVEL_NONE) -> List[Dict]:
+    """
+    Runs RSA on every candidate path with the flow's hop memo and ranks the results.
+
+    Nothing is reserved here; the caller reserves the path it keeps.
+
+    Args:
+        context: RSAContext of the flow
+        candidates: (path_type, path_obj) list, see candidate_paths()
+        bandwidth: Requested bandwidth in Gbps
+        cache: OpticalLinksCache of snapshot_version
+        snapshot_version: Version of cache (None disables the memo)
+        held_masks: Slots held by other flows (ReservationLedger.held_masks())
+        spectrum_policy: Spectrum policy of the flow
+        preferred_band: Preferred band of the flow
+        trace_level: RSA trace verbosity
+
+    Returns:
+        list: One entry per candidate, best first, with path_type, rank, success,
+              start_position (WHOLE_BAND frame, None if infeasible), num_hops and rsa_result
+    """
+    hop_memo = context.hop_memo(snapshot_version)
+    evaluations = []
+    for order, (path_type, path_obj) in enumerate(candidates):
+        rsa_result = TopologyHelper.perform_rsa(
+            path_obj=path_obj, bandwidth=bandwidth, cache=cache, trace_level=trace_level,
+            held_masks=held_masks, spectrum_policy=spectrum_policy, preferred_band=preferred_band,
+            hop_memo=hop_memo)
+        if rsa_result is None:
+            rsa_result = {"success": False, "error": "perform_rsa returned None"}
+        success = bool(rsa_result.get('success'))
+        evaluations.append({
+            'path_type': path_type,
+            'order': order,
+            'success': success,
+            'start_position': _start_position(rsa_result) if success else None,
+            'num_hops': len(path_obj.get('links', [])),
+            'rsa_result': rsa_result
+        })
+
+    evaluations.sort(key=lambda e: (not e['success'], e['start_position'] or 0, e['num_hops'], e['order']))
+    for rank, evaluation in enumerate(evaluations, start=1):
+        evaluation['rank'] = rank
+        del evaluation['order']
+    return evaluations
+
+
+# [CHAFI-THESIS] Process-wide registry (flows live in the controller's db_flows)
+RSA_CONTEXTS = RSAContextRegistry()
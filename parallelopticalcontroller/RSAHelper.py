@@ -21,11 +21,11 @@ adapted from thesis/rsa_project/helpers.py for use with TeraFlowSDN.
 
 Key adaptations:
 - Uses in-memory cache instead of SQLAlchemy queries
-- EndpointData adapter class to match rsa_project's Endpoint model interface
+- EndpointData (the snapshot's EndpointRecord) matches rsa_project's Endpoint model interface
 - OpticalLinksCache for efficient lookup by link_uuid and endpoint_uuid
+- Spectrum assignment by a per-lightpath policy (SpectrumPolicy) over free blocks
 
 Classes:
-    - EndpointData: Adapter class wrapping endpoint dict as object
     - OpticalLinksCache: In-memory cache for optical links data
     - OpticalBandHelper: Band detection using ITUStandards
     - TopologyHelper: RSA computation functions
@@ -34,77 +34,43 @@ Classes:
 
 import logging
 import math
+import os
 from typing import Dict, List, Tuple, Optional, Any
 
 # [CHAFI-THESIS] Import ITUStandards from common (TeraFlowSDN's version)
 from common.ITUStandards import (
-    ITUStandards, FreqeuncyRanges, Bands, Lambdas, FrequencyMeasurementUnit
+    ITUStandards, FreqeuncyRanges, Bands, Lambdas, FrequencyMeasurementUnit, BAND_SLOTS, BAND_FULL_MASKS
 )
+from common.SpectrumTools import FreeSpectrum
+from .Metrics import register_cache_stats
+from .TopologyRecords import EndpointRecord, LinkRecord
+from .SpectrumPolicy import DEFAULT_SPECTRUM_POLICY, SpectrumContext, select_start_slot
 
 # Configure logging
 LOGGER = logging.getLogger(__name__)
 
+# [CHAFI-THESIS] RSA trace verbosity:
+#   none    - no trace (hot path, only integer acquisition metadata)
+#   summary - per-hop slot counts, no bitmaps
+#   full    - per-hop and per-endpoint bitmaps as integers, rendered by render_trace_steps()
+TRACE_LEVEL_NONE = 'none'
+TRACE_LEVEL_SUMMARY = 'summary'
+TRACE_LEVEL_FULL = 'full'
+TRACE_LEVELS = (TRACE_LEVEL_NONE, TRACE_LEVEL_SUMMARY, TRACE_LEVEL_FULL)
+DEFAULT_TRACE_LEVEL = os.environ.get('RSA_TRACE_LEVEL', TRACE_LEVEL_SUMMARY)
 
-# =============================================================================
-# [CHAFI-THESIS] ENDPOINT DATA ADAPTER
-# =============================================================================
-# Adapts the dict structure from fetch_optical_links_for_rsa() to match
-# rsa_project's Endpoint model interface (attributes like min_frequency, etc.)
-# =============================================================================
+# [CHAFI-THESIS] Aligned-bitmap cache lookups of all OpticalLinksCache instances
+# (plain ints on the hot path, exported as poc_cache_lookups_total{cache="alignment"})
+ALIGNMENT_CACHE_STATS = {'hits': 0, 'misses': 0}
+register_cache_stats('alignment', lambda: (ALIGNMENT_CACHE_STATS['hits'], ALIGNMENT_CACHE_STATS['misses']))
+# [CHAFI-THESIS] Hop bitmap memo lookups (RSAContext), as poc_cache_lookups_total{cache="hop_bitmap"}
+HOP_MEMO_STATS = {'hits': 0, 'misses': 0}
+register_cache_stats('hop_bitmap', lambda: (HOP_MEMO_STATS['hits'], HOP_MEMO_STATS['misses']))
 
-class EndpointData:
-    """
-    [CHAFI-THESIS] Adapter class to match rsa_project's Endpoint model interface.
-
-    Wraps the endpoint dict from fetch_optical_links_for_rsa() to provide
-    attribute-style access like the SQLAlchemy Endpoint model.
-
-    Attributes:
-        name: Endpoint name (e.g., "port-11")
-        endpoint_uuid: Endpoint UUID
-        device_uuid: Device UUID
-        device_name: Device name (e.g., "TP2")
-        device_type: Device type (e.g., "optical-transponder")
-        min_frequency: Minimum frequency in Hz
-        max_frequency: Maximum frequency in Hz
-        flex_slots: Number of slots in bitmap
-        bitmap_value: Integer representing slot availability
-    """
-
-    def __init__(self, endpoint_dict: Dict):
-        """
-        Initialize EndpointData from endpoint dict.
-
-        Args:
-            endpoint_dict: Dict with endpoint info including channel_data
-        """
-        channel = endpoint_dict.get('channel_data') or {}
-
-        self.name = endpoint_dict.get('endpoint_name')
-        self.endpoint_uuid = endpoint_dict.get('endpoint_uuid')
-        self.device_uuid = endpoint_dict.get('device_uuid')
-        self.device_name = endpoint_dict.get('device_name')
-        self.device_type = endpoint_dict.get('device_type')
-        self.endpoint_index = endpoint_dict.get('endpoint_index')
-        self.transport_type = endpoint_dict.get('transport_type')
-
-        # [CHAFI-THESIS] RSA frequency fields from channel_data
-        self.min_frequency = channel.get('min_frequency')
-        self.max_frequency = channel.get('max_frequency')
-        self.flex_slots = channel.get('flex_slots')
-
-        # bitmap_value is stored as string in channel_data, convert to int
-        bitmap_str = channel.get('bitmap_value')
-        if bitmap_str:
-            try:
-                self.bitmap_value = int(bitmap_str)
-            except (ValueError, TypeError):
-                self.bitmap_value = 0
-        else:
-            self.bitmap_value = 0
 
-    def __repr__(self):
-        return f"EndpointData(name={self.name}, device={self.device_name}, flex_slots={self.flex_slots})"
+# [CHAFI-THESIS] rsa_project's Endpoint model interface (name, min_frequency, bitmap_value, ...)
+# is provided by the snapshot's endpoint records; the name is kept for the RSA code below
+EndpointData = EndpointRecord
 
 
 # =============================================================================
@@ -121,48 +87,53 @@ class OpticalLinksCache:
     SQLAlchemy queries used in rsa_project.
     """
 
-    def __init__(self, optical_links: List[Dict]):
+    def __init__(self, optical_links: List[Any]):
         """
-        Initialize cache from list of optical link dicts.
+        Initialize cache from list of optical links.
 
         Args:
-            optical_links: List from fetch_optical_links_for_rsa()
+            optical_links: LinkRecords from fetch_optical_links_for_rsa(); link dicts
+                           in the same layout are converted to records (benchmarks)
         """
-        self._links = {}  # link_uuid -> link dict
+        self._links = {}  # link_uuid -> LinkRecord
         self._endpoints = {}  # endpoint_uuid -> EndpointData
         self._endpoints_by_device = {}  # device_uuid -> List[EndpointData]
+        self._links_by_device_pair = {}  # (src_device_uuid, dst_device_uuid) -> List[LinkRecord]
+        # endpoint_uuid -> {band_enum_name: (source bitmap_value, aligned_bitmap, offset_slots)}
+        self._aligned = {}
 
         self._build_index(optical_links)
 
-    def _build_index(self, optical_links: List[Dict]):
-        """Build lookup indexes from optical links list."""
+    def _build_index(self, optical_links: List[Any]):
+        """Build lookup indexes from optical links list (records are indexed, not copied)."""
+        endpoint_records = {}  # endpoint_uuid -> EndpointRecord of converted link dicts
         for link in optical_links:
-            link_uuid = link.get('link_uuid')
-            if link_uuid:
-                self._links[link_uuid] = link
-
-            # Index endpoints
-            for ep_dict in link.get('endpoints', []):
-                ep_uuid = ep_dict.get('endpoint_uuid')
-                device_uuid = ep_dict.get('device_uuid')
-
-                if ep_uuid:
-                    endpoint_data = EndpointData(ep_dict)
-                    self._endpoints[ep_uuid] = endpoint_data
-
-                    # Index by device
-                    if device_uuid:
-                        if device_uuid not in self._endpoints_by_device:
-                            self._endpoints_by_device[device_uuid] = []
-                        self._endpoints_by_device[device_uuid].append(
-                            endpoint_data)
+            if isinstance(link, dict):
+                link = LinkRecord.from_dict(link, endpoint_records)
+            if link.link_uuid:
+                self._links[link.link_uuid] = link
+
+            endpoints = link.endpoints
+            if len(endpoints) >= 2:
+                device_pair = (endpoints[0].device_uuid, endpoints[1].device_uuid)
+                self._links_by_device_pair.setdefault(device_pair, []).append(link)
+
+            # Index endpoints (shared by links referencing the same endpoint)
+            for endpoint in endpoints:
+                if not endpoint.endpoint_uuid or endpoint.endpoint_uuid in self._endpoints:
+                    continue
+                self._endpoints[endpoint.endpoint_uuid] = endpoint
+
+                # Index by device
+                if endpoint.device_uuid:
+                    self._endpoints_by_device.setdefault(endpoint.device_uuid, []).append(endpoint)
 
         # LOGGER.info(
         #     f"[CHAFI-RSA-CACHE] Built cache: {len(self._links)} links, "
         #     f"{len(self._endpoints)} endpoints, {len(self._endpoints_by_device)} devices")
 
-    def get_link(self, link_uuid: str) -> Optional[Dict]:
-        """Get link dict by UUID."""
+    def get_link(self, link_uuid: str) -> Optional[LinkRecord]:
+        """Get LinkRecord by UUID."""
         return self._links.get(link_uuid)
 
     def get_endpoint(self, endpoint_uuid: str) -> Optional[EndpointData]:
@@ -173,7 +144,7 @@ class OpticalLinksCache:
         """Get all EndpointData for a device (for parallel endpoint constraint)."""
         return self._endpoints_by_device.get(device_uuid, [])
 
-    def get_links_between_devices(self, src_device_uuid: str, dst_device_uuid: str) -> List[Dict]:
+    def get_links_between_devices(self, src_device_uuid: str, dst_device_uuid: str) -> List[LinkRecord]:
         """
         Get all links between a specific device pair (for parallel link detection).
 
@@ -182,24 +153,100 @@ class OpticalLinksCache:
             dst_device_uuid: Destination device UUID
 
         Returns:
-            List of link dictionaries where src matches src_device_uuid AND dst matches dst_device_uuid
+            List of LinkRecords where src matches src_device_uuid AND dst matches dst_device_uuid
         """
-        parallel_links = []
-        for link in self._links.values():
-            endpoints = link.get('endpoints', [])
-            if len(endpoints) >= 2:
-                link_src_uuid = endpoints[0].get('device_uuid')
-                link_dst_uuid = endpoints[1].get('device_uuid')
-
-                if link_src_uuid == src_device_uuid and link_dst_uuid == dst_device_uuid:
-                    parallel_links.append(link)
-
-        return parallel_links
+        return self._links_by_device_pair.get((src_device_uuid, dst_device_uuid), [])
 
     def get_all_endpoints(self) -> List[EndpointData]:
         """Get all endpoints in cache."""
         return list(self._endpoints.values())
 
+    def clear_endpoint_slots(self, endpoint_uuid: str, native_mask: int) -> bool:
+        """
+        Mark slots as allocated (bit = 0) on an endpoint's native bitmap.
+
+        The record is shared with the snapshot's links, so they see the change too.
+
+        Args:
+            endpoint_uuid: Endpoint UUID
+            native_mask: Mask of allocated slots in the endpoint's own frame (LSB = min_frequency)
+
+        Returns:
+            bool: True if the endpoint exists in the cache
+        """
+        endpoint = self._endpoints.get(endpoint_uuid)
+        if endpoint is None:
+            return False
+        endpoint.bitmap_value &= ~native_mask
+        self._aligned.pop(endpoint_uuid, None)
+        return True
+
+    def set_endpoint_bitmap(self, endpoint_uuid: str, bitmap_value: int) -> bool:
+        """
+        Replace an endpoint's native bitmap (value read from Context).
+
+        Returns:
+            bool: True if the endpoint exists in the cache
+        """
+        endpoint = self._endpoints.get(endpoint_uuid)
+        if endpoint is None:
+            return False
+        endpoint.bitmap_value = bitmap_value
+        self._aligned.pop(endpoint_uuid, None)
+        return True
+
+    def inherit_aligned(self, other: 'OpticalLinksCache') -> None:
+        """
+        Start from the aligned bitmaps of a cache over the same endpoints (snapshot copies).
+
+        Entries carry the bitmap they were computed from, so those of endpoints
+        patched since are recomputed rather than reused.
+        """
+        self._aligned = {endpoint_uuid: dict(per_band) for endpoint_uuid, per_band in list(other._aligned.items())}
+
+    def get_aligned_bitmap(self, endpoint: EndpointData, band_enum_name: str, selected_min_freq: int,
+                           selected_max_freq: int, slot_granularity_hz: int) -> Tuple[int, int]:
+        """
+        Get an endpoint's bitmap aligned to a band's reference range, computing it once.
+
+        Entries are keyed by (endpoint_uuid, band) and dropped when the endpoint's
+        bitmap changes, so repeated paths over the same hops only pay the AND.
+
+        Args:
+            endpoint: EndpointData instance from this cache
+            band_enum_name: Band of the reference range (band_info['band_enum_name'])
+            selected_min_freq: Reference range minimum frequency (Hz)
+            selected_max_freq: Reference range maximum frequency (Hz)
+            slot_granularity_hz: ITU slot granularity (6.25 GHz in Hz)
+
+        Returns:
+            tuple: (aligned_bitmap, offset_slots) where offset_slots is the endpoint's
+                   low offset in the reference frame (used for slot acquisition)
+        """
+        per_band = self._aligned.setdefault(endpoint.endpoint_uuid, {})
+        entry = per_band.get(band_enum_name)
+        # Also compare the source bitmap: an entry computed while the bitmap was being patched is never reused
+        if entry is not None and entry[0] == endpoint.bitmap_value:
+            ALIGNMENT_CACHE_STATS['hits'] += 1
+            return entry[1], entry[2]
+        ALIGNMENT_CACHE_STATS['misses'] += 1
+
+        aligned_bitmap = TopologyHelper.align_endpoint_to_reference(
+            endpoint, selected_min_freq, selected_max_freq, slot_granularity_hz)
+        ep_min_hz = endpoint.min_frequency if endpoint.min_frequency else selected_min_freq
+        offset_slots = int((ep_min_hz - selected_min_freq) / slot_granularity_hz)
+
+        per_band[band_enum_name] = (endpoint.bitmap_value, aligned_bitmap, offset_slots)
+        return aligned_bitmap, offset_slots
+
+    def set_link_used(self, link_uuid: str, used: bool = True) -> bool:
+        """Set the 'used' flag of a cached link. Returns True if the link exists."""
+        link = self._links.get(link_uuid)
+        if link is None:
+            return False
+        link.used = used
+        return True
+
 
 # =============================================================================
 # [CHAFI-THESIS] OPTICAL BAND HELPER
@@ -279,6 +326,35 @@ class TopologyHelper:
         except (ValueError, TypeError):
             return "0" * length
 
+    @staticmethod
+    def reference_mask_to_native(reference_mask: int, offset_slots: int, native_flex_slots: int) -> int:
+        """
+        Converts a mask in the reference (band) frame into an endpoint's native frame.
+
+        Args:
+            reference_mask: Mask with bit i = reference slot i
+            offset_slots: Endpoint low offset in the reference frame (see acquisition_metadata)
+            native_flex_slots: Width of the endpoint bitmap
+
+        Returns:
+            int: Mask with bit j = endpoint slot j
+        """
+        if offset_slots >= 0:
+            native_mask = reference_mask >> offset_slots
+        else:
+            # Endpoint starts before the reference range
+            native_mask = reference_mask << -offset_slots
+        return native_mask & ((1 << native_flex_slots) - 1)
+
+    @staticmethod
+    def native_mask_to_reference(native_mask: int, offset_slots: int, reference_slots: int) -> int:
+        """Inverse of reference_mask_to_native(): endpoint slot j -> reference slot j + offset_slots."""
+        if offset_slots >= 0:
+            reference_mask = native_mask << offset_slots
+        else:
+            reference_mask = native_mask >> -offset_slots
+        return reference_mask & ((1 << reference_slots) - 1)
+
     @staticmethod
     def align_endpoint_to_reference(
         endpoint: EndpointData,
@@ -417,8 +493,11 @@ class TopologyHelper:
     @staticmethod
     def rsa_bitmap_pre_compute(
         path_obj: Dict,
-        cache: OpticalLinksCache
-    ) -> Tuple[Optional[int], int, List[Dict], Optional[Dict]]:
+        cache: OpticalLinksCache,
+        trace_level: str = DEFAULT_TRACE_LEVEL,
+        held_masks: Optional[Dict[str, int]] = None,
+        hop_memo: Optional[Dict] = None
+    ) -> Tuple[Optional[int], int, List[Dict], Optional[Dict], List[Dict]]:
         """
         Computes available spectrum using reference bitmap alignment.
 
@@ -432,13 +511,17 @@ class TopologyHelper:
         Args:
             path_obj: Path object with 'links' list
             cache: OpticalLinksCache instance
+            trace_level: TRACE_LEVEL_NONE, TRACE_LEVEL_SUMMARY or TRACE_LEVEL_FULL
+            held_masks: endpoint_uuid -> slots reserved by other requests (native frame), treated as occupied
+            hop_memo: (link_uuid, band_enum_name) -> hop bitmaps, valid for this cache only
+                      (RSAContext.hop_memo()); not used with TRACE_LEVEL_FULL
 
         Returns:
-            tuple: (reference_bitmap, reference_slots, trace_steps, band_info)
+            tuple: (reference_bitmap, reference_slots, trace_steps, band_info, acquisition_metadata)
         """
         if not path_obj.get('links'):
             LOGGER.error("[RSA Pre-Compute] No links in path")
-            return None, 0, [], None
+            return None, 0, [], None, []
 
         # LOGGER.info("[RSA Pre-Compute] Starting reference bitmap computation")
 
@@ -448,10 +531,9 @@ class TopologyHelper:
             link_uuid = link_info.get('id')
             link = cache.get_link(link_uuid)
             if link:
-                for ep in link.get('endpoints', []):
-                    ep_uuid = ep.get('endpoint_uuid')
-                    if ep_uuid:
-                        endpoint_uuids.add(ep_uuid)
+                for ep in link.endpoints:
+                    if ep.endpoint_uuid:
+                        endpoint_uuids.add(ep.endpoint_uuid)
 
         endpoints = [cache.get_endpoint(uuid) for uuid in endpoint_uuids]
         endpoints = [ep for ep in endpoints if ep]  # Filter None
@@ -459,7 +541,7 @@ class TopologyHelper:
         if not endpoints:
             LOGGER.error(
                 "[RSAHelper:rsa_bitmap_pre_compute] No valid endpoints found in path")
-            return None, 0, [], None
+            return None, 0, [], None, []
 
         # LOGGER.info(
         #     f"[RSAHelper:rsa_bitmap_pre_compute] Found {len(endpoints)} unique endpoints in path")
@@ -470,7 +552,7 @@ class TopologyHelper:
         if not valid_endpoints:
             LOGGER.error(
                 "[RSAHelper:rsa_bitmap_pre_compute] No endpoints with valid frequency data")
-            return None, 0, [], None
+            return None, 0, [], None, []
 
         reference_min_freq = min([ep.min_frequency for ep in valid_endpoints])
         reference_max_freq = max([ep.max_frequency for ep in valid_endpoints])
@@ -481,13 +563,14 @@ class TopologyHelper:
         if not band_info:
             LOGGER.error(
                 "[RSAHelper:rsa_bitmap_pre_compute] Could not detect operational band")
-            return None, 0, [], None
+            return None, 0, [], None, []
 
         # Use STANDARD band range as reference
         selected_min_freq, selected_max_freq = band_info['frequency_range_hz']
+        band_enum_name = band_info['band_enum_name']
         slot_granularity_hz = ITUStandards.SLOT_GRANULARITY.value
-        reference_slots = int(
-            (selected_max_freq - selected_min_freq) / slot_granularity_hz)
+        # [CHAFI-THESIS] Precomputed per band for the active grid profile
+        reference_slots = BAND_SLOTS[band_enum_name]
 
         # LOGGER.info(
         #     f"[RSAHelper:rsa_bitmap_pre_compute] Band: {band_info['band_name']}, "
@@ -496,197 +579,296 @@ class TopologyHelper:
         #     f"Slots: {reference_slots}")
 
         # Step 4: Initialize reference bitmap (all available)
-        reference_bitmap = (1 << reference_slots) - 1
+        reference_bitmap = BAND_FULL_MASKS[band_enum_name]
 
         trace_steps = []
+        # [CHAFI-RSA-SLOT] Acquisition metadata of the path endpoints (integers only)
+        acquisition_in_path = []
+        full_trace = trace_level == TRACE_LEVEL_FULL
 
         # Step 5: Iterate through hops with device-level parallel endpoint checking
+        memoize = hop_memo is not None and not full_trace
         for i, link_info in enumerate(path_obj['links']):
             link_uuid = link_info.get('id')
-            hop_label = f"{link_info.get('src')} -> {link_info.get('dst')}"
 
             # LOGGER.info(f"[RSAHelper:rsa_bitmap_pre_compute] Processing Hop {i+1}: {hop_label}")
 
-            # Get link from cache
-            link = cache.get_link(link_uuid)
-            if not link or len(link.get('endpoints', [])) < 2:
-                LOGGER.error(
-                    f"[RSAHelper:rsa_bitmap_pre_compute] Link {link_uuid} or its endpoints not found")
+            # [CHAFI-THESIS] A hop only depends on the link, the band and the snapshot, so paths
+            # sharing it reuse its bitmaps (RSAContext); held slots are applied per call
+            hop = None
+            memo_key = (link_uuid, band_enum_name)
+            if memoize:
+                hop = hop_memo.get(memo_key)
+                HOP_MEMO_STATS['hits' if hop is not None else 'misses'] += 1
+            if hop is None:
+                hop = TopologyHelper._compute_hop(
+                    link_uuid, band_enum_name, selected_min_freq, selected_max_freq,
+                    slot_granularity_hz, reference_slots, cache, full_trace)
+                if hop is None:
+                    LOGGER.error(
+                        f"[RSAHelper:rsa_bitmap_pre_compute] Link {link_uuid} or its endpoints not found")
+                    continue
+                if memoize:
+                    hop_memo[memo_key] = hop
+
+            src_side = hop['src']
+            dst_side = hop['dst']
+            src_device_bitmap = src_side['device_bitmap']
+            dst_device_bitmap = dst_side['device_bitmap']
+            if held_masks:
+                src_device_bitmap = TopologyHelper._remove_held_slots(
+                    src_device_bitmap, src_side['offsets'], held_masks, reference_slots)
+                dst_device_bitmap = TopologyHelper._remove_held_slots(
+                    dst_device_bitmap, dst_side['offsets'], held_masks, reference_slots)
+
+            # [CHAFI-RSA-SLOT] Metadata for slot acquisition (copied: results outlive the memo)
+            for side in (src_side, dst_side):
+                if side['path_metadata'] is not None:
+                    acquisition_in_path.append(dict(side['path_metadata']))
+
+            # Hop bitmap = intersection of source and destination device bitmaps
+            hop_bitmap = src_device_bitmap & dst_device_bitmap
+
+            # Update path-wide bitmap
+            reference_bitmap &= hop_bitmap
+
+            if trace_level == TRACE_LEVEL_NONE:
                 continue
 
-            endpoints_list = link.get('endpoints', [])
-            src_ep = endpoints_list[0]
-            dst_ep = endpoints_list[1]
+            # Record trace (bitmaps stay integers; see render_trace_steps())
+            trace_step = {
+                'hop_index': i + 1,
+                'hop_label': f"{link_info.get('src')} -> {link_info.get('dst')}",
+                'link_name': link_info.get('name', 'unknown'),
+                'src_device': link_info.get('src'),
+                'dst_device': link_info.get('dst'),
+                'src_device_uuid': hop['src_device_uuid'],
+                'dst_device_uuid': hop['dst_device_uuid'],
+                'available_slots': bin(hop_bitmap).count('1'),
+                'cumulative_available_slots': bin(reference_bitmap).count('1')
+            }
+            if full_trace:
+                trace_step.update({
+                    'src_endpoint_traces': src_side['endpoint_traces'],
+                    'dst_endpoint_traces': dst_side['endpoint_traces'],
+                    'src_device_bitmap': src_device_bitmap,
+                    'dst_device_bitmap': dst_device_bitmap,
+                    'hop_bitmap': hop_bitmap,
+                    'cumulative_bitmap': reference_bitmap
+                })
+            trace_steps.append(trace_step)
+
+        # total_available = bin(reference_bitmap).count('1')
+        # LOGGER.info(
+        #     f"[RSA Pre-Compute] Path complete: {total_available}/{reference_slots} slots available")
 
-            src_device_uuid = src_ep.get('device_uuid')
-            dst_device_uuid = dst_ep.get('device_uuid')
-            src_endpoint_uuid = src_ep.get('endpoint_uuid')
-            dst_endpoint_uuid = dst_ep.get('endpoint_uuid')
+        return reference_bitmap, reference_slots, trace_steps, band_info, acquisition_in_path
 
-            # Query all links between this specific device pair (parallel link detection)
-            parallel_links = cache.get_links_between_devices(
-                src_device_uuid, dst_device_uuid)
-            # LOGGER.info(
-            #     f"[RSAHelper:perform_rsa] Found {len(parallel_links)} link(s) between devices")
-
-            # Collect endpoints from parallel links only
-            src_endpoints = []
-            dst_endpoints = []
-            for plink in parallel_links:
-                plink_eps = plink.get('endpoints', [])
-                if len(plink_eps) >= 2:
-                    src_ep_uuid = plink_eps[0].get('endpoint_uuid')
-                    dst_ep_uuid = plink_eps[1].get('endpoint_uuid')
-
-                    src_ep_data = cache.get_endpoint(src_ep_uuid)
-                    dst_ep_data = cache.get_endpoint(dst_ep_uuid)
-
-                    if src_ep_data:
-                        src_endpoints.append(src_ep_data)
-                    if dst_ep_data:
-                        dst_endpoints.append(dst_ep_data)
-
-            # Initialize bitmaps with all available
-            src_device_bitmap = (1 << reference_slots) - 1
-            dst_device_bitmap = (1 << reference_slots) - 1
-            src_traces = []
-            dst_traces = []
-
-            # [CHAFI-RSA-SLOT] List to store acquisition metadata for this path
-            # We initialize it outside the loop but here we append hop-specific data
-            if 'acquisition_in_path' not in locals():
-                acquisition_in_path = []
-
-            # Process source endpoints (intersect only parallel link endpoints)
-            for endpoint in src_endpoints:
-                aligned_bitmap = TopologyHelper.align_endpoint_to_reference(
-                    endpoint, selected_min_freq, selected_max_freq, slot_granularity_hz
-                )
-                src_device_bitmap &= aligned_bitmap
-
-                # Check if this endpoint is part of the selected path
-                is_path_endpoint = (
-                    endpoint.endpoint_uuid == src_endpoint_uuid)
-
-                if is_path_endpoint:
-                    # [CHAFI-RSA-SLOT] Store metadata for slot acquisition
-                    # Calculate offset: (endpoint_min - reference_min) / granularity
-                    ep_min_hz = endpoint.min_frequency if endpoint.min_frequency else selected_min_freq
-                    offset_slots = int(
-                        (ep_min_hz - selected_min_freq) / slot_granularity_hz)
-
-                    acquisition_in_path.append({
-                        'endpoint_uuid': endpoint.endpoint_uuid,
-                        'device_uuid': endpoint.device_uuid,
-                        'device_type': endpoint.device_type,
-                        'endpoint_name': endpoint.name,
-                        'endpoint_index': endpoint.endpoint_index,
-                        'aligned_bitmap': TopologyHelper.int_to_bitmap(aligned_bitmap, reference_slots),
-                        'offset_slots': offset_slots,
-                        'native_flex_slots': endpoint.flex_slots if endpoint.flex_slots else 0,
-                        'original_min_freq': ep_min_hz
-                    })
-                    # LOGGER.info(f"[CHAFI-RSA-SLOT] Captured src endpoint metadata: {endpoint.name} (offset={offset_slots})")
-
-                src_traces.append({
+    @staticmethod
+    def _compute_hop(
+        link_uuid: str,
+        band_enum_name: str,
+        selected_min_freq: int,
+        selected_max_freq: int,
+        slot_granularity_hz: int,
+        reference_slots: int,
+        cache: OpticalLinksCache,
+        full_trace: bool
+    ) -> Optional[Dict]:
+        """
+        Intersects both sides of a hop in the reference frame, without held slots.
+
+        Returns:
+            dict: src_device_uuid, dst_device_uuid and the _intersect_hop_endpoints()
+                  result of each side ('src', 'dst'); None if the link is not in the cache
+        """
+        link = cache.get_link(link_uuid)
+        if not link or len(link.endpoints) < 2:
+            return None
+
+        src_ep = link.endpoints[0]
+        dst_ep = link.endpoints[1]
+
+        src_device_uuid = src_ep.device_uuid
+        dst_device_uuid = dst_ep.device_uuid
+
+        # Query all links between this specific device pair (parallel link detection)
+        parallel_links = cache.get_links_between_devices(
+            src_device_uuid, dst_device_uuid)
+        # LOGGER.info(
+        #     f"[RSAHelper:perform_rsa] Found {len(parallel_links)} link(s) between devices")
+
+        # Collect endpoints from parallel links only
+        src_endpoints = []
+        dst_endpoints = []
+        for plink in parallel_links:
+            if len(plink.endpoints) >= 2:
+                src_endpoints.append(plink.endpoints[0])
+                dst_endpoints.append(plink.endpoints[1])
+
+        # Intersect only parallel link endpoints on each side of the hop
+        return {
+            'src_device_uuid': src_device_uuid,
+            'dst_device_uuid': dst_device_uuid,
+            'src': TopologyHelper._intersect_hop_endpoints(
+                src_endpoints, src_ep.endpoint_uuid, band_enum_name, selected_min_freq,
+                selected_max_freq, slot_granularity_hz, reference_slots, cache, full_trace),
+            'dst': TopologyHelper._intersect_hop_endpoints(
+                dst_endpoints, dst_ep.endpoint_uuid, band_enum_name, selected_min_freq,
+                selected_max_freq, slot_granularity_hz, reference_slots, cache, full_trace)
+        }
+
+    @staticmethod
+    def _intersect_hop_endpoints(
+        endpoints: List[EndpointData],
+        path_endpoint_uuid: str,
+        band_enum_name: str,
+        selected_min_freq: int,
+        selected_max_freq: int,
+        slot_granularity_hz: int,
+        reference_slots: int,
+        cache: OpticalLinksCache,
+        full_trace: bool
+    ) -> Dict:
+        """
+        Intersects the aligned bitmaps of one side of a hop (parallel endpoint constraint).
+
+        Held slots are not applied here (see _remove_held_slots()), so the
+        result can be shared by every request reading the same snapshot.
+
+        Returns:
+            dict: device_bitmap, offsets ((endpoint_uuid, offset_slots) per endpoint),
+                  path_metadata (acquisition metadata of the path endpoint, None if it
+                  is not among the endpoints) and endpoint_traces (empty unless full_trace)
+        """
+        device_bitmap = (1 << reference_slots) - 1
+        offsets = []
+        path_metadata = None
+        endpoint_traces = []
+
+        for endpoint in endpoints:
+            aligned_bitmap, offset_slots = cache.get_aligned_bitmap(
+                endpoint, band_enum_name, selected_min_freq, selected_max_freq, slot_granularity_hz
+            )
+            device_bitmap &= aligned_bitmap
+            offsets.append((endpoint.endpoint_uuid, offset_slots))
+
+            # Check if this endpoint is part of the selected path
+            is_path_endpoint = (endpoint.endpoint_uuid == path_endpoint_uuid)
+
+            if is_path_endpoint:
+                # [CHAFI-RSA-SLOT] Store metadata for slot acquisition
+                # offset_slots = (endpoint_min - reference_min) / granularity, cached with the bitmap
+                path_metadata = {
+                    'endpoint_uuid': endpoint.endpoint_uuid,
+                    'device_uuid': endpoint.device_uuid,
+                    'device_type': endpoint.device_type,
                     'endpoint_name': endpoint.name,
-                    'is_path_endpoint': is_path_endpoint,
-                    'min_freq_thz': endpoint.min_frequency / 1e12 if endpoint.min_frequency else None,
-                    'max_freq_thz': endpoint.max_frequency / 1e12 if endpoint.max_frequency else None,
-                    'flex_slots': endpoint.flex_slots if endpoint.flex_slots else 0,
-                    'original_bitmap': TopologyHelper.int_to_bitmap(
-                        endpoint.bitmap_value, endpoint.flex_slots if endpoint.flex_slots else 0),
-                    'aligned_bitmap': TopologyHelper.int_to_bitmap(aligned_bitmap, reference_slots)
-                })
-                # LOGGER.debug(
-                #     f"[RSAHelper:perform_rsa] Src endpoint {endpoint.name} "
-                #     f"({'PATH' if is_path_endpoint else 'PARALLEL'}): aligned and intersected")
-
-            # Process destination endpoints (intersect only parallel link endpoints)
-            for endpoint in dst_endpoints:
-                aligned_bitmap = TopologyHelper.align_endpoint_to_reference(
-                    endpoint, selected_min_freq, selected_max_freq, slot_granularity_hz
-                )
-                dst_device_bitmap &= aligned_bitmap
-
-                # Check if this endpoint is part of the selected path
-                is_path_endpoint = (
-                    endpoint.endpoint_uuid == dst_endpoint_uuid)
-
-                if is_path_endpoint:
-                    # [CHAFI-RSA-SLOT] Store metadata for slot acquisition
-                    ep_min_hz = endpoint.min_frequency if endpoint.min_frequency else selected_min_freq
-                    offset_slots = int(
-                        (ep_min_hz - selected_min_freq) / slot_granularity_hz)
-
-                    acquisition_in_path.append({
-                        'endpoint_uuid': endpoint.endpoint_uuid,
-                        'device_uuid': endpoint.device_uuid,
-                        'device_type': endpoint.device_type,
-                        'endpoint_name': endpoint.name,
-                        'endpoint_index': endpoint.endpoint_index,
-                        'aligned_bitmap': TopologyHelper.int_to_bitmap(aligned_bitmap, reference_slots),
-                        'offset_slots': offset_slots,
-                        'native_flex_slots': endpoint.flex_slots if endpoint.flex_slots else 0,
-                        'original_min_freq': ep_min_hz
-                    })
-                    # LOGGER.info(f"[CHAFI-RSA-SLOT] Captured dst endpoint metadata: {endpoint.name} (offset={offset_slots})")
-
-                dst_traces.append({
+                    'endpoint_index': endpoint.endpoint_index,
+                    'aligned_bitmap': aligned_bitmap,
+                    'offset_slots': offset_slots,
+                    'native_flex_slots': endpoint.flex_slots if endpoint.flex_slots else 0,
+                    'original_min_freq': endpoint.min_frequency if endpoint.min_frequency else selected_min_freq
+                }
+
+            if full_trace:
+                endpoint_traces.append({
                     'endpoint_name': endpoint.name,
                     'is_path_endpoint': is_path_endpoint,
                     'min_freq_thz': endpoint.min_frequency / 1e12 if endpoint.min_frequency else None,
                     'max_freq_thz': endpoint.max_frequency / 1e12 if endpoint.max_frequency else None,
                     'flex_slots': endpoint.flex_slots if endpoint.flex_slots else 0,
-                    'original_bitmap': TopologyHelper.int_to_bitmap(
-                        endpoint.bitmap_value, endpoint.flex_slots if endpoint.flex_slots else 0),
-                    'aligned_bitmap': TopologyHelper.int_to_bitmap(aligned_bitmap, reference_slots)
+                    'original_bitmap': endpoint.bitmap_value,
+                    'aligned_bitmap': aligned_bitmap
                 })
-                # LOGGER.debug(
-                #     f"[RSAHelper:perform_rsa] Dst endpoint {endpoint.name} "
-                #     f"({'PATH' if is_path_endpoint else 'PARALLEL'}): aligned and intersected")
 
-            # LOGGER.info(
-            #     f"[RSAHelper:perform_rsa] Processed {len(src_endpoints)} src + {len(dst_endpoints)} dst endpoints")
+        return {
+            'device_bitmap': device_bitmap,
+            'offsets': offsets,
+            'path_metadata': path_metadata,
+            'endpoint_traces': endpoint_traces
+        }
 
-            # Hop bitmap = intersection of source and destination device bitmaps
-            hop_bitmap = src_device_bitmap & dst_device_bitmap
+    @staticmethod
+    def _remove_held_slots(device_bitmap: int, offsets: List[Tuple[str, int]],
+                           held_masks: Dict[str, int], reference_slots: int) -> int:
+        """
+        Removes slots held by other requests from a side's device bitmap.
 
-            # Update path-wide bitmap
-            reference_bitmap &= hop_bitmap
+        Slots in held_masks are not removed from the metadata's aligned_bitmap,
+        which mirrors the endpoint's stored bitmap.
+        """
+        for endpoint_uuid, offset_slots in offsets:
+            held_mask = held_masks.get(endpoint_uuid, 0)
+            if held_mask:
+                device_bitmap &= ~TopologyHelper.native_mask_to_reference(
+                    held_mask, offset_slots, reference_slots)
+        return device_bitmap
 
-            # Record trace
-            trace_steps.append({
-                'hop_index': i + 1,
-                'hop_label': hop_label,
-                'link_name': link_info.get('name', 'unknown'),
-                'src_device': link_info.get('src'),
-                'dst_device': link_info.get('dst'),
-                'src_device_uuid': src_device_uuid,
-                'dst_device_uuid': dst_device_uuid,
-                'src_endpoint_traces': src_traces,
-                'dst_endpoint_traces': dst_traces,
-                'src_device_bitmap': TopologyHelper.int_to_bitmap(src_device_bitmap, reference_slots),
-                'dst_device_bitmap': TopologyHelper.int_to_bitmap(dst_device_bitmap, reference_slots),
-                'hop_bitmap': TopologyHelper.int_to_bitmap(hop_bitmap, reference_slots),
-                'cumulative_bitmap': TopologyHelper.int_to_bitmap(reference_bitmap, reference_slots)
-            })
+    @staticmethod
+    def render_trace_steps(trace_steps: List[Dict], reference_slots: int) -> List[Dict]:
+        """
+        Renders the integer bitmaps of a full trace as binary strings (for the UI).
 
-            available_slots = bin(hop_bitmap).count('1')
-            # LOGGER.info(
-            #     f"[RSA Pre-Compute] Hop {i+1}: {available_slots}/{reference_slots} slots available")
+        Args:
+            trace_steps: trace_steps from perform_rsa()/rsa_bitmap_pre_compute()
+            reference_slots: Width of the reference frame
 
-        total_available = bin(reference_bitmap).count('1')
-        # LOGGER.info(
-        #     f"[RSA Pre-Compute] Path complete: {total_available}/{reference_slots} slots available")
+        Returns:
+            list: Copy of trace_steps with bitmaps formatted by int_to_bitmap()
+        """
+        def render_endpoint(ep_trace):
+            rendered = dict(ep_trace)
+            rendered['original_bitmap'] = TopologyHelper.int_to_bitmap(
+                ep_trace.get('original_bitmap'), ep_trace.get('flex_slots', 0))
+            rendered['aligned_bitmap'] = TopologyHelper.int_to_bitmap(
+                ep_trace.get('aligned_bitmap'), reference_slots)
+            return rendered
+
+        rendered_steps = []
+        for step in trace_steps:
+            rendered = dict(step)
+            for key in ('src_device_bitmap', 'dst_device_bitmap', 'hop_bitmap', 'cumulative_bitmap'):
+                if key in step:
+                    rendered[key] = TopologyHelper.int_to_bitmap(step[key], reference_slots)
+            for key in ('src_endpoint_traces', 'dst_endpoint_traces'):
+                if key in step:
+                    rendered[key] = [render_endpoint(ep_trace) for ep_trace in step[key]]
+            rendered_steps.append(rendered)
+        return rendered_steps
 
-        return reference_bitmap, reference_slots, trace_steps, band_info, acquisition_in_path if 'acquisition_in_path' in locals() else []
+    @staticmethod
+    def render_rsa_result(rsa_result: Dict) -> Dict:
+        """
+        Returns a copy of an RSA result with its full trace and its common, required
+        and final bitmaps rendered as binary strings.
+
+        Results computed without a full trace are returned unchanged.
+        """
+        if not rsa_result or rsa_result.get('trace_level') != TRACE_LEVEL_FULL:
+            return rsa_result
+        reference_slots = rsa_result.get('reference_slots', 0)
+        rendered = dict(rsa_result)
+        rendered['trace_steps'] = TopologyHelper.render_trace_steps(
+            rsa_result.get('trace_steps', []), reference_slots)
+        rendered['common_bitmap'] = TopologyHelper.int_to_bitmap(
+            rsa_result.get('common_bitmap_int'), reference_slots)
+        if rsa_result.get('success'):
+            rendered['required_slots'] = TopologyHelper.int_to_bitmap(rsa_result.get('mask'), reference_slots)
+            rendered['final_bitmap'] = TopologyHelper.int_to_bitmap(
+                rsa_result.get('final_bitmap_int'), reference_slots)
+        return rendered
 
     @staticmethod
     def perform_rsa(
         path_obj: Dict,
         bandwidth: float,
-        cache: OpticalLinksCache
+        cache: OpticalLinksCache,
+        trace_level: str = DEFAULT_TRACE_LEVEL,
+        held_masks: Optional[Dict[str, int]] = None,
+        spectrum_policy: Optional[str] = None,
+        preferred_band: Optional[str] = None,
+        hop_memo: Optional[Dict] = None
     ) -> Optional[Dict]:
         """
         Performs Routing and Spectrum Assignment (RSA) using reference bitmap alignment.
@@ -695,6 +877,14 @@ class TopologyHelper:
             path_obj: Path object with 'links' list
             bandwidth: Requested bandwidth in Gbps
             cache: OpticalLinksCache instance
+            trace_level: TRACE_LEVEL_NONE, TRACE_LEVEL_SUMMARY or TRACE_LEVEL_FULL.
+                         Bitmaps are kept as integers; render_rsa_result() formats them
+                         as strings for a full trace only.
+            held_masks: endpoint_uuid -> slots provisionally reserved by other requests
+                        (native frame, see ReservationLedger.held_masks())
+            spectrum_policy: One of SpectrumPolicy.SPECTRUM_POLICIES (None = DEFAULT_SPECTRUM_POLICY)
+            preferred_band: FreqeuncyRanges member name for the band_preferring policy
+            hop_memo: Hop bitmaps shared with other paths on the same cache (see rsa_bitmap_pre_compute())
 
         Returns:
             dict: RSA result with success status, bitmaps, trace, and mask
@@ -717,7 +907,7 @@ class TopologyHelper:
             return None
 
         # Step 1: Pre-compute with reference bitmap
-        result = TopologyHelper.rsa_bitmap_pre_compute(path_obj, cache)
+        result = TopologyHelper.rsa_bitmap_pre_compute(path_obj, cache, trace_level, held_masks, hop_memo)
 
         if not result or result[0] is None:
             LOGGER.error("[RSA] Pre-compute failed")
@@ -725,34 +915,16 @@ class TopologyHelper:
 
         reference_bitmap, reference_slots, trace_steps, band_info, acquisition_metadata = result
 
-        # Step 2: Find Contiguous Slots (First Fit from LSB)
-        start_bit = -1
-        current_run = 0
-
-        for i in range(reference_slots):
-            is_free = (reference_bitmap >> i) & 1
-
-            if is_free:
-                current_run += 1
-                if current_run == num_slots:
-                    start_bit = i - num_slots + 1
-                    break
-            else:
-                current_run = 0
+        # Step 2: Feasible starts (shift-AND) and free blocks, then the spectrum policy picks the start
+        start_bit = select_start_slot(
+            spectrum_policy, FreeSpectrum(reference_bitmap, reference_slots, num_slots),
+            SpectrumContext(band_info, cache, slot_granularity_hz, preferred_band))
 
         if start_bit != -1:
             # Success - Found slots!
             mask = ((1 << num_slots) - 1) << start_bit
             final_bitmap_val = reference_bitmap & ~mask
 
-            # Format as strings
-            common_bitmap_str = TopologyHelper.int_to_bitmap(
-                reference_bitmap, reference_slots)
-            required_slots_str = TopologyHelper.int_to_bitmap(
-                mask, reference_slots)
-            final_bitmap_str = TopologyHelper.int_to_bitmap(
-                final_bitmap_val, reference_slots)
-
             # LOGGER.info(
             #     f"[RSAHelper:perform_rsa] Success! Allocated slots {start_bit}-{start_bit + num_slots - 1}")
 
@@ -761,10 +933,14 @@ class TopologyHelper:
                 'num_slots': num_slots,
                 'start_slot': start_bit,
                 'end_slot': start_bit + num_slots - 1,
-                'common_bitmap': common_bitmap_str,
-                'required_slots': required_slots_str,
-                'final_bitmap': final_bitmap_str,
+                # Strings are set by render_rsa_result() (full trace only)
+                'common_bitmap': None,
+                'required_slots': None,
+                'final_bitmap': None,
+                'common_bitmap_int': reference_bitmap,
                 'final_bitmap_int': final_bitmap_val,
+                'spectrum_policy': spectrum_policy or DEFAULT_SPECTRUM_POLICY,
+                'trace_level': trace_level,
                 'trace_steps': trace_steps,
                 'band_info': band_info,
                 'mask': mask,
@@ -780,12 +956,15 @@ class TopologyHelper:
             return {
                 'success': False,
                 'num_slots': num_slots,
-                'common_bitmap': TopologyHelper.int_to_bitmap(reference_bitmap, reference_slots),
+                'common_bitmap': None,
+                'common_bitmap_int': reference_bitmap,
                 'error': f"No {num_slots} contiguous slots available",
+                'failure_reason': 'no_spectrum',
+                'trace_level': trace_level,
                 'trace_steps': trace_steps,
                 'band_info': band_info,
                 'mask': 0,
                 'reference_slots': reference_slots,
                 'links': path_obj['links'],
-                'acquisition_metadata': acquisition_in_path if 'acquisition_in_path' in locals() else []
+                'acquisition_metadata': acquisition_metadata
             }
@@ -0,0 +1,315 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+[CHAFI-THESIS-START]
+RSA Worker Pool Module for Parallel Optical Controller
+
+Path search and the big-int bitmap work of RSA are CPU bound and serialized
+by the GIL of the Flask process. With RSA_WORKER_PROCESSES > 0 the
+controller dispatches find_paths(), perform_rsa() and evaluate_paths() to
+that many worker processes; everything else (Context I/O, snapshot builds,
+the reservation ledger, db_flows) stays in the front process.
+
+Each worker holds its own read-only copy of the topology snapshot:
+
+    - At start it gets TopologySnapshotManager.export_state() as a (pickled)
+      process argument. Workers are started lazily, when the front already
+      runs request threads and holds gRPC channels, so the default start
+      method (RSA_WORKER_START_METHOD) is 'forkserver': workers are forked
+      from a clean single-threaded server process and inherit no channel or
+      lock of the front. 'spawn' works as well; 'fork' is unsafe here.
+      Workers only touch objects they build from that state and stop
+      observing phase metrics.
+    - Before a task, the front brings the worker to the current version over
+      its pipe: the SnapshotDeltas of the acquisitions since the worker's
+      version, or a full state if the snapshot was rebuilt meanwhile.
+
+A worker runs one task at a time; a request waits for an idle worker. RSA
+results carry the version they were computed on, so the reservation
+compare-and-set in the front rejects results of a version that moved on,
+exactly as for in-process RSA. Tasks always use the current version, as
+current_snapshot_cache() does in the front.
+
+Phase durations are measured in the workers and observed in the front, so
+/metrics is unchanged.
+
+Classes:
+    - RSAWorkerPool: Worker processes and task dispatch
+[CHAFI-THESIS-END]
+"""
+
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .topology import find_paths
+from .TopologySnapshot import SNAPSHOT_MANAGER, TopologySnapshot
+from .RSAHelper import TopologyHelper, TRACE_LEVEL_NONE
+from .RSAContext import RSAContextRegistry, evaluate_paths
+from .Metrics import disable_phase_observation, observe_phase
+
+LOGGER = logging.getLogger(__name__)
+
+# [CHAFI-THESIS] Worker processes for path search and RSA (0 = compute in the request thread)
+RSA_WORKER_PROCESSES = int(os.environ.get('RSA_WORKER_PROCESSES', '0'))
+# [CHAFI-THESIS] forkserver/spawn: the front is multithreaded and holds gRPC channels when workers start
+RSA_WORKER_START_METHOD = os.environ.get('RSA_WORKER_START_METHOD', 'forkserver')
+
+_TASK_FIND_PATHS = 'find_paths'
+_TASK_PERFORM_RSA = 'perform_rsa'
+_TASK_EVALUATE_PATHS = 'evaluate_paths'
+_MESSAGE_LOAD = 'load'
+_MESSAGE_DELTA = 'delta'
+_MESSAGE_STOP = 'stop'
+
+
+# =============================================================================
+# Worker process side
+# =============================================================================
+
+def _run_find_paths(snapshot: TopologySnapshot, contexts: RSAContextRegistry, src: str, src_index: str,
+                    dst: str, dst_index: str, additional_hops: int, k_paths: Optional[int]) -> Dict:
+    return find_paths(src, src_index, dst, dst_index, snapshot.graph, additional_hops=additional_hops,
+                      views=snapshot.views, k_paths=k_paths)
+
+
+def _run_perform_rsa(snapshot: TopologySnapshot, contexts: RSAContextRegistry, flow_id, path_obj: Dict,
+                     bandwidth: float, held_masks: Dict[str, int], trace_level: str,
+                     spectrum_policy: Optional[str], preferred_band: Optional[str]) -> Optional[Dict]:
+    return TopologyHelper.perform_rsa(
+        path_obj=path_obj, bandwidth=bandwidth, cache=snapshot.cache, trace_level=trace_level,
+        held_masks=held_masks, spectrum_policy=spectrum_policy, preferred_band=preferred_band,
+        hop_memo=contexts.get(flow_id).hop_memo(snapshot.version))
+
+
+def _run_evaluate_paths(snapshot: TopologySnapshot, contexts: RSAContextRegistry, flow_id,
+                        candidates: List[Tuple[str, Dict]], bandwidth: float, held_masks: Dict[str, int],
+                        trace_level: str, spectrum_policy: Optional[str],
+                        preferred_band: Optional[str]) -> List[Dict]:
+    return evaluate_paths(
+        contexts.get(flow_id), candidates, bandwidth, snapshot.cache, snapshot.version,
+        held_masks=held_masks, spectrum_policy=spectrum_policy, preferred_band=preferred_band,
+        trace_level=trace_level)
+
+
+_TASKS = {
+    _TASK_FIND_PATHS: _run_find_paths,
+    _TASK_PERFORM_RSA: _run_perform_rsa,
+    _TASK_EVALUATE_PATHS: _run_evaluate_paths,
+}
+
+
+def _worker_main(conn, state: bytes) -> None:
+    """Worker loop: apply snapshot messages in order, answer tasks with (status, version, result)."""
+    disable_phase_observation()
+    snapshot = TopologySnapshot.from_state(state)
+    state = None
+    contexts = RSAContextRegistry()  # hop memos of the flows this worker served
+    while True:
+        try:
+            kind, payload = conn.recv()
+        except EOFError:
+            return
+        if kind == _MESSAGE_STOP:
+            return
+        if kind == _MESSAGE_LOAD:
+            snapshot = TopologySnapshot.from_state(payload)
+            continue
+        if kind == _MESSAGE_DELTA:
+            payload.apply_to(snapshot)
+            continue
+        try:
+            result = _TASKS[kind](snapshot, contexts, **payload)
+            conn.send(('ok', snapshot.version, result))
+        except Exception as e:
+            conn.send(('error', snapshot.version, "{}: {}".format(type(e).__name__, e)))
+
+
+# =============================================================================
+# Front process side
+# =============================================================================
+
+class _Worker:
+    """Front-side handle of one worker process and the snapshot version it holds."""
+
+    def __init__(self, process, conn, version: int):
+        self.process = process
+        self.conn = conn
+        self.version = version
+
+
+class RSAWorkerPool:
+    """
+    [CHAFI-THESIS] Worker processes holding snapshot copies, and task dispatch.
+
+    Workers are started on the first task. Each task borrows an idle worker,
+    syncs its snapshot, and blocks the calling request thread until the
+    result arrives. A worker that dies is replaced by a fresh one.
+
+    Attributes:
+        loads: Full snapshot states sent to workers (start excluded)
+        deltas: SnapshotDeltas sent to workers
+        tasks: Tasks dispatched
+    """
+
+    def __init__(self, processes: int = RSA_WORKER_PROCESSES, start_method: str = RSA_WORKER_START_METHOD):
+        self.processes = max(0, processes)
+        self._start_method = start_method
+        self._idle = queue.Queue()  # type: queue.Queue
+        self._workers = []  # type: List[_Worker]
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.deltas = 0
+        self.tasks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.processes > 0
+
+    def find_paths(self, src: str, src_index: str, dst: str, dst_index: str, additional_hops: int = 0,
+                   k_paths: Optional[int] = None) -> Tuple[Dict, int]:
+        """
+        find_paths() on the current snapshot in a worker.
+
+        Returns:
+            tuple: (find_paths() result, snapshot version it was computed on)
+        """
+        paths_result, version = self._call(
+            _TASK_FIND_PATHS, src=src, src_index=src_index, dst=dst, dst_index=dst_index,
+            additional_hops=additional_hops, k_paths=k_paths)
+        timing = paths_result.get('timing', {})
+        if 'dijkstra_sec' in timing:
+            observe_phase('dijkstra', timing['dijkstra_sec'])
+            observe_phase('all_paths', timing.get('all_paths_sec', 0.0))
+        return paths_result, version
+
+    def perform_rsa(self, flow_id, path_obj: Dict, bandwidth: float, held_masks: Dict[str, int],
+                    trace_level: str = TRACE_LEVEL_NONE, spectrum_policy: Optional[str] = None,
+                    preferred_band: Optional[str] = None) -> Tuple[Optional[Dict], int]:
+        """
+        TopologyHelper.perform_rsa() on the current snapshot in a worker.
+
+        Returns:
+            tuple: (RSA result, snapshot version it was computed on)
+        """
+        return self._call(
+            _TASK_PERFORM_RSA, flow_id=flow_id, path_obj=path_obj, bandwidth=bandwidth, held_masks=held_masks,
+            trace_level=trace_level, spectrum_policy=spectrum_policy, preferred_band=preferred_band)
+
+    def evaluate_paths(self, flow_id, candidates: List[Tuple[str, Dict]], bandwidth: float,
+                       held_masks: Dict[str, int], trace_level: str = TRACE_LEVEL_NONE,
+                       spectrum_policy: Optional[str] = None,
+                       preferred_band: Optional[str] = None) -> Tuple[List[Dict], int]:
+        """
+        RSAContext.evaluate_paths() on the current snapshot in a worker.
+
+        Returns:
+            tuple: (ranked evaluations, snapshot version they were computed on)
+        """
+        return self._call(
+            _TASK_EVALUATE_PATHS, flow_id=flow_id, candidates=candidates, bandwidth=bandwidth,
+            held_masks=held_masks, trace_level=trace_level, spectrum_policy=spectrum_policy,
+            preferred_band=preferred_band)
+
+    def close(self) -> None:
+        """Stop all workers (idle or not)."""
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            try:
+                worker.conn.send((_MESSAGE_STOP, None))
+            except (OSError, ValueError):
+                pass
+            worker.process.join(timeout=1)
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+    def _call(self, kind: str, **payload) -> Tuple[Any, int]:
+        self._start()
+        worker = self._idle.get()
+        try:
+            self._sync(worker)
+            worker.conn.send((kind, payload))
+            status, version, result = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            LOGGER.error("[CHAFI-WORKER] RSA worker pid={} lost: {}".format(worker.process.pid, e))
+            worker = self._replace(worker)
+            raise Exception("RSA worker lost during {}".format(kind))
+        finally:
+            self._idle.put(worker)
+        self.tasks += 1
+        if status != 'ok':
+            raise Exception("RSA worker {} failed: {}".format(kind, result))
+        return result, version
+
+    def _sync(self, worker: _Worker) -> None:
+        """Bring a worker's snapshot to the current version (deltas, or a full state after a rebuild)."""
+        current = SNAPSHOT_MANAGER.get_snapshot()
+        if worker.version == current.version:
+            return
+        deltas = SNAPSHOT_MANAGER.deltas_since(worker.version)
+        if deltas is None:
+            version, state = SNAPSHOT_MANAGER.export_state()
+            worker.conn.send((_MESSAGE_LOAD, state))
+            worker.version = version
+            self.loads += 1
+            return
+        for delta in deltas:
+            worker.conn.send((_MESSAGE_DELTA, delta))
+            worker.version = delta.version
+        self.deltas += len(deltas)
+
+    def _start(self) -> None:
+        if self._workers:
+            return
+        with self._lock:
+            if self._workers:
+                return
+            version, state = SNAPSHOT_MANAGER.export_state()
+            for _ in range(self.processes):
+                worker = self._spawn(version, state)
+                self._workers.append(worker)
+                self._idle.put(worker)
+            LOGGER.info("[CHAFI-WORKER] Started {} RSA workers ({}) on snapshot v{}".format(
+                self.processes, self._start_method, version))
+
+    def _spawn(self, version: int, state: bytes) -> _Worker:
+        context = multiprocessing.get_context(self._start_method)
+        front_conn, worker_conn = context.Pipe()
+        process = context.Process(target=_worker_main, args=(worker_conn, state), daemon=True,
+                                  name='rsa-worker')
+        process.start()
+        worker_conn.close()
+        return _Worker(process, front_conn, version)
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        """Fresh worker on the current snapshot in place of a dead one."""
+        if worker.process.is_alive():
+            worker.process.terminate()
+        worker.conn.close()
+        version, state = SNAPSHOT_MANAGER.export_state()
+        replacement = self._spawn(version, state)
+        with self._lock:
+            self._workers = [replacement if w is worker else w for w in self._workers]
+        return replacement
+
+
+# [CHAFI-THESIS] Process-wide pool (disabled unless RSA_WORKER_PROCESSES > 0)
+RSA_WORKER_POOL = RSAWorkerPool()
+atexit.register(RSA_WORKER_POOL.close)
@@ -0,0 +1,399 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+[CHAFI-THESIS-START]
+Replay Module for Parallel Optical Controller
+
+Runs the controller without a TeraFlowSDN deployment, for benchmarking.
+
+record_context() captures what the controller reads from Context - the device
+list, the optical links, the OpticalConfig of every optical device and the
+services of the admin context - into a JSON snapshot file (protobuf JSON
+mapping). FakeContextClient serves such a file in-process: reads return
+copies, UpdateOpticalConfig merges the written channels into the stored
+config and SetOpticalLink/SetService replace the stored object, so
+AcquireSlots changes what the next snapshot build sees. Writes are
+published as device/link UPDATE events (CREATE for new links) on the
+store's LocalEventSource, served by GetDeviceEvents/GetLinkEvents. Every
+RPC can be delayed (REPLAY_RPC_LATENCY_MS) to model the Context round trip.
+
+RequestRecorder appends the controller's API requests to a JSONL stream
+(POC_REQUEST_LOG), which benchmarks/bench_replay.py replays against the
+app with a FakeContextClient behind CONTEXT_CLIENT_POOL.
+
+Latency spec: "<ms>" for every RPC, or "RPC=ms,..." with "*" as the default,
+e.g. "*=0.5,SelectOpticalConfig=2,UpdateOpticalConfig=5".
+
+Classes:
+    - ReplayStore: Context objects of a snapshot file, shared by the fake clients
+    - FakeContextClient: In-process stand-in for ContextClient
+    - RequestRecorder: API request stream writer
+
+Functions:
+    - record_context: Capture Context into a snapshot file
+    - parse_latency_spec: Per-RPC latency (ms) from a spec string
+    - install_replay_context: Serve a snapshot file through CONTEXT_CLIENT_POOL
+    - load_request_stream: Read a recorded request stream
+[CHAFI-THESIS-END]
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from google.protobuf import json_format
+
+from common.proto.context_pb2 import (
+    ContextId, Device, DeviceList, Empty, EventTypeEnum, OpticalConfig, OpticalConfigId, OpticalLink,
+    OpticalLinkList, Service, ServiceList
+)
+from common.tools.context_queries.OpticalConfig import opticalconfig_uuid_get_duuid
+
+from .ContextClientPool import CONTEXT_CLIENT_POOL
+from .SnapshotEvents import DEVICE_EVENTS, LINK_EVENTS, LocalEventSource
+from .topology import OPTICAL_DEVICE_TYPES
+
+LOGGER = logging.getLogger(__name__)
+
+# [CHAFI-THESIS] Replay configuration
+REPLAY_RPC_LATENCY_MS = os.environ.get('REPLAY_RPC_LATENCY_MS', '0')
+POC_REQUEST_LOG = os.environ.get('POC_REQUEST_LOG', '')  # empty disables request recording
+
+SNAPSHOT_FORMAT_VERSION = 1
+# [CHAFI-THESIS] Only API calls are recorded (not /metrics, /health or swagger)
+RECORDED_PATH_PREFIX = '/ParallelOpticalTFS/'
+DEFAULT_CONTEXT_NAME = 'admin'
+
+
+def _to_dict(message) -> Dict:
+    return json_format.MessageToDict(message, preserving_proto_field_name=True)
+
+
+def _copy(message):
+    duplicate = type(message)()
+    duplicate.CopyFrom(message)
+    return duplicate
+
+
+def record_context(ctx_client, path: str) -> Dict[str, int]:
+    """
+    [CHAFI-THESIS] Captures the Context objects read by the controller into a snapshot file.
+
+    Args:
+        ctx_client: Connected ContextClient of a live deployment
+        path: Snapshot file to write (JSON)
+
+    Returns:
+        dict: Number of recorded devices, optical_links, optical_configs and services
+    """
+    devices = list(ctx_client.ListDevices(Empty()).devices)
+    optical_links = list(ctx_client.GetOpticalLinkList(Empty()).optical_links)
+
+    optical_configs = []
+    for device in devices:
+        if device.device_type not in OPTICAL_DEVICE_TYPES:
+            continue
+        opticalconfig_id = OpticalConfigId()
+        opticalconfig_id.opticalconfig_uuid = opticalconfig_uuid_get_duuid(device.device_id.device_uuid.uuid)
+        optical_config = ctx_client.SelectOpticalConfig(opticalconfig_id)
+        if optical_config and optical_config.opticalconfig_id.opticalconfig_uuid:
+            optical_configs.append(optical_config)
+
+    services = []
+    try:
+        context_id = ContextId()
+        context_id.context_uuid.uuid = DEFAULT_CONTEXT_NAME
+        services = list(ctx_client.ListServices(context_id).services)
+    except Exception as e:
+        LOGGER.warning(f"[CHAFI-REPLAY] Services not recorded: {e}")
+
+    snapshot = {
+        'format': SNAPSHOT_FORMAT_VERSION,
+        'recorded_at': time.time(),
+        'devices': [_to_dict(device) for device in devices],
+        'optical_links': [_to_dict(link) for link in optical_links],
+        'optical_configs': [_to_dict(config) for config in optical_configs],
+        'services': [_to_dict(service) for service in services],
+    }
+    with open(path, 'w') as snapshot_file:
+        json.dump(snapshot, snapshot_file)
+    return {key: len(snapshot[key]) for key in ('devices', 'optical_links', 'optical_configs', 'services')}
+
+
+def parse_latency_spec(spec: Optional[str]) -> Dict[str, float]:
+    """
+    Per-RPC latency in milliseconds from "<ms>" or "RPC=ms,...,*=ms".
+
+    Returns:
+        dict: RPC name (or '*') -> latency in ms
+
+    Raises:
+        ValueError: If a latency is not a number
+    """
+    latency = {}
+    for item in (spec or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        rpc, _, value = item.rpartition('=')
+        latency[rpc.strip() or '*'] = float(value)
+    return latency
+
+
+def _merge_channels(config: Dict, channels: List[Dict]) -> None:
+    """Upserts written channels into a parsed OpticalConfig (matched on name.index / channel_index)."""
+    stored_channels = config.setdefault('channels', [])
+    by_index = {}
+    for channel in stored_channels:
+        name = channel.get('name')
+        index = name.get('index') if isinstance(name, dict) else name
+        if not index and 'channel_index' in channel:
+            index = channel['channel_index']
+        by_index[str(index)] = channel
+    for update in channels:
+        stored = by_index.get(str(update.get('name', {}).get('index')))
+        if stored is None:
+            stored_channels.append(dict(update))
+        else:
+            stored['bitmap_value'] = update.get('bitmap_value')
+            stored['flex_slots'] = update.get('flex_slots')
+
+
+class ReplayStore:
+    """
+    [CHAFI-THESIS] Context objects of a snapshot file, shared by all FakeContextClients.
+
+    Attributes:
+        rpc_counts: RPC name -> calls served
+        events: Device/link events published for the writes
+    """
+
+    def __init__(self, snapshot: Dict):
+        self._lock = threading.Lock()
+        self.devices = [json_format.ParseDict(d, Device(), ignore_unknown_fields=True)
+                        for d in snapshot.get('devices', [])]
+        self.optical_links = {}  # link_uuid -> OpticalLink (recording order kept)
+        for link_dict in snapshot.get('optical_links', []):
+            link = json_format.ParseDict(link_dict, OpticalLink(), ignore_unknown_fields=True)
+            self.optical_links[link.link_id.link_uuid.uuid] = link
+        self.optical_configs = {}  # opticalconfig_uuid -> OpticalConfig
+        for config_dict in snapshot.get('optical_configs', []):
+            config = json_format.ParseDict(config_dict, OpticalConfig(), ignore_unknown_fields=True)
+            self.optical_configs[config.opticalconfig_id.opticalconfig_uuid] = config
+        self.services = {}  # service_uuid -> Service
+        for service_dict in snapshot.get('services', []):
+            service = json_format.ParseDict(service_dict, Service(), ignore_unknown_fields=True)
+            self.services[service.service_id.service_uuid.uuid] = service
+        self.rpc_counts = {}  # type: Dict[str, int]
+        self.events = LocalEventSource()
+
+    @classmethod
+    def load(cls, path: str) -> 'ReplayStore':
+        """Store of a snapshot file written by record_context()."""
+        with open(path) as snapshot_file:
+            return cls(json.load(snapshot_file))
+
+    def count(self, rpc: str) -> None:
+        with self._lock:
+            self.rpc_counts[rpc] = self.rpc_counts.get(rpc, 0) + 1
+
+    def list_devices(self) -> DeviceList:
+        with self._lock:
+            return DeviceList(devices=self.devices)
+
+    def list_optical_links(self) -> OpticalLinkList:
+        with self._lock:
+            return OpticalLinkList(optical_links=list(self.optical_links.values()))
+
+    def get_optical_link(self, link_uuid: str) -> OpticalLink:
+        with self._lock:
+            link = self.optical_links.get(link_uuid)
+            if link is None:
+                raise Exception(f"OpticalLink {link_uuid} not found")
+            return _copy(link)
+
+    def set_optical_link(self, link: OpticalLink) -> None:
+        link_uuid = link.link_id.link_uuid.uuid
+        with self._lock:
+            created = link_uuid not in self.optical_links
+            self.optical_links[link_uuid] = _copy(link)
+        self.events.publish_link_event(
+            link_uuid, EventTypeEnum.EVENTTYPE_CREATE if created else EventTypeEnum.EVENTTYPE_UPDATE)
+
+    def select_optical_config(self, opticalconfig_uuid: str) -> OpticalConfig:
+        with self._lock:
+            config = self.optical_configs.get(opticalconfig_uuid)
+            # Context answers an unknown id with an empty OpticalConfig
+            return _copy(config) if config is not None else OpticalConfig()
+
+    def update_optical_config(self, update: OpticalConfig) -> None:
+        """Merges the channels of an UpdateOpticalConfig payload ({"new_config": {...}})."""
+        new_config = json.loads(update.config).get('new_config', {})
+        opticalconfig_uuid = update.opticalconfig_id.opticalconfig_uuid
+        with self._lock:
+            stored = self.optical_configs.get(opticalconfig_uuid)
+            if stored is None:
+                raise Exception(f"OpticalConfig {opticalconfig_uuid} not found")
+            config = json.loads(stored.config) if stored.config else {}
+            _merge_channels(config, new_config.get('channels', []))
+            stored.config = json.dumps(config)
+            device_uuid = stored.device_id.device_uuid.uuid
+        if device_uuid:
+            self.events.publish_device_event(device_uuid)
+
+    def get_service(self, service_uuid: str) -> Service:
+        with self._lock:
+            service = self.services.get(service_uuid)
+            if service is None:
+                raise Exception(f"Service {service_uuid} not found")
+            return _copy(service)
+
+    def set_service(self, service: Service) -> None:
+        with self._lock:
+            self.services[service.service_id.service_uuid.uuid] = _copy(service)
+
+    def list_services(self) -> ServiceList:
+        with self._lock:
+            return ServiceList(services=list(self.services.values()))
+
+
+class FakeContextClient:
+    """
+    [CHAFI-THESIS] In-process ContextClient serving a ReplayStore.
+
+    Implements the RPCs the controller uses; each call sleeps for its
+    configured latency first (outside any lock, like a network round trip).
+    """
+
+    def __init__(self, store: ReplayStore, latency_ms: Optional[Dict[str, float]] = None):
+        self._store = store
+        self._latency_ms = latency_ms if latency_ms is not None else parse_latency_spec(REPLAY_RPC_LATENCY_MS)
+
+    def _rpc(self, rpc: str) -> None:
+        self._store.count(rpc)
+        delay_ms = self._latency_ms.get(rpc, self._latency_ms.get('*', 0.0))
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1e3)
+
+    def connect(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def ListDevices(self, request: Empty) -> DeviceList:
+        self._rpc('ListDevices')
+        return self._store.list_devices()
+
+    def GetOpticalLinkList(self, request: Empty) -> OpticalLinkList:
+        self._rpc('GetOpticalLinkList')
+        return self._store.list_optical_links()
+
+    def GetOpticalLink(self, request) -> OpticalLink:
+        self._rpc('GetOpticalLink')
+        return self._store.get_optical_link(request.link_uuid.uuid)
+
+    def SetOpticalLink(self, request: OpticalLink) -> None:
+        self._rpc('SetOpticalLink')
+        self._store.set_optical_link(request)
+
+    def SelectOpticalConfig(self, request: OpticalConfigId) -> OpticalConfig:
+        self._rpc('SelectOpticalConfig')
+        return self._store.select_optical_config(request.opticalconfig_uuid)
+
+    def UpdateOpticalConfig(self, request: OpticalConfig) -> OpticalConfigId:
+        self._rpc('UpdateOpticalConfig')
+        self._store.update_optical_config(request)
+        return _copy(request.opticalconfig_id)
+
+    def GetService(self, request) -> Service:
+        self._rpc('GetService')
+        return self._store.get_service(request.service_uuid.uuid)
+
+    def SetService(self, request: Service) -> None:
+        self._rpc('SetService')
+        self._store.set_service(request)
+
+    def ListServices(self, request: ContextId) -> ServiceList:
+        self._rpc('ListServices')
+        return self._store.list_services()
+
+    def GetDeviceEvents(self, request: Empty):
+        self._rpc('GetDeviceEvents')
+        return self._store.events.subscribe(DEVICE_EVENTS)
+
+    def GetLinkEvents(self, request: Empty):
+        self._rpc('GetLinkEvents')
+        return self._store.events.subscribe(LINK_EVENTS)
+
+
+def install_replay_context(path: str, latency_spec: Optional[str] = None) -> ReplayStore:
+    """
+    [CHAFI-THESIS] Serves a snapshot file to the controller through CONTEXT_CLIENT_POOL.
+
+    Args:
+        path: Snapshot file written by record_context()
+        latency_spec: Per-RPC latency spec (None = REPLAY_RPC_LATENCY_MS)
+
+    Returns:
+        ReplayStore: The served store (its rpc_counts and written objects)
+    """
+    store = ReplayStore.load(path)
+    latency_ms = parse_latency_spec(REPLAY_RPC_LATENCY_MS if latency_spec is None else latency_spec)
+    CONTEXT_CLIENT_POOL.set_client_factory(lambda: FakeContextClient(store, latency_ms))
+    return store
+
+
+class RequestRecorder:
+    """
+    [CHAFI-THESIS] Appends API requests to a JSONL stream for bench_replay.py.
+
+    One line per request: method, path (with query string), JSON body,
+    response status and, if the response carries one, the flow_id (so the
+    replay can map recorded flow ids to the ones it creates).
+    """
+
+    def __init__(self, path: str = POC_REQUEST_LOG):
+        self._path = path
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._path)
+
+    def record(self, method: str, path: str, body: Optional[Dict], status: int,
+               response_body: Optional[Dict] = None) -> None:
+        if not path.startswith(RECORDED_PATH_PREFIX):
+            return
+        entry = {'method': method, 'path': path, 'json': body, 'status': status}
+        if isinstance(response_body, dict) and response_body.get('flow_id') is not None:
+            entry['flow_id'] = response_body['flow_id']
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            with open(self._path, 'a') as stream_file:
+                stream_file.write(line)
+
+
+def load_request_stream(path: str) -> List[Dict]:
+    """Requests of a stream written by RequestRecorder (or bench_replay.py generate)."""
+    with open(path) as stream_file:
+        return [json.loads(line) for line in stream_file if line.strip()]
+
+
+# [CHAFI-THESIS] Process-wide recorder (disabled unless POC_REQUEST_LOG is set)
+REQUEST_RECORDER = RequestRecorder()
@@ -0,0 +1,255 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+[CHAFI-THESIS-START]
+Reservation Ledger Module for Parallel Optical Controller
+
+Concurrent PerformRSA requests read the same snapshot bitmaps, so without
+coordination two of them can pick the same slots and the conflict only
+surfaces at AcquireSlots. The ledger keeps short-lived provisional
+reservations of the slots chosen by RSA, per endpoint and in the endpoint's
+native frame (the same masks clear_endpoint_slots() takes):
+
+    - held_masks() gives RSA the slots other flows hold, to treat as occupied
+    - reserve() is a compare-and-set: it fails if the snapshot version moved
+      since the RSA read it, or if another flow reserved overlapping slots
+    - claim() turns a flow's reservation into a hold without expiry while
+      AcquireSlots writes to Context; release_flow() drops it afterwards
+
+Reservations expire after RESERVATION_TTL_SEC unless claimed. Once expired,
+another flow may reserve and even acquire the same slots, so claim() only
+reserves missing slots again if no other flow holds them and the current
+snapshot still has them free.
+
+Classes:
+    - Reservation: Slots held by one RSA result of one flow
+    - ReservationLedger: Thread-safe set of reservations with expiry and CAS
+[CHAFI-THESIS-END]
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from .TopologySnapshot import SNAPSHOT_MANAGER
+
+LOGGER = logging.getLogger(__name__)
+
+# [CHAFI-THESIS] Lifetime of a provisional reservation that AcquireSlots has not claimed
+RESERVATION_TTL_SEC = float(os.environ.get('RSA_RESERVATION_TTL_SEC', '30'))
+# [CHAFI-THESIS] RSA attempts before a request gives up on a contended reservation
+RESERVATION_MAX_ATTEMPTS = int(os.environ.get('RSA_RESERVATION_MAX_ATTEMPTS', '3'))
+
+
+class Reservation:
+    """
+    [CHAFI-THESIS] Slots held by one RSA result of one flow.
+
+    Attributes:
+        reservation_id: Unique id (returned to the client in the RSA result)
+        flow_id: Flow that owns the reservation
+        path_type: 'dijkstra' or 'alternative_<i>'
+        endpoint_masks: endpoint_uuid -> reserved slots mask in the endpoint's native frame
+        snapshot_version: Snapshot version the RSA was computed on
+        expires_at: Expiry time (None once claimed by AcquireSlots)
+    """
+
+    def __init__(self, flow_id, path_type: str, endpoint_masks: Dict[str, int],
+                 snapshot_version: Optional[int], expires_at: Optional[float]):
+        self.reservation_id = uuid.uuid4().hex
+        self.flow_id = flow_id
+        self.path_type = path_type
+        self.endpoint_masks = endpoint_masks
+        self.snapshot_version = snapshot_version
+        self.expires_at = expires_at
+
+    def is_expired(self, now: float) -> bool:
+        return self.expires_at is not None and self.expires_at <= now
+
+    def __repr__(self):
+        return "Reservation(flow_id={}, path_type={}, endpoints={}, expires_at={})".format(
+            self.flow_id, self.path_type, len(self.endpoint_masks), self.expires_at)
+
+
+class ReservationLedger:
+    """
+    [CHAFI-THESIS] Thread-safe ledger of provisional slot reservations.
+
+    All operations take one short lock; RSA itself runs outside it.
+    """
+
+    def __init__(self, version_source: Callable[[], int], ttl_sec: float = RESERVATION_TTL_SEC,
+                 slots_free: Callable[[Dict[str, int]], bool] = lambda endpoint_masks: True):
+        self._lock = threading.Lock()
+        self._version_source = version_source
+        self._slots_free = slots_free
+        self._ttl_sec = ttl_sec
+        self._reservations = {}  # type: Dict[str, Reservation]
+        self._by_endpoint = {}   # type: Dict[str, set]  endpoint_uuid -> reservation_ids
+
+    def held_masks(self, exclude_flow_id=None) -> Dict[str, int]:
+        """
+        Slots currently held per endpoint (native frame), for RSA to treat as occupied.
+
+        Args:
+            exclude_flow_id: Ignore the reservations of this flow (its own earlier RSA results)
+        """
+        with self._lock:
+            self._purge_expired(time.time())
+            masks = {}
+            for reservation in self._reservations.values():
+                if reservation.flow_id == exclude_flow_id:
+                    continue
+                for endpoint_uuid, mask in reservation.endpoint_masks.items():
+                    masks[endpoint_uuid] = masks.get(endpoint_uuid, 0) | mask
+            return masks
+
+    def reserve(self, flow_id, path_type: str, endpoint_masks: Dict[str, int],
+                expected_version: Optional[int] = None) -> Optional[Reservation]:
+        """
+        Compare-and-set: reserve the slots of an RSA result.
+
+        Fails if expected_version is given and the snapshot has moved on (the
+        RSA read stale bitmaps), or if another flow holds overlapping slots.
+        A previous reservation of the same flow and path_type is replaced.
+
+        Returns:
+            Reservation, or None if the caller must re-run RSA
+        """
+        with self._lock:
+            now = time.time()
+            self._purge_expired(now)
+
+            if expected_version is not None and expected_version != self._version_source():
+                LOGGER.debug("[CHAFI-RESERVE] flow {} {}: snapshot v{} is stale (now v{})".format(
+                    flow_id, path_type, expected_version, self._version_source()))
+                return None
+            if self._conflicts(flow_id, endpoint_masks):
+                LOGGER.debug("[CHAFI-RESERVE] flow {} {}: slots held by another flow".format(
+                    flow_id, path_type))
+                return None
+
+            for reservation in self._flow_reservations(flow_id):
+                if reservation.path_type == path_type:
+                    self._remove(reservation.reservation_id)
+
+            reservation = Reservation(
+                flow_id, path_type, dict(endpoint_masks), expected_version, now + self._ttl_sec)
+            self._add(reservation)
+            return reservation
+
+    def claim(self, flow_id, path_type: str, endpoint_masks: Dict[str, int]) -> Optional[Reservation]:
+        """
+        Turns the flow's reservation of path_type into a hold without expiry (AcquireSlots).
+
+        The flow's other reservations are released. If the reservation is
+        missing or expired the slots are reserved again, unless another flow
+        holds them or they are no longer free in the current snapshot (another
+        flow reserved and acquired them after the expiry).
+
+        Returns:
+            Reservation, or None if the slots are held or used by another flow
+        """
+        with self._lock:
+            self._purge_expired(time.time())
+
+            held = None
+            for reservation in self._flow_reservations(flow_id):
+                if reservation.path_type == path_type and reservation.endpoint_masks == endpoint_masks:
+                    held = reservation
+                else:
+                    self._remove(reservation.reservation_id)
+
+            if held is None:
+                if self._conflicts(flow_id, endpoint_masks) or not self._slots_free(endpoint_masks):
+                    return None
+                held = Reservation(flow_id, path_type, dict(endpoint_masks), None, None)
+                self._add(held)
+            held.expires_at = None
+            return held
+
+    def release(self, reservation_id: str) -> None:
+        """Drops one reservation (no-op if it does not exist)."""
+        with self._lock:
+            self._remove(reservation_id)
+
+    def release_flow(self, flow_id) -> None:
+        """Drops every reservation of a flow (after acquisition or deletion)."""
+        with self._lock:
+            for reservation in self._flow_reservations(flow_id):
+                self._remove(reservation.reservation_id)
+
+    def flow_ids(self) -> set:
+        """flow_ids with a live reservation or hold."""
+        with self._lock:
+            self._purge_expired(time.time())
+            return {reservation.flow_id for reservation in self._reservations.values()}
+
+    def __len__(self):
+        with self._lock:
+            self._purge_expired(time.time())
+            return len(self._reservations)
+
+    def _conflicts(self, flow_id, endpoint_masks: Dict[str, int]) -> bool:
+        for endpoint_uuid, mask in endpoint_masks.items():
+            for reservation_id in self._by_endpoint.get(endpoint_uuid, ()):
+                reservation = self._reservations[reservation_id]
+                if reservation.flow_id != flow_id and reservation.endpoint_masks[endpoint_uuid] & mask:
+                    return True
+        return False
+
+    def _flow_reservations(self, flow_id) -> List[Reservation]:
+        return [r for r in self._reservations.values() if r.flow_id == flow_id]
+
+    def _add(self, reservation: Reservation) -> None:
+        self._reservations[reservation.reservation_id] = reservation
+        for endpoint_uuid in reservation.endpoint_masks:
+            self._by_endpoint.setdefault(endpoint_uuid, set()).add(reservation.reservation_id)
+
+    def _remove(self, reservation_id: str) -> None:
+        reservation = self._reservations.pop(reservation_id, None)
+        if reservation is None:
+            return
+        for endpoint_uuid in reservation.endpoint_masks:
+            reservation_ids = self._by_endpoint.get(endpoint_uuid)
+            if reservation_ids is not None:
+                reservation_ids.discard(reservation_id)
+                if not reservation_ids:
+                    del self._by_endpoint[endpoint_uuid]
+
+    def _purge_expired(self, now: float) -> None:
+        expired = [rid for rid, r in self._reservations.items() if r.is_expired(now)]
+        for reservation_id in expired:
+            LOGGER.debug("[CHAFI-RESERVE] Expired {}".format(self._reservations[reservation_id]))
+            self._remove(reservation_id)
+
+
+def snapshot_slots_free(endpoint_masks: Dict[str, int]) -> bool:
+    """True unless the current snapshot has some of the slots (native frame) already in use."""
+    snapshot = SNAPSHOT_MANAGER.current_snapshot()
+    if snapshot is None:
+        return True  # nothing to check against; AcquireSlots still checks Context
+    for endpoint_uuid, mask in endpoint_masks.items():
+        endpoint = snapshot.cache.get_endpoint(endpoint_uuid)
+        if endpoint is not None and endpoint.bitmap_value & mask != mask:
+            return False
+    return True
+
+
+# [CHAFI-THESIS] Process-wide ledger, compare-and-set against the shared snapshot version
+RESERVATION_LEDGER = ReservationLedger(lambda: SNAPSHOT_MANAGER.version, slots_free=snapshot_slots_free)
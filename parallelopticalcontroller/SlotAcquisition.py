@@ -0,0 +1,480 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+[CHAFI-THESIS-START]
+Slot Acquisition Module for Parallel Optical Controller
+
+Writes an RSA allocation into the OpticalConfig of the devices on a path.
+Path endpoints are grouped per device, so each device costs one
+SelectOpticalConfig and one UpdateOpticalConfig carrying all of its changed
+channels (a transit ROADM has two endpoints on the path). The link and
+service status updates that follow are independent and run concurrently.
+
+A slot is only cleared if the bitmap read from Context still has it free;
+otherwise the device is not written and SlotConflictError is raised.
+prepare_device_release() builds the reverse update, which frees the slots
+of allocations already written (rollback of a partially written batch).
+
+Classes:
+    - SlotConflictError: Allocated slots are no longer free in Context
+    - DeviceSlotUpdate: Checked UpdateOpticalConfig of one device, written on demand
+
+Functions:
+    - group_acquisition_by_device: Groups acquisition_metadata entries by device
+    - allocation_endpoint_masks: Allocated slots of an RSA result per endpoint (native frame)
+    - find_target_channel: Maps a path endpoint to its OpticalConfig channel
+    - acquire_device_slots: Read-modify-write of one device's channels
+    - apply_device_allocations: Same, for allocations of several lightpaths
+    - prepare_device_allocations: Read and check of apply_device_allocations(), without the write
+    - prepare_device_release: Update freeing the slots of written allocations again
+    - mark_links_and_activate_services: Concurrent link/service status updates
+[CHAFI-THESIS-END]
+"""
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+from context.client.ContextClient import ContextClient
+from common.proto.context_pb2 import (
+    ContextId, LinkId, OpticalConfig, OpticalConfigId, ServiceId, ServiceStatusEnum
+)
+from common.tools.context_queries.OpticalConfig import opticalconfig_uuid_get_duuid
+from common.RSATools import ROADM_DEVICE_TYPES, TRANSPONDER_DEVICE_TYPES
+
+from .RSAHelper import TopologyHelper
+
+LOGGER = logging.getLogger(__name__)
+
+
+class SlotConflictError(Exception):
+    """[CHAFI-THESIS] Allocated slots are already in use in the device's OpticalConfig."""
+
+
+# [CHAFI-THESIS] Upper bound on concurrent link/service RPCs per acquisition
+ACQUISITION_MAX_WORKERS = 16
+
+
+def group_acquisition_by_device(acquisition_metadata: List[Dict]) -> Dict[str, List[Dict]]:
+    """
+    [CHAFI-THESIS] Groups acquisition metadata entries by device_uuid (path order is kept).
+
+    Returns:
+        dict: device_uuid -> list of acquisition metadata entries
+    """
+    by_device = {}
+    for meta in acquisition_metadata:
+        by_device.setdefault(meta['device_uuid'], []).append(meta)
+    return by_device
+
+
+def allocation_endpoint_masks(rsa_result: Dict) -> Dict[str, int]:
+    """
+    Allocated slots of a successful RSA result per path endpoint, in each endpoint's native frame.
+
+    These are the masks cleared from the endpoint bitmaps on acquisition and
+    held by the reservation ledger until then.
+    """
+    allocation_mask = rsa_result.get('mask', 0)
+    masks = {}
+    for meta in rsa_result.get('acquisition_metadata', []):
+        native_mask = TopologyHelper.reference_mask_to_native(
+            allocation_mask, meta['offset_slots'], meta['native_flex_slots'])
+        masks[meta['endpoint_uuid']] = masks.get(meta['endpoint_uuid'], 0) | native_mask
+    return masks
+
+
+def find_target_channel(current_config: Dict, device_type: str, endpoint_name: str,
+                        endpoint_index: Any) -> Optional[str]:
+    """
+    [CHAFI-RSA-SLOT] Finds the OpticalConfig channel of a path endpoint (sync with RSATools).
+
+    Transponders are matched by endpoint_index through config['endpoints'],
+    ROADMs by channel_index == endpoint name.
+
+    Returns:
+        str: Channel name/index, or None if not found
+    """
+    target_channel_name = None
+
+    if device_type in TRANSPONDER_DEVICE_TYPES:
+        if endpoint_index:
+            # 1. Map endpoint_index -> channel_name using config['endpoints']
+            # config['endpoints'] list of dicts: {'endpoint_uuid': {'index': '1', 'channel': 'channel-0'}, ...}
+            mapped_channel_name = None
+            for ep in current_config.get('endpoints', []):
+                ep_uuid = ep.get('endpoint_uuid', {})
+                if str(ep_uuid.get('index')) == str(endpoint_index):
+                    mapped_channel_name = ep_uuid.get('channel')
+                    break
+
+            if mapped_channel_name:
+                # 2. Validate channel exists in config['channels']
+                for ch in current_config.get('channels', []):
+                    if ch.get('name', {}).get('index') == mapped_channel_name:
+                        target_channel_name = mapped_channel_name
+                        break
+
+        if not target_channel_name:
+            LOGGER.warning(
+                f"[POC:AcquireSlots] Could not find channel for TR endpoint_index {endpoint_index}, trying name {endpoint_name}")
+
+    elif device_type in ROADM_DEVICE_TYPES:
+        for channel in current_config.get('channels', []):
+            ch_index = channel.get('channel_index')
+            if not ch_index and isinstance(channel.get('name'), dict):
+                ch_index = channel['name'].get('index')
+
+            if str(ch_index) == str(endpoint_name):
+                target_channel_name = ch_index
+                break
+
+    return target_channel_name
+
+
+def _find_channel_data(current_config: Dict, target_channel_name: str) -> Dict:
+    """Returns the existing channel dict matching target_channel_name ({} if none)."""
+    for ch in current_config.get('channels', []):
+        ch_idx = ch.get('name', {}).get('index') if isinstance(ch.get('name'), dict) else ch.get('name')
+        if not ch_idx and 'channel_index' in ch:
+            ch_idx = ch['channel_index']
+
+        if str(ch_idx) == str(target_channel_name):
+            return ch
+    return {}
+
+
+def _build_channel_update(target_channel_name: str, existing_channel_data: Dict,
+                          native_bitmap_str: str, native_flex_slots: int) -> Dict:
+    """
+    [CHAFI-RSA-SLOT] Builds one channel entry of the UpdateOpticalConfig payload.
+
+    Must include ALL mandatory fields because Context Service uses UPSERT
+    (INSERT keys ... ON CONFLICT UPDATE); existing values are preserved.
+    """
+    return {
+        "name": {"index": target_channel_name},
+        "bitmap_value": native_bitmap_str,
+        "flex_slots": native_flex_slots,
+        # Preserve existing values or default to 0 if not found
+        "frequency": existing_channel_data.get("frequency", 0),
+        "operational-mode": existing_channel_data.get("operational-mode", 0),
+        "target-output-power": existing_channel_data.get("target-output-power", ""),
+        "status": existing_channel_data.get("status", ""),
+        # [CHAFI-RSA-SLOT] Preserve Transponder frequency bounds
+        "min_frequency": existing_channel_data.get("min_frequency", 0),
+        "max_frequency": existing_channel_data.get("max_frequency", 0),
+        # [CHAFI-RSA-SLOT] Preserve ROADM specific fields
+        "lower_frequency": int(existing_channel_data["lower_frequency"]) if "lower_frequency" in existing_channel_data else 0,
+        "upper_frequency": int(existing_channel_data["upper_frequency"]) if "upper_frequency" in existing_channel_data else 0,
+        "dest_port": existing_channel_data.get("dest_port"),
+        "src_port": existing_channel_data.get("src_port"),
+        "band_name": existing_channel_data.get("band_name"),
+        "type": existing_channel_data.get("type", "media_channel"),
+    }
+
+
+def _current_bitmap(existing_channel_data: Dict) -> Optional[int]:
+    """Native bitmap currently stored for a channel, or None if missing/unparseable."""
+    bitmap_value = existing_channel_data.get('bitmap_value')
+    if bitmap_value is None or bitmap_value == '':
+        return None
+    try:
+        return int(bitmap_value)
+    except (ValueError, TypeError):
+        return None
+
+
+def acquire_device_slots(context_client: ContextClient, device_uuid: str, device_metas: List[Dict],
+                         allocation_mask: int, reference_slots: int) -> Tuple[List[Dict], Dict[str, int]]:
+    """
+    [CHAFI-THESIS] Clears the allocated slots on all path endpoints of one device.
+
+    Args:
+        context_client: Connected ContextClient
+        device_uuid: Device UUID
+        device_metas: acquisition_metadata entries of this device
+        allocation_mask: Allocated slots in the reference frame (bit i = slot i)
+        reference_slots: Width of the reference frame
+
+    Returns:
+        tuple: (updated_endpoints, endpoint_masks), see apply_device_allocations()
+    """
+    return apply_device_allocations(
+        context_client, device_uuid, [(meta, allocation_mask, reference_slots) for meta in device_metas])
+
+
+def apply_device_allocations(context_client: ContextClient, device_uuid: str,
+                             allocations: List[Tuple[Dict, int, int]]) -> Tuple[List[Dict], Dict[str, int]]:
+    """
+    [CHAFI-THESIS] Applies one or more slot allocations to the endpoints of one device.
+
+    Reads the device OpticalConfig once, applies every allocation to its
+    endpoint's channel with integer masks and writes all changed channels in a
+    single UpdateOpticalConfig. Nothing is written if any endpoint of the
+    device cannot be mapped to a channel or has allocated slots in use.
+    Allocations of different lightpaths (BatchProvision) may target the same
+    endpoint.
+
+    Args:
+        context_client: Connected ContextClient
+        device_uuid: Device UUID
+        allocations: (acquisition_metadata entry, allocation_mask, reference_slots) tuples,
+                     allocation_mask being the allocated slots in the entry's reference frame
+
+    Returns:
+        tuple: (updated_endpoints, endpoint_masks) where endpoint_masks maps
+               endpoint_uuid -> allocated slots mask in the endpoint's native frame
+
+    Raises:
+        SlotConflictError: If allocated slots are not free in the stored bitmap
+        Exception: If the config cannot be fetched or a channel is not found
+    """
+    return prepare_device_allocations(context_client, device_uuid, allocations).write(context_client)
+
+
+class DeviceSlotUpdate:
+    """
+    [CHAFI-THESIS] UpdateOpticalConfig of one device, checked but not written yet.
+
+    Lets AcquireSlots check every device of a path before writing any of them.
+
+    Attributes:
+        device_uuid: Device UUID
+        updated_endpoints: Endpoints changed (device, endpoint, channel)
+        endpoint_masks: endpoint_uuid -> allocated slots mask in the endpoint's native frame
+    """
+
+    def __init__(self, device_uuid: str, config_update: OpticalConfig, channels: Dict[str, List],
+                 updated_endpoints: List[Dict], endpoint_masks: Dict[str, int]):
+        self.device_uuid = device_uuid
+        self.config_update = config_update
+        self.channels = channels
+        self.updated_endpoints = updated_endpoints
+        self.endpoint_masks = endpoint_masks
+
+    def write(self, context_client: ContextClient) -> Tuple[List[Dict], Dict[str, int]]:
+        """Issue the UpdateOpticalConfig; returns (updated_endpoints, endpoint_masks)."""
+        context_client.UpdateOpticalConfig(self.config_update)
+
+        for entry in self.updated_endpoints:
+            entry["new_bitmap"] = str(self.channels[entry["channel"]][1])
+
+        # LOGGER.info(f"[POC:AcquireSlots] Updated device {self.device_uuid}: {len(self.channels)} channel(s)")
+        return self.updated_endpoints, self.endpoint_masks
+
+
+def prepare_device_allocations(context_client: ContextClient, device_uuid: str,
+                               allocations: List[Tuple[Dict, int, int]]) -> DeviceSlotUpdate:
+    """
+    [CHAFI-THESIS] Reads one device's OpticalConfig and builds the update of apply_device_allocations().
+
+    Raises:
+        SlotConflictError: If allocated slots are not free in the stored bitmap
+        Exception: If the config cannot be fetched or a channel is not found
+    """
+    return _prepare_device_update(context_client, device_uuid, allocations, release=False)
+
+
+def prepare_device_release(context_client: ContextClient, device_uuid: str,
+                           allocations: List[Tuple[Dict, int, int]]) -> DeviceSlotUpdate:
+    """
+    [CHAFI-THESIS] Reads one device's OpticalConfig and builds the update freeing allocated slots again.
+
+    Takes the allocations given to apply_device_allocations(); slots of other
+    lightpaths on the same channels are kept.
+
+    Raises:
+        Exception: If the config cannot be fetched or a channel is not found
+    """
+    return _prepare_device_update(context_client, device_uuid, allocations, release=True)
+
+
+def _prepare_device_update(context_client: ContextClient, device_uuid: str,
+                           allocations: List[Tuple[Dict, int, int]], release: bool) -> DeviceSlotUpdate:
+    # 1. Fetch current config once for the whole device
+    opticalconfig_id = OpticalConfigId()
+    opticalconfig_id.opticalconfig_uuid = opticalconfig_uuid_get_duuid(device_uuid)
+    current_config_obj = context_client.SelectOpticalConfig(opticalconfig_id)
+
+    if not current_config_obj or not current_config_obj.config:
+        raise Exception(f"Could not fetch config for device {device_uuid}")
+
+    # Parse config safely
+    current_config = json.loads(current_config_obj.config) if isinstance(
+        current_config_obj.config, str) else current_config_obj.config
+
+    channels = {}  # target_channel_name -> [existing_channel_data, bitmap, flex_slots]
+    updated_endpoints = []
+    endpoint_masks = {}
+
+    # 2. Apply the allocation of every endpoint of this device
+    for meta, allocation_mask, reference_slots in allocations:
+        endpoint_name = meta['endpoint_name']
+        device_type = meta['device_type']
+        offset_slots = meta['offset_slots']
+        native_flex_slots = meta['native_flex_slots']
+
+        target_channel_name = find_target_channel(
+            current_config, device_type, endpoint_name, meta.get('endpoint_index'))
+        if not target_channel_name:
+            LOGGER.error(
+                f"[POC:AcquireSlots] Failed. DeviceType={device_type}, Name={endpoint_name}, Index={meta.get('endpoint_index')}")
+            raise Exception(f"Could not find channel for endpoint {endpoint_name}")
+
+        native_mask = TopologyHelper.reference_mask_to_native(
+            allocation_mask, offset_slots, native_flex_slots)
+
+        if target_channel_name not in channels:
+            existing_channel_data = _find_channel_data(current_config, target_channel_name)
+            # Start from the bitmap stored in Context so concurrent acquisitions on other
+            # slots of this channel are kept; fall back to the RSA-time aligned bitmap.
+            bitmap = _current_bitmap(existing_channel_data)
+            if bitmap is None:
+                reference_mask = (1 << reference_slots) - 1
+                bitmap = TopologyHelper.reference_mask_to_native(
+                    meta['aligned_bitmap'] & reference_mask, offset_slots, native_flex_slots)
+            channels[target_channel_name] = [existing_channel_data, bitmap, native_flex_slots]
+
+        channel = channels[target_channel_name]
+        if release:
+            channel[1] |= native_mask
+        elif channel[1] & native_mask != native_mask:
+            raise SlotConflictError(
+                f"Slots of endpoint {endpoint_name} on device {device_uuid} are already in use")
+        else:
+            channel[1] &= ~native_mask
+
+        endpoint_uuid = meta.get('endpoint_uuid')
+        endpoint_masks[endpoint_uuid] = endpoint_masks.get(endpoint_uuid, 0) | native_mask
+        updated_endpoints.append({
+            "device": device_uuid,
+            "endpoint": endpoint_name,
+            "channel": target_channel_name
+        })
+
+    # 3. Construct one update payload carrying all changed channels
+    update_payload = {
+        "new_config": {
+            "type": current_config.get('type'),
+            "channel_namespace": current_config.get('channel_namespace'),
+            "endpoints": current_config.get('endpoints', []),
+            "channels": [
+                _build_channel_update(name, existing, str(bitmap), flex_slots)
+                for name, (existing, bitmap, flex_slots) in channels.items()
+            ]
+        }
+    }
+
+    config_update = OpticalConfig()
+    config_update.opticalconfig_id.CopyFrom(opticalconfig_id)
+    # Fix for gRPC Error: ensure device_id is set
+    if hasattr(current_config_obj, 'device_id'):
+        config_update.device_id.CopyFrom(current_config_obj.device_id)
+    config_update.config = json.dumps(update_payload)
+
+    return DeviceSlotUpdate(device_uuid, config_update, channels, updated_endpoints, endpoint_masks)
+
+
+def get_link_uuid(link_item: Any) -> Optional[str]:
+    """Link UUID of a path link (dict from db_flows with 'id', or a UUID string)."""
+    if isinstance(link_item, dict):
+        return link_item.get('id')
+    return str(link_item)
+
+
+def mark_link_used(context_client: ContextClient, link_uuid: str) -> None:
+    """
+    [CHAFI-RSA-SLOT] Sets optical_details.used = True on an OpticalLink in Context.
+
+    Raises:
+        Exception: If the GetOpticalLink/SetOpticalLink RPC fails
+    """
+    link_id = LinkId()
+    link_id.link_uuid.uuid = link_uuid
+    optical_link = context_client.GetOpticalLink(link_id)
+
+    # The OpticalLink message structure (common.proto.context_pb2)
+    # usually has optical_details inside.
+    if hasattr(optical_link, 'optical_details'):
+        optical_link.optical_details.used = True
+        context_client.SetOpticalLink(optical_link)
+    else:
+        LOGGER.warning(f"[POC:AcquireSlots] Link {link_uuid} has no optical_details")
+
+
+def set_service_active(context_client: ContextClient, service_uuid: str) -> None:
+    """
+    [CHAFI-RSA-SLOT] Sets the status of a service in the default context to ACTIVE.
+
+    Raises:
+        Exception: If the GetService/SetService RPC fails
+    """
+    c_id = ContextId()
+    c_id.context_uuid.uuid = "admin"  # DEFAULT_CONTEXT_NAME
+    s_id = ServiceId()
+    s_id.context_id.CopyFrom(c_id)
+    s_id.service_uuid.uuid = service_uuid
+
+    svc = context_client.GetService(s_id)
+    svc.service_status.service_status = ServiceStatusEnum.SERVICESTATUS_ACTIVE
+    context_client.SetService(svc)
+
+
+def mark_links_and_activate_services(context_client: ContextClient, link_uuids: List[str],
+                                     service_uuids: List[str]) -> Tuple[List[str], List[str]]:
+    """
+    [CHAFI-THESIS] Marks path links as used and activates the services concurrently.
+
+    The link RPCs and the service RPCs are independent, so they are issued on a
+    bounded pool over the same gRPC channel; acquisition latency no longer
+    grows with the number of hops. A failure is logged per link (or service)
+    and never aborts the others.
+
+    Args:
+        context_client: Connected ContextClient (shared by the workers)
+        link_uuids: UUIDs of the links to mark as used
+        service_uuids: Services to set ACTIVE (empty UUIDs are skipped)
+
+    Returns:
+        tuple: (error messages, one per failed link/service update;
+                UUIDs of the links left unmarked, to keep out of the snapshot)
+    """
+    errors = []
+    failed_link_uuids = []
+    tasks = [(mark_link_used, link_uuid, f"link {link_uuid}") for link_uuid in link_uuids]
+    tasks += [(set_service_active, service_uuid, f"service {service_uuid}")
+              for service_uuid in service_uuids if service_uuid]
+    if not tasks:
+        return errors, failed_link_uuids
+
+    max_workers = min(ACQUISITION_MAX_WORKERS, len(tasks))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(task, context_client, target): (task, target, label)
+            for task, target, label in tasks
+        }
+        for future in as_completed(futures):
+            task, target, label = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                LOGGER.error(f"[POC:AcquireSlots] Error updating {label}: {e}")
+                errors.append(f"{label}: {e}")
+                if task is mark_link_used:
+                    failed_link_uuids.append(target)
+
+    return errors, failed_link_uuids
@@ -0,0 +1,443 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+[CHAFI-THESIS-START]
+Snapshot Events Module for Parallel Optical Controller
+
+Keeps the topology snapshot in line with changes made outside the controller
+(other controllers, the WebUI, devices) without rebuilding it. A background
+subscriber follows the Context event streams (GetDeviceEvents,
+GetLinkEvents) and turns each event into the smallest update that covers it:
+
+    - device UPDATE of a device in the snapshot: its OpticalConfig is read
+      again and the bitmaps of its endpoints are patched (Context has no
+      OpticalConfig event stream; UpdateOpticalConfig shows up as an update
+      of the device)
+    - link UPDATE of a link in the snapshot: its OpticalLink is read again
+      and the used flag is patched
+    - device/link REMOVE of something in the snapshot, CREATE of an optical
+      link, or channel ranges that no longer match: the snapshot is
+      invalidated and the next request rebuilds it
+
+Updates go through TopologySnapshotManager.apply_update(): unchanged values
+(e.g. the events of the controller's own AcquireSlots) do not move the
+version, and values read while an acquisition patched the snapshot are read
+again (SNAPSHOT_UPDATE_MAX_ATTEMPTS, then the snapshot is invalidated).
+Events queued meanwhile are coalesced per device/link. An event of an
+AcquireSlots that overtakes its own apply_acquisition() patches the same
+slots first; the acquisition then only moves the version.
+
+Events can be missed (reconnects, Context restarts), so every
+SNAPSHOT_RECONCILE_SEC the subscriber also reads the whole topology and
+compares it with the snapshot: structural differences invalidate it, link
+flags and bitmaps are patched like events. A stream that broke is redialed
+after SNAPSHOT_EVENTS_RETRY_SEC and followed by a reconcile.
+
+The subscriber is off by default (SNAPSHOT_EVENTS=1 starts it with the
+controller): without it the snapshot only changes through the controller's
+own acquisitions and RefreshTopology.
+
+LocalEventSource is an in-process stand-in for the event streams, used by
+Replay.FakeContextClient.
+
+Classes:
+    - LocalEventSource: In-process device/link event streams
+    - SnapshotEventSubscriber: Context event consumer patching the snapshot
+[CHAFI-THESIS-END]
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+from common.proto.context_pb2 import (
+    DeviceEvent, DeviceId, Empty, Event, EventTypeEnum, LinkEvent, LinkId, OpticalLink
+)
+from common.RSATools import ROADM_DEVICE_TYPES, fetch_device_channel_index, lookup_channel_data
+
+from .ContextClientPool import CONTEXT_CLIENT_POOL
+from .TopologyRecords import parse_bitmap
+from .TopologySnapshot import SNAPSHOT_MANAGER, TopologySnapshot
+from .topology import fetch_optical_devices, fetch_optical_links_for_rsa
+
+LOGGER = logging.getLogger(__name__)
+
+# [CHAFI-THESIS] Follow the Context event streams (started with the controller; off unless set to 1)
+SNAPSHOT_EVENTS = os.environ.get('SNAPSHOT_EVENTS', '0') == '1'
+# [CHAFI-THESIS] Full comparison with Context, as a safety net for missed events (0 disables)
+SNAPSHOT_RECONCILE_SEC = float(os.environ.get('SNAPSHOT_RECONCILE_SEC', '300'))
+SNAPSHOT_EVENTS_RETRY_SEC = float(os.environ.get('SNAPSHOT_EVENTS_RETRY_SEC', '5'))
+# [CHAFI-THESIS] Reads of one update raced by acquisitions before the snapshot is invalidated
+SNAPSHOT_UPDATE_MAX_ATTEMPTS = 3
+
+DEVICE_EVENTS = 'device'
+LINK_EVENTS = 'link'
+_RECONCILE = 'reconcile'
+
+
+class _LocalStream:
+    """Iterator over the events published to one subscription (cancel() ends it)."""
+
+    def __init__(self, source: 'LocalEventSource', kind: str):
+        self._source = source
+        self._kind = kind
+        self._queue = queue.Queue()  # type: queue.Queue
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        event = self._queue.get()
+        if event is None:
+            raise StopIteration
+        return event
+
+    def put(self, event) -> None:
+        self._queue.put(event)
+
+    def cancel(self) -> None:
+        self._source.unsubscribe(self._kind, self)
+        self._queue.put(None)
+
+
+class LocalEventSource:
+    """
+    [CHAFI-THESIS] In-process device/link event streams (stand-in for Context's).
+
+    Every subscription gets the events published after it was opened, as
+    DeviceEvent/LinkEvent protobufs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._streams = {DEVICE_EVENTS: [], LINK_EVENTS: []}  # type: Dict[str, List[_LocalStream]]
+
+    def subscribe(self, kind: str) -> _LocalStream:
+        stream = _LocalStream(self, kind)
+        with self._lock:
+            self._streams[kind].append(stream)
+        return stream
+
+    def unsubscribe(self, kind: str, stream: _LocalStream) -> None:
+        with self._lock:
+            if stream in self._streams[kind]:
+                self._streams[kind].remove(stream)
+
+    def publish_device_event(self, device_uuid: str, event_type: int = EventTypeEnum.EVENTTYPE_UPDATE) -> None:
+        device_id = DeviceId()
+        device_id.device_uuid.uuid = device_uuid
+        self._publish(DEVICE_EVENTS, DeviceEvent(event=Event(event_type=event_type), device_id=device_id))
+
+    def publish_link_event(self, link_uuid: str, event_type: int = EventTypeEnum.EVENTTYPE_UPDATE) -> None:
+        link_id = LinkId()
+        link_id.link_uuid.uuid = link_uuid
+        self._publish(LINK_EVENTS, LinkEvent(event=Event(event_type=event_type), link_id=link_id))
+
+    def _publish(self, kind: str, event) -> None:
+        with self._lock:
+            streams = list(self._streams[kind])
+        for stream in streams:
+            stream.put(event)
+
+    def close(self) -> None:
+        """End every subscription."""
+        with self._lock:
+            streams = [stream for streams in self._streams.values() for stream in streams]
+        for stream in streams:
+            stream.cancel()
+
+
+class SnapshotEventSubscriber:
+    """
+    [CHAFI-THESIS] Context event consumer patching the topology snapshot.
+
+    One thread per event stream queues the events, one thread applies them
+    (and runs the periodic reconcile), so updates are applied in order.
+
+    Attributes:
+        events: Events received
+        updates: Events or reconciles that patched the snapshot
+        invalidations: Events or reconciles that invalidated it
+        reconciles: Full comparisons run
+    """
+
+    def __init__(self, reconcile_sec: float = SNAPSHOT_RECONCILE_SEC, manager=SNAPSHOT_MANAGER,
+                 pool=CONTEXT_CLIENT_POOL):
+        self._reconcile_sec = reconcile_sec
+        self._manager = manager
+        self._pool = pool
+        self._queue = queue.Queue()  # type: queue.Queue
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []  # type: List[threading.Thread]
+        self._streams = {}  # type: Dict[str, object]  kind -> open stream
+        self.events = 0
+        self.updates = 0
+        self.invalidations = 0
+        self.reconciles = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._threads)
+
+    def start(self) -> None:
+        """Start following the event streams (no-op if already running)."""
+        with self._lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._follow, args=(DEVICE_EVENTS, 'GetDeviceEvents'),
+                                 name='snapshot-device-events', daemon=True),
+                threading.Thread(target=self._follow, args=(LINK_EVENTS, 'GetLinkEvents'),
+                                 name='snapshot-link-events', daemon=True),
+                threading.Thread(target=self._process, name='snapshot-events', daemon=True),
+            ]
+            for thread in self._threads:
+                thread.start()
+        LOGGER.info("[CHAFI-SNAPSHOT] Following Context events (reconcile every {}s)".format(self._reconcile_sec))
+
+    def stop(self) -> None:
+        """Cancel the streams and wait for the threads."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+            self._stop.set()
+            streams = list(self._streams.values())
+        for stream in streams:
+            try:
+                stream.cancel()
+            except Exception:
+                pass
+        self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout=5)
+
+    def stats(self) -> Dict:
+        return {"running": self.running, "events": self.events, "updates": self.updates,
+                "invalidations": self.invalidations, "reconciles": self.reconciles}
+
+    def _follow(self, kind: str, rpc: str) -> None:
+        """Queue the events of one stream, redialing it until stopped."""
+        while not self._stop.is_set():
+            ctx_client = None
+            try:
+                ctx_client = self._pool.dial()
+                stream = getattr(ctx_client, rpc)(Empty())
+                with self._lock:
+                    if self._stop.is_set():
+                        stream.cancel()
+                        return
+                    self._streams[kind] = stream
+                for event in stream:
+                    self._queue.put((kind, event))
+            except Exception as e:
+                if not self._stop.is_set():
+                    LOGGER.warning("[CHAFI-SNAPSHOT] {} stream error: {}".format(rpc, e))
+            finally:
+                with self._lock:
+                    self._streams.pop(kind, None)
+                if ctx_client is not None:
+                    ctx_client.close()
+            if self._stop.wait(SNAPSHOT_EVENTS_RETRY_SEC):
+                return
+            # Events sent while the stream was down are lost
+            self._queue.put((_RECONCILE, None))
+
+    def _process(self) -> None:
+        """Apply queued events in batches, and reconcile every reconcile_sec."""
+        next_reconcile = self._next_reconcile()
+        while not self._stop.is_set():
+            timeout = max(0.0, next_reconcile - time.monotonic()) if next_reconcile is not None else None
+            try:
+                items = [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                items = [(_RECONCILE, None)]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in items:
+                return
+
+            device_events, link_events, reconcile = {}, {}, False
+            for kind, event in items:
+                if kind == _RECONCILE:
+                    reconcile = True
+                elif kind == DEVICE_EVENTS:
+                    device_events[event.device_id.device_uuid.uuid] = event.event.event_type
+                else:
+                    link_events[event.link_id.link_uuid.uuid] = event.event.event_type
+            self.events += len(items) - sum(1 for kind, _ in items if kind == _RECONCILE)
+
+            try:
+                if reconcile:
+                    # Covers the queued events as well
+                    self.reconcile()
+                    next_reconcile = self._next_reconcile()
+                else:
+                    self.apply_events(device_events, link_events)
+            except Exception as e:
+                # Context unreachable: invalidating would only make requests fail on the
+                # rebuild, so keep the snapshot and compare it with Context once it answers again
+                LOGGER.error("[CHAFI-SNAPSHOT] Event processing error: {}".format(e))
+                next_reconcile = time.monotonic() + SNAPSHOT_EVENTS_RETRY_SEC
+
+    def _next_reconcile(self) -> Optional[float]:
+        return time.monotonic() + self._reconcile_sec if self._reconcile_sec > 0 else None
+
+    def apply_events(self, device_events: Dict[str, int], link_events: Dict[str, int]) -> None:
+        """
+        Patch the current snapshot for a batch of events (or invalidate it).
+
+        Args:
+            device_events: device_uuid -> EventTypeEnum of its last event
+            link_events: link_uuid -> EventTypeEnum of its last event
+        """
+        for _ in range(SNAPSHOT_UPDATE_MAX_ATTEMPTS):
+            version = self._manager.version
+            snapshot = self._manager.current_snapshot()
+            if snapshot is None:
+                return  # the next build reads Context anyway
+
+            with self._pool.client() as ctx_client:
+                changes = self._read_event_changes(snapshot, device_events, link_events, ctx_client)
+            if isinstance(changes, str):
+                self._invalidate(changes)
+                return
+            link_flags, endpoint_bitmaps = changes
+            if self._update(link_flags, endpoint_bitmaps, version):
+                return
+        self._invalidate('Context updates raced by acquisitions')
+
+    def reconcile(self) -> None:
+        """Compare the whole topology in Context with the snapshot and patch or invalidate it."""
+        self.reconciles += 1
+        for _ in range(SNAPSHOT_UPDATE_MAX_ATTEMPTS):
+            version = self._manager.version
+            snapshot = self._manager.current_snapshot()
+            if snapshot is None:
+                return
+
+            with self._pool.client() as ctx_client:
+                optical_devices = fetch_optical_devices(ctx_client)
+                optical_links = fetch_optical_links_for_rsa(optical_devices, ctx_client)
+            mismatch = self._structure_mismatch(snapshot, optical_links)
+            if mismatch is not None:
+                self._invalidate('reconcile: ' + mismatch)
+                return
+
+            link_flags = {link.link_uuid: link.used for link in optical_links}
+            endpoint_bitmaps = {endpoint.endpoint_uuid: endpoint.bitmap_value
+                                for link in optical_links for endpoint in link.endpoints}
+            if self._update(link_flags, endpoint_bitmaps, version):
+                return
+        self._invalidate('reconcile raced by acquisitions')
+
+    def _read_event_changes(self, snapshot: TopologySnapshot, device_events: Dict[str, int],
+                            link_events: Dict[str, int],
+                            ctx_client) -> Union[Tuple[Dict[str, bool], Dict[str, int]], str]:
+        """Link flags and endpoint bitmaps the events point at, or the reason to invalidate."""
+        link_flags, endpoint_bitmaps = {}, {}
+
+        for link_uuid, event_type in link_events.items():
+            known = snapshot.cache.get_link(link_uuid) is not None
+            if event_type == EventTypeEnum.EVENTTYPE_REMOVE:
+                if known:
+                    return 'link {} removed'.format(link_uuid)
+                continue
+            link = self._get_optical_link(ctx_client, link_uuid)
+            if link is None:
+                if known:
+                    return 'link {} no longer optical'.format(link_uuid)
+                continue  # not an optical link
+            if not known:
+                return 'optical link {} created'.format(link_uuid)
+            link_flags[link_uuid] = link.optical_details.used
+
+        for device_uuid, event_type in device_events.items():
+            endpoints = snapshot.cache.get_endpoints_by_device(device_uuid)
+            if not endpoints or event_type == EventTypeEnum.EVENTTYPE_CREATE:
+                continue  # links of a new device come as link events
+            if event_type == EventTypeEnum.EVENTTYPE_REMOVE:
+                return 'device {} removed'.format(device_uuid)
+            device_type = endpoints[0].device_type
+            channel_index = fetch_device_channel_index(device_uuid, device_type, ctx_client)
+            if channel_index is None:
+                continue
+            for endpoint in endpoints:
+                identifier = endpoint.name if device_type in ROADM_DEVICE_TYPES else endpoint.endpoint_index
+                channel_result = lookup_channel_data(channel_index, device_type, identifier) if identifier else None
+                if not channel_result:
+                    continue
+                channel_data = channel_result.get('channel_data') or {}
+                if (channel_data.get('min_frequency'), channel_data.get('max_frequency'),
+                        channel_data.get('flex_slots')) != (endpoint.min_frequency, endpoint.max_frequency,
+                                                            endpoint.flex_slots):
+                    return 'channel range of {} on device {} changed'.format(endpoint.name, device_uuid)
+                endpoint_bitmaps[endpoint.endpoint_uuid] = parse_bitmap(channel_data.get('bitmap_value'))
+
+        return link_flags, endpoint_bitmaps
+
+    @staticmethod
+    def _get_optical_link(ctx_client, link_uuid: str) -> Optional[OpticalLink]:
+        link_id = LinkId()
+        link_id.link_uuid.uuid = link_uuid
+        try:
+            return ctx_client.GetOpticalLink(link_id)
+        except Exception:
+            return None
+
+    @staticmethod
+    def _structure_mismatch(snapshot: TopologySnapshot, optical_links) -> Optional[str]:
+        """What differs between the snapshot's links/endpoints and the fetched ones, None if nothing."""
+        snapshot_links = {link.link_uuid: link for link in snapshot.optical_links}
+        if set(snapshot_links) != {link.link_uuid for link in optical_links}:
+            return 'optical links changed'
+        for link in optical_links:
+            snapshot_link = snapshot_links[link.link_uuid]
+            if len(link.endpoints) != len(snapshot_link.endpoints):
+                return 'endpoints of link {} changed'.format(link.link_uuid)
+            for endpoint, snapshot_endpoint in zip(link.endpoints, snapshot_link.endpoints):
+                if endpoint.endpoint_uuid != snapshot_endpoint.endpoint_uuid:
+                    return 'endpoints of link {} changed'.format(link.link_uuid)
+                if (endpoint.min_frequency, endpoint.max_frequency, endpoint.flex_slots) != (
+                        snapshot_endpoint.min_frequency, snapshot_endpoint.max_frequency,
+                        snapshot_endpoint.flex_slots):
+                    return 'channel range of endpoint {} changed'.format(endpoint.endpoint_uuid)
+        return None
+
+    def _update(self, link_flags: Dict[str, bool], endpoint_bitmaps: Dict[str, int], version: int) -> bool:
+        if not link_flags and not endpoint_bitmaps:
+            return True
+        before = self._manager.version
+        if not self._manager.apply_update(link_flags, endpoint_bitmaps, expected_version=version):
+            return False
+        if self._manager.version != before:
+            self.updates += 1
+        return True
+
+    def _invalidate(self, reason: str) -> None:
+        self.invalidations += 1
+        self._manager.invalidate(reason)
+
+
+# [CHAFI-THESIS] Process-wide subscriber (started by the controller when SNAPSHOT_EVENTS is set)
+SNAPSHOT_SUBSCRIBER = SnapshotEventSubscriber()
+atexit.register(SNAPSHOT_SUBSCRIBER.stop)
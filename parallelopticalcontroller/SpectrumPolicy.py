@@ -0,0 +1,198 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+[CHAFI-THESIS-START]
+Spectrum Policy Module for Parallel Optical Controller
+
+Spectrum assignment policies for perform_rsa(). RSA intersects the hop
+bitmaps into one reference bitmap; a policy then picks the start slot of
+the demand from its common.SpectrumTools.FreeSpectrum: the feasible start
+mask (first/last/band fits are a single bit operation on it) or the free
+blocks wide enough for the demand. The choice of policy adds no per-slot
+Python work.
+
+    first_fit        lowest feasible start (previous behaviour)
+    last_fit         highest feasible start
+    exact_fit        smallest block that fits (best fit), at its low end
+    random           uniform over all feasible starts
+    most_used        window already used on most endpoints of the snapshot
+    band_preferring  first fit inside the preferred band, else first fit
+
+The policy is chosen per lightpath (AddLightpath 'spectrum_policy' and
+'preferred_band'); RSA_SPECTRUM_POLICY and RSA_PREFERRED_BAND set the defaults.
+
+Classes:
+    - SpectrumContext: What the policies may look at besides the free spectrum
+
+Functions:
+    - select_start_slot: Start slot chosen by a policy (-1 if nothing fits)
+[CHAFI-THESIS-END]
+"""
+
+import logging
+import os
+import random
+from typing import Callable, Dict, List, Optional
+
+from common.ITUStandards import BAND_SLOT_RANGES
+from common.SpectrumTools import FreeSpectrum, range_mask
+
+LOGGER = logging.getLogger(__name__)
+
+# [CHAFI-THESIS] Spectrum assignment policies
+SPECTRUM_POLICY_FIRST_FIT = 'first_fit'
+SPECTRUM_POLICY_LAST_FIT = 'last_fit'
+SPECTRUM_POLICY_EXACT_FIT = 'exact_fit'
+SPECTRUM_POLICY_RANDOM = 'random'
+SPECTRUM_POLICY_MOST_USED = 'most_used'
+SPECTRUM_POLICY_BAND_PREFERRING = 'band_preferring'
+SPECTRUM_POLICIES = (
+    SPECTRUM_POLICY_FIRST_FIT, SPECTRUM_POLICY_LAST_FIT, SPECTRUM_POLICY_EXACT_FIT,
+    SPECTRUM_POLICY_RANDOM, SPECTRUM_POLICY_MOST_USED, SPECTRUM_POLICY_BAND_PREFERRING
+)
+DEFAULT_SPECTRUM_POLICY = os.environ.get('RSA_SPECTRUM_POLICY', SPECTRUM_POLICY_FIRST_FIT)
+# [CHAFI-THESIS] FreqeuncyRanges member preferred by band_preferring
+DEFAULT_PREFERRED_BAND = os.environ.get('RSA_PREFERRED_BAND', 'C_BAND')
+
+# [CHAFI-THESIS] Seed RSA_SPECTRUM_RANDOM_SEED for reproducible blocking experiments
+_RANDOM = random.Random(os.environ.get('RSA_SPECTRUM_RANDOM_SEED'))
+
+
+class SpectrumContext:
+    """
+    [CHAFI-THESIS] Inputs of a spectrum policy besides the free spectrum.
+
+    Attributes:
+        band_info: Reference band of the RSA (detect_band() result with frequency_range_hz)
+        cache: OpticalLinksCache of the snapshot (most_used reads its endpoint bitmaps)
+        slot_granularity_hz: Slot width in Hz
+        preferred_band: FreqeuncyRanges member name for band_preferring
+    """
+
+    def __init__(self, band_info: Optional[Dict] = None, cache=None, slot_granularity_hz: int = 0,
+                 preferred_band: Optional[str] = None):
+        self.band_info = band_info
+        self.cache = cache
+        self.slot_granularity_hz = slot_granularity_hz
+        self.preferred_band = preferred_band or DEFAULT_PREFERRED_BAND
+
+
+def _first_fit(spectrum: FreeSpectrum, context: SpectrumContext) -> int:
+    return spectrum.first_start()
+
+
+def _last_fit(spectrum: FreeSpectrum, context: SpectrumContext) -> int:
+    return spectrum.last_start()
+
+
+def _exact_fit(spectrum: FreeSpectrum, context: SpectrumContext) -> int:
+    # min() keeps the lowest block among equally small ones
+    return min(spectrum.fitting_blocks(), key=lambda block: block[1])[0]
+
+
+def _random_fit(spectrum: FreeSpectrum, context: SpectrumContext) -> int:
+    blocks = spectrum.fitting_blocks()
+    num_slots = spectrum.num_slots
+    choice = _RANDOM.randrange(sum(length - num_slots + 1 for _, length in blocks))
+    for start, length in blocks:
+        starts = length - num_slots + 1
+        if choice < starts:
+            return start + choice
+        choice -= starts
+    return spectrum.first_start()
+
+
+def _endpoint_usage(context: SpectrumContext) -> List[int]:
+    """Used-slot masks (reference frame, clipped to each endpoint's own range) of the snapshot endpoints."""
+    band_info = context.band_info
+    min_freq, max_freq = band_info['frequency_range_hz']
+    reference_slots = int((max_freq - min_freq) / context.slot_granularity_hz)
+    usage = []
+    for endpoint in context.cache.get_all_endpoints():
+        if not endpoint.min_frequency or not endpoint.max_frequency or not endpoint.flex_slots:
+            continue
+        aligned_bitmap, offset_slots = context.cache.get_aligned_bitmap(
+            endpoint, band_info['band_enum_name'], min_freq, max_freq, context.slot_granularity_hz)
+        low = max(offset_slots, 0)
+        high = min(offset_slots + endpoint.flex_slots, reference_slots)
+        used = range_mask(low, high - low) & ~aligned_bitmap
+        if used:
+            usage.append(used)
+    return usage
+
+
+def _most_used(spectrum: FreeSpectrum, context: SpectrumContext) -> int:
+    if context.cache is None or not context.band_info or not context.slot_granularity_hz:
+        return _first_fit(spectrum, context)
+    # Candidate windows: both edges of every block (packing against used spectrum)
+    num_slots = spectrum.num_slots
+    candidates = []
+    for start, length in spectrum.fitting_blocks():
+        candidates.append(start)
+        if length > num_slots:
+            candidates.append(start + length - num_slots)
+    usage = _endpoint_usage(context)
+    best_start, best_score = candidates[0], -1
+    for start in candidates:
+        window = range_mask(start, num_slots)
+        score = sum(bin(used & window).count('1') for used in usage)
+        if score > best_score:
+            best_start, best_score = start, score
+    return best_start
+
+
+def _band_preferring(spectrum: FreeSpectrum, context: SpectrumContext) -> int:
+    preferred = BAND_SLOT_RANGES.get(context.preferred_band)
+    if preferred is None or not context.band_info:
+        return _first_fit(spectrum, context)
+    # Both ranges are in the WHOLE_BAND frame; shift to the reference band's frame
+    reference_low = BAND_SLOT_RANGES[context.band_info['band_enum_name']][0]
+    band_low = preferred[0] - reference_low
+    band_high = preferred[1] - reference_low
+    start = spectrum.first_start_within(band_low, band_high)
+    return start if start >= 0 else _first_fit(spectrum, context)
+
+
+_POLICY_FUNCTIONS = {
+    SPECTRUM_POLICY_FIRST_FIT: _first_fit,
+    SPECTRUM_POLICY_LAST_FIT: _last_fit,
+    SPECTRUM_POLICY_EXACT_FIT: _exact_fit,
+    SPECTRUM_POLICY_RANDOM: _random_fit,
+    SPECTRUM_POLICY_MOST_USED: _most_used,
+    SPECTRUM_POLICY_BAND_PREFERRING: _band_preferring,
+}  # type: Dict[str, Callable[[FreeSpectrum, SpectrumContext], int]]
+
+
+def select_start_slot(policy: Optional[str], spectrum: FreeSpectrum,
+                      context: Optional[SpectrumContext] = None) -> int:
+    """
+    Start slot chosen by a spectrum policy.
+
+    Args:
+        policy: One of SPECTRUM_POLICIES (None = DEFAULT_SPECTRUM_POLICY)
+        spectrum: FreeSpectrum of the reference bitmap for the demand
+        context: SpectrumContext for most_used and band_preferring
+
+    Returns:
+        int: Start slot in the reference frame, or -1 if the demand does not fit
+    """
+    if not spectrum:
+        return -1
+    select = _POLICY_FUNCTIONS.get(policy or DEFAULT_SPECTRUM_POLICY)
+    if select is None:
+        LOGGER.warning("[CHAFI-RSA] Unknown spectrum policy '{}', using {}".format(
+            policy, SPECTRUM_POLICY_FIRST_FIT))
+        select = _first_fit
+    return select(spectrum, context or SpectrumContext())
@@ -0,0 +1,230 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+[CHAFI-THESIS-START]
+Topology Records Module for Parallel Optical Controller
+
+Compact records of the optical links and their endpoints, built once per
+snapshot from the Device/OpticalLink protobufs by
+fetch_optical_links_for_rsa(). The graph edges, the OpticalLinksCache and
+RSA share the same records by reference:
+
+    - one EndpointRecord per endpoint_uuid, whatever the number of links
+      referencing it; bitmap_value is parsed to an int once, when the
+      channel data is attached, and patched in place by acquisitions
+    - one LinkRecord per optical link, holding its EndpointRecords
+
+Both use __slots__ (no per-instance dict). from_dict()/to_dict() convert
+from/to the link dict layout fetch_optical_links_for_rsa() used to return,
+for callers that build links by hand (benchmarks) and for display.
+copy_link_records() copies them for a new snapshot version much faster
+than copy.deepcopy().
+
+Classes:
+    - EndpointRecord: Endpoint identity and channel data (rsa_project's Endpoint interface)
+    - LinkRecord: Optical link with its endpoint records
+
+Functions:
+    - parse_bitmap: Integer value of a channel bitmap (decimal string or int)
+    - copy_link_records: Copies of LinkRecords that keep shared endpoints shared
+[CHAFI-THESIS-END]
+"""
+
+from typing import Any, Dict, List, Optional
+
+
+def parse_bitmap(bitmap_value: Any) -> int:
+    """Integer value of a channel bitmap stored as decimal string (0 if missing or malformed)."""
+    if not bitmap_value:
+        return 0
+    try:
+        return int(bitmap_value)
+    except (ValueError, TypeError):
+        return 0
+
+
+class EndpointRecord:
+    """
+    [CHAFI-THESIS] Endpoint of an optical link with its channel data.
+
+    Attributes:
+        endpoint_uuid: Endpoint UUID
+        device_uuid: Device UUID
+        device_name: Device name (e.g., "TP2")
+        device_type: Device type (e.g., "optical-transponder")
+        endpoint_index: Endpoint index (transponders)
+        name: Endpoint name (e.g., "port-11")
+        transport_type: Endpoint transport type
+        band_name: Band of the channel (None without channel data)
+        min_frequency: Minimum frequency in Hz
+        max_frequency: Maximum frequency in Hz
+        flex_slots: Number of slots in bitmap
+        bitmap_value: Integer representing slot availability (bit = 1 free)
+    """
+
+    __slots__ = ('endpoint_uuid', 'device_uuid', 'device_name', 'device_type', 'endpoint_index', 'name',
+                 'transport_type', 'band_name', 'min_frequency', 'max_frequency', 'flex_slots', 'bitmap_value')
+
+    def __init__(self, endpoint_uuid: str, device_uuid: str, device_name: Optional[str] = None,
+                 device_type: Optional[str] = None, endpoint_index: Optional[str] = None,
+                 name: Optional[str] = None, transport_type: Optional[str] = None):
+        self.endpoint_uuid = endpoint_uuid
+        self.device_uuid = device_uuid
+        self.device_name = device_name
+        self.device_type = device_type
+        self.endpoint_index = endpoint_index
+        self.name = name
+        self.transport_type = transport_type
+        self.band_name = None
+        self.min_frequency = None
+        self.max_frequency = None
+        self.flex_slots = None
+        self.bitmap_value = 0
+
+    @property
+    def has_channel(self) -> bool:
+        return self.min_frequency is not None or self.bitmap_value != 0
+
+    def set_channel(self, channel_data: Optional[Dict], band_name: Optional[str] = None) -> None:
+        """Attach channel data (a channel_data dict of RSATools), parsing the bitmap once."""
+        channel_data = channel_data or {}
+        self.min_frequency = channel_data.get('min_frequency')
+        self.max_frequency = channel_data.get('max_frequency')
+        self.flex_slots = channel_data.get('flex_slots')
+        self.bitmap_value = parse_bitmap(channel_data.get('bitmap_value'))
+        self.band_name = band_name
+
+    @classmethod
+    def from_dict(cls, endpoint_dict: Dict) -> 'EndpointRecord':
+        """Record from an endpoint dict with optional 'channel_data' and 'band_name'."""
+        record = cls(
+            endpoint_dict.get('endpoint_uuid'), endpoint_dict.get('device_uuid'),
+            device_name=endpoint_dict.get('device_name'), device_type=endpoint_dict.get('device_type'),
+            endpoint_index=endpoint_dict.get('endpoint_index'), name=endpoint_dict.get('endpoint_name'),
+            transport_type=endpoint_dict.get('transport_type'))
+        if endpoint_dict.get('channel_data') is not None:
+            record.set_channel(endpoint_dict['channel_data'], endpoint_dict.get('band_name'))
+        return record
+
+    def to_dict(self) -> Dict:
+        endpoint_dict = {
+            'endpoint_uuid': self.endpoint_uuid,
+            'device_uuid': self.device_uuid,
+            'device_name': self.device_name,
+            'device_type': self.device_type,
+            'endpoint_index': self.endpoint_index,
+            'endpoint_name': self.name,
+            'transport_type': self.transport_type,
+        }
+        if self.has_channel:
+            endpoint_dict['channel_data'] = {
+                'min_frequency': self.min_frequency, 'max_frequency': self.max_frequency,
+                'flex_slots': self.flex_slots, 'bitmap_value': str(self.bitmap_value)}
+            endpoint_dict['band_name'] = self.band_name
+        return endpoint_dict
+
+    def __repr__(self):
+        return f"EndpointRecord(name={self.name}, device={self.device_name}, flex_slots={self.flex_slots})"
+
+
+class LinkRecord:
+    """
+    [CHAFI-THESIS] Optical link with its endpoint records.
+
+    Attributes:
+        link_uuid: Link UUID
+        name: Link name
+        src_port: optical_details.src_port
+        dst_port: optical_details.dst_port
+        used: optical_details.used
+        endpoints: EndpointRecords in link_endpoint_ids order (source first)
+    """
+
+    __slots__ = ('link_uuid', 'name', 'src_port', 'dst_port', 'used', 'endpoints')
+
+    def __init__(self, link_uuid: str, name: str, src_port: Optional[str], dst_port: Optional[str],
+                 used: bool, endpoints: List[EndpointRecord]):
+        self.link_uuid = link_uuid
+        self.name = name
+        self.src_port = src_port
+        self.dst_port = dst_port
+        self.used = used
+        self.endpoints = endpoints
+
+    @classmethod
+    def from_dict(cls, link_dict: Dict, endpoint_records: Optional[Dict[str, EndpointRecord]] = None) -> 'LinkRecord':
+        """
+        Record from a link dict ('endpoints' as endpoint dicts).
+
+        Args:
+            link_dict: Link dict in the fetch_optical_links_for_rsa() layout
+            endpoint_records: endpoint_uuid -> EndpointRecord already built, shared
+                              by links that reference the same endpoint (updated in place)
+        """
+        if endpoint_records is None:
+            endpoint_records = {}
+        endpoints = []
+        for endpoint_dict in link_dict.get('endpoints', []):
+            record = endpoint_records.get(endpoint_dict.get('endpoint_uuid'))
+            if record is None:
+                record = EndpointRecord.from_dict(endpoint_dict)
+                if record.endpoint_uuid:
+                    endpoint_records[record.endpoint_uuid] = record
+            endpoints.append(record)
+        return cls(link_dict.get('link_uuid'), link_dict.get('name'), link_dict.get('src_port'),
+                   link_dict.get('dst_port'), link_dict.get('used', False), endpoints)
+
+    def to_dict(self) -> Dict:
+        return {
+            'link_uuid': self.link_uuid,
+            'name': self.name,
+            'src_port': self.src_port,
+            'dst_port': self.dst_port,
+            'used': self.used,
+            'endpoints': [endpoint.to_dict() for endpoint in self.endpoints],
+        }
+
+    def __repr__(self):
+        return f"LinkRecord(link_uuid={self.link_uuid}, name={self.name}, used={self.used})"
+
+
+def _copy_slots(record):
+    duplicate = record.__class__.__new__(record.__class__)
+    for slot in record.__slots__:
+        setattr(duplicate, slot, getattr(record, slot))
+    return duplicate
+
+
+def copy_link_records(optical_links: List[LinkRecord], memo: Dict[int, Any]) -> List[LinkRecord]:
+    """
+    Copies of optical_links; an EndpointRecord shared by several links is copied once.
+
+    Args:
+        optical_links: LinkRecords to copy
+        memo: Filled with id(original) -> copy for every link and endpoint record
+    """
+    copies = []
+    for link in optical_links:
+        link_copy = _copy_slots(link)
+        endpoints = []
+        for endpoint in link.endpoints:
+            endpoint_copy = memo.get(id(endpoint))
+            if endpoint_copy is None:
+                endpoint_copy = memo[id(endpoint)] = _copy_slots(endpoint)
+            endpoints.append(endpoint_copy)
+        link_copy.endpoints = endpoints
+        memo[id(link)] = link_copy
+        copies.append(link_copy)
+    return copies
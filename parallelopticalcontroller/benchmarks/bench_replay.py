@@ -0,0 +1,268 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+[CHAFI-THESIS-START]
+Benchmark: replay of controller request streams without TeraFlowSDN
+
+    record     capture a live Context into a snapshot file (Replay.record_context)
+    generate   synthetic stream from a snapshot: per flow AddLightpath,
+               PerformRSA and AcquireSlots between random transponder pairs
+    run        replay a stream against the Flask app, Context served by
+               Replay.FakeContextClient from the snapshot file
+
+Streams are JSONL files written by the controller with POC_REQUEST_LOG set,
+or by generate. Requests of one flow are replayed in order by one worker,
+with the recorded flow_id mapped to the one AddLightpath returns; flows run
+on --threads workers. Requests not tied to a flow (GetTopology,
+RefreshTopology, BatchProvision, ...) are replayed first, in order.
+
+run reports throughput, client-side latency per endpoint and the server-side
+phase latencies from poc_phase_duration_seconds (p50/p99 interpolated from the
+histogram buckets, like histogram_quantile()), plus the Context RPCs served.
+
+Usage:
+    python parallelopticalcontroller/benchmarks/bench_replay.py record --output snapshot.json
+    python parallelopticalcontroller/benchmarks/bench_replay.py generate --snapshot snapshot.json --flows 200 --output stream.jsonl
+    python parallelopticalcontroller/benchmarks/bench_replay.py run --snapshot snapshot.json --stream stream.jsonl [--threads T] [--latency SPEC]
+[CHAFI-THESIS-END]
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# common/ lives next to this package in the repository (TFS's src/common when deployed)
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, os.path.dirname(os.path.dirname(BENCHMARKS_DIR)))
+
+from common.RSATools import TRANSPONDER_DEVICE_TYPES  # noqa: E402
+from parallelopticalcontroller.Replay import (  # noqa: E402
+    RECORDED_PATH_PREFIX, install_replay_context, load_request_stream, record_context
+)
+
+# Endpoints whose first path parameter is a flow_id
+FLOW_ENDPOINTS = ('GetLightpath', 'PerformRSA', 'PerformAdditionalPathRSA', 'EvaluatePaths',
+                  'GetRSATrace', 'DeleteLightpath', 'AcquireSlots')
+_FLOW_PATH = re.compile(r'^({}(?:{})/)(\d+)(.*)$'.format(
+    re.escape(RECORDED_PATH_PREFIX), '|'.join(FLOW_ENDPOINTS)))
+
+
+def endpoint_of(path):
+    return path.split('?')[0][len(RECORDED_PATH_PREFIX):].split('/')[0]
+
+
+def recorded_flow_id(entry):
+    """Recorded flow of a request (AddLightpath: from its response), or None."""
+    if endpoint_of(entry['path']) == 'AddLightpath':
+        return entry.get('flow_id')
+    match = _FLOW_PATH.match(entry['path'])
+    return int(match.group(2)) if match else None
+
+
+def percentile(values, share):
+    """Nearest-rank percentile of a sorted list."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(share * len(values))) - 1))]
+
+
+def histogram_quantile(buckets, share):
+    """Quantile from cumulative (upper_bound, count) buckets, linear within a bucket."""
+    total = buckets[-1][1] if buckets else 0
+    if not total:
+        return 0.0
+    rank = share * total
+    lower_bound, lower_count = 0.0, 0.0
+    for upper_bound, count in buckets:
+        if count >= rank:
+            if upper_bound == float('inf'):
+                return lower_bound
+            if count == lower_count:
+                return upper_bound
+            return lower_bound + (upper_bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+        lower_bound, lower_count = upper_bound, count
+    return lower_bound
+
+
+def phase_latencies():
+    """phase -> (count, p50_ms, p99_ms, mean_ms) from poc_phase_duration_seconds."""
+    from parallelopticalcontroller.Metrics import PHASE_DURATION
+
+    buckets, counts, sums = {}, {}, {}
+    for metric in PHASE_DURATION.collect():
+        for sample in metric.samples:
+            phase = sample.labels.get('phase')
+            if sample.name.endswith('_bucket'):
+                buckets.setdefault(phase, []).append((float(sample.labels['le']), sample.value))
+            elif sample.name.endswith('_count'):
+                counts[phase] = sample.value
+            elif sample.name.endswith('_sum'):
+                sums[phase] = sample.value
+    latencies = {}
+    for phase, phase_buckets in buckets.items():
+        if not counts.get(phase):
+            continue
+        phase_buckets.sort()
+        latencies[phase] = (int(counts[phase]), histogram_quantile(phase_buckets, 0.5) * 1e3,
+                            histogram_quantile(phase_buckets, 0.99) * 1e3, sums[phase] / counts[phase] * 1e3)
+    return latencies
+
+
+def command_record(args):
+    from context.client.ContextClient import ContextClient
+
+    ctx_client = ContextClient()
+    try:
+        counts = record_context(ctx_client, args.output)
+    finally:
+        ctx_client.close()
+    print("recorded {} into {}".format(
+        ", ".join("{} {}".format(count, key) for key, count in counts.items()), args.output))
+
+
+def command_generate(args):
+    with open(args.snapshot) as snapshot_file:
+        snapshot = json.load(snapshot_file)
+    transponders = sorted(
+        device.get('name') or device['device_id']['device_uuid']['uuid']
+        for device in snapshot.get('devices', []) if device.get('device_type') in TRANSPONDER_DEVICE_TYPES)
+    if len(transponders) < 2:
+        sys.exit("snapshot has fewer than 2 transponders")
+
+    rng = random.Random(args.seed)
+    with open(args.output, 'w') as stream_file:
+        def write(method, path, body=None, flow_id=None):
+            entry = {'method': method, 'path': RECORDED_PATH_PREFIX + path, 'json': body, 'status': 200}
+            if flow_id is not None:
+                entry['flow_id'] = flow_id
+            stream_file.write(json.dumps(entry) + '\n')
+
+        write('GET', 'GetTopology/admin/admin')
+        for flow_id in range(1, args.flows + 1):
+            src, dst = rng.sample(transponders, 2)
+            body = {'src': src, 'dst': dst, 'src_index': '', 'dst_index': '',
+                    'bitrate': args.bitrate, 'bidir': 0, 'constraint_type': 'flexi_grid'}
+            write('POST', 'AddLightpath', body, flow_id)
+            write('GET', 'PerformRSA/{}?trace_level=none&view=compact'.format(flow_id))
+            write('GET', 'AcquireSlots/{}'.format(flow_id))
+    print("generated {} flows between {} transponders into {}".format(args.flows, len(transponders), args.output))
+
+
+def command_run(args):
+    store = install_replay_context(args.snapshot, args.latency)
+    # Imported after the pool is pointed at the snapshot; the app configures DEBUG logging
+    from parallelopticalcontroller.ParallelOpticalController import app
+    logging.disable(logging.WARNING)
+
+    setup, flows = [], {}
+    for entry in load_request_stream(args.stream):
+        flow_id = recorded_flow_id(entry)
+        if flow_id is None:
+            setup.append(entry)
+        else:
+            flows.setdefault(flow_id, []).append(entry)
+
+    samples = []  # (endpoint, seconds, status)
+
+    def send(client, entry, path):
+        t_start = time.perf_counter()
+        response = client.open(path, method=entry['method'], json=entry.get('json'))
+        samples.append((endpoint_of(path), time.perf_counter() - t_start, response.status_code))
+        return response
+
+    def replay_flow(entries):
+        client = app.test_client()
+        flow_id = None
+        for entry in entries:
+            path = entry['path']
+            match = _FLOW_PATH.match(path)
+            if match:
+                if flow_id is None:
+                    continue  # AddLightpath of this flow failed or was not recorded
+                path = '{}{}{}'.format(match.group(1), flow_id, match.group(3))
+            response = send(client, entry, path)
+            if endpoint_of(path) == 'AddLightpath' and response.status_code == 200:
+                flow_id = response.get_json().get('flow_id')
+
+    t_start = time.perf_counter()
+    setup_client = app.test_client()
+    for entry in setup:
+        send(setup_client, entry, entry['path'])
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        for future in [executor.submit(replay_flow, entries) for entries in flows.values()]:
+            future.result()
+    wall = time.perf_counter() - t_start
+
+    print("stream: {} requests, {} flows, {} threads, latency spec '{}'".format(
+        len(samples), len(flows), args.threads, args.latency or os.environ.get('REPLAY_RPC_LATENCY_MS', '0')))
+    print("wall: {:.3f} s, {:.1f} requests/s, {:.1f} flows/s".format(
+        wall, len(samples) / wall if wall else 0.0, len(flows) / wall if wall else 0.0))
+
+    print("\n{:>26} {:>7} {:>7} {:>10} {:>10} {:>10}".format('endpoint', 'count', 'errors', 'p50 ms', 'p99 ms', 'max ms'))
+    by_endpoint = {}
+    for endpoint, seconds, status in samples:
+        by_endpoint.setdefault(endpoint, []).append((seconds, status))
+    for endpoint, endpoint_samples in sorted(by_endpoint.items()):
+        durations = sorted(seconds * 1e3 for seconds, _ in endpoint_samples)
+        errors = sum(1 for _, status in endpoint_samples if status >= 300)
+        print("{:>26} {:>7} {:>7} {:>10.3f} {:>10.3f} {:>10.3f}".format(
+            endpoint, len(durations), errors, percentile(durations, 0.5), percentile(durations, 0.99), durations[-1]))
+
+    print("\n{:>26} {:>7} {:>10} {:>10} {:>10}".format('phase', 'count', 'p50 ms', 'p99 ms', 'mean ms'))
+    for phase, (count, p50, p99, mean) in sorted(phase_latencies().items()):
+        print("{:>26} {:>7} {:>10.3f} {:>10.3f} {:>10.3f}".format(phase, count, p50, p99, mean))
+
+    print("\ncontext rpcs: " + ", ".join(
+        "{} {}".format(rpc, count) for rpc, count in sorted(store.rpc_counts.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[2])
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    record = commands.add_parser('record', help='Capture a live Context into a snapshot file')
+    record.add_argument('--output', required=True, help='Snapshot file to write')
+    record.set_defaults(handler=command_record)
+
+    generate = commands.add_parser('generate', help='Synthetic request stream from a snapshot')
+    generate.add_argument('--snapshot', required=True, help='Snapshot file')
+    generate.add_argument('--output', required=True, help='Stream file to write (JSONL)')
+    generate.add_argument('--flows', type=int, default=100, help='Lightpaths in the stream')
+    generate.add_argument('--bitrate', type=float, default=100, help='Bitrate per lightpath (Gbps)')
+    generate.add_argument('--seed', type=int, default=7, help='Transponder pair generator seed')
+    generate.set_defaults(handler=command_generate)
+
+    run = commands.add_parser('run', help='Replay a stream against the controller')
+    run.add_argument('--snapshot', required=True, help='Snapshot file served as Context')
+    run.add_argument('--stream', required=True, help='Request stream (JSONL)')
+    run.add_argument('--threads', type=int, default=4, help='Flows replayed concurrently')
+    run.add_argument('--latency', default=None,
+                     help='Per-RPC latency spec, e.g. "*=0.5,UpdateOpticalConfig=5" (default REPLAY_RPC_LATENCY_MS)')
+    run.set_defaults(handler=command_run)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+[CHAFI-THESIS-START]
+Benchmark: RSA at production grid width
+
+Runs the controller's RSA code on synthetic paths under the ITU grid profile
+(ITU_GRID_PROFILE=itu unless set otherwise), so the reference bitmaps are
+701 (C), 1198 (CL) and 7916 (whole band) slots wide:
+
+    pre_cold   new OpticalLinksCache + rsa_bitmap_pre_compute() (snapshot rebuild)
+    pre_warm   rsa_bitmap_pre_compute() with aligned bitmaps cached
+    rsa        perform_rsa() (first_fit), trace level none
+    rsa_exact  perform_rsa() (exact_fit), trace level none
+    masks      AcquireSlots mask math: allocation_endpoint_masks() and the
+               native bitmap updates of every path endpoint
+
+Each path is a transponder - ROADM chain; transponder endpoints cover the
+C band only, so CL and whole-band paths also exercise the frame offsets.
+Occupancy is fragmented (allocations of 4..16 slots): a share common to the
+whole path plus ENDPOINT_OCCUPANCY drawn per endpoint.
+
+--max-rsa-ms fails the run (exit status 1) if perform_rsa() on the
+whole band is slower than the given budget, for use as a regression gate.
+
+Usage:
+    python parallelopticalcontroller/benchmarks/bench_rsa_real_grid.py [--repeat N] [--hops H] [--max-rsa-ms MS]
+[CHAFI-THESIS-END]
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import timeit
+
+# The grid profile is read once when ITUStandards is imported
+os.environ.setdefault('ITU_GRID_PROFILE', 'itu')
+
+# common/ lives next to this package in the repository (TFS's src/common when deployed)
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, os.path.dirname(os.path.dirname(BENCHMARKS_DIR)))
+
+from common.ITUStandards import BAND_SLOT_RANGES, BAND_SLOTS, GRID_PROFILE, FreqeuncyRanges  # noqa: E402
+from parallelopticalcontroller.RSAHelper import (  # noqa: E402
+    TRACE_LEVEL_NONE, OpticalLinksCache, TopologyHelper
+)
+from parallelopticalcontroller.SlotAcquisition import allocation_endpoint_masks  # noqa: E402
+from parallelopticalcontroller.SpectrumPolicy import (  # noqa: E402
+    SPECTRUM_POLICY_EXACT_FIT, SPECTRUM_POLICY_FIRST_FIT
+)
+from occupancy import make_bitmap  # noqa: E402
+
+BANDS = ('C_BAND', 'CL_BAND', 'WHOLE_BAND')
+OCCUPANCIES = (0.3, 0.7)
+ENDPOINT_OCCUPANCY = 0.02
+BANDWIDTH_GBPS = 100.0
+
+
+def make_endpoint(rng, device, device_type, name, band_name, path_bitmap):
+    """Endpoint covering band_name; path_bitmap is the common occupancy in the WHOLE_BAND frame."""
+    min_hz, max_hz = FreqeuncyRanges[band_name].value
+    slots = BAND_SLOTS[band_name]
+    bitmap = (path_bitmap >> BAND_SLOT_RANGES[band_name][0]) & make_bitmap(rng, slots, ENDPOINT_OCCUPANCY)
+    return {
+        'endpoint_uuid': '{}-{}'.format(device, name), 'device_uuid': device, 'device_name': device,
+        'device_type': device_type, 'endpoint_index': name, 'endpoint_name': name,
+        'transport_type': 'MWDM',
+        'channel_data': {
+            'min_frequency': min_hz, 'max_frequency': max_hz, 'flex_slots': slots,
+            'bitmap_value': str(bitmap),
+        },
+    }
+
+
+def make_path(rng, band_name, hops, occupancy):
+    """Links of a TP - ROADM x (hops - 1) - TP chain and its path object."""
+    roadm_type = 'optical-roadm'
+    transponder_type = 'optical-transponder'
+    path_bitmap = make_bitmap(rng, BAND_SLOTS['WHOLE_BAND'], occupancy)
+    devices = ['tp-src'] + ['roadm-{}'.format(i) for i in range(1, hops)] + ['tp-dst']
+    links = []
+    for i in range(hops):
+        src, dst = devices[i], devices[i + 1]
+        src_type = transponder_type if i == 0 else roadm_type
+        dst_type = transponder_type if i == hops - 1 else roadm_type
+        src_band = 'C_BAND' if src_type == transponder_type else band_name
+        dst_band = 'C_BAND' if dst_type == transponder_type else band_name
+        src_ep = make_endpoint(rng, src, src_type, 'port-out-{}'.format(i), src_band, path_bitmap)
+        dst_ep = make_endpoint(rng, dst, dst_type, 'port-in-{}'.format(i), dst_band, path_bitmap)
+        links.append({
+            'link_uuid': 'link-{}'.format(i), 'name': '{}->{}'.format(src, dst),
+            'src_port': src_ep['endpoint_name'], 'dst_port': dst_ep['endpoint_name'],
+            'used': False, 'endpoints': [src_ep, dst_ep],
+        })
+    return links, {'links': [{'id': link['link_uuid']} for link in links]}
+
+
+def apply_masks(rsa_result, cache):
+    """AcquireSlots mask math without the Context round trip (bitmaps are not modified)."""
+    endpoint_masks = allocation_endpoint_masks(rsa_result)
+    bitmaps = {}
+    for endpoint_uuid, native_mask in endpoint_masks.items():
+        bitmaps[endpoint_uuid] = cache.get_endpoint(endpoint_uuid).bitmap_value & ~native_mask
+    return bitmaps
+
+
+def measure(function, repeat):
+    return timeit.timeit(function, number=repeat) / repeat * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[2])
+    parser.add_argument('--repeat', type=int, default=50, help='Calls per measurement')
+    parser.add_argument('--hops', type=int, default=6, help='Links per path')
+    parser.add_argument('--seed', type=int, default=7, help='Bitmap generator seed')
+    parser.add_argument('--max-rsa-ms', type=float, default=None,
+                        help='Fail if perform_rsa() on the whole band exceeds this (ms)')
+    args = parser.parse_args()
+    # The package configures DEBUG logging; blocked demands are expected here
+    logging.disable(logging.WARNING)
+
+    rng = random.Random(args.seed)
+    print("grid profile: {}, hops: {}, bandwidth: {} Gbps".format(GRID_PROFILE, args.hops, BANDWIDTH_GBPS))
+    columns = ('pre_cold', 'pre_warm', 'rsa', 'rsa_exact', 'masks')
+    print("{:>10} {:>6} {:>5} {:>5} ".format('band', 'width', 'occ', 'found') +
+          " ".join("{:>11}".format(name + ' ms') for name in columns))
+
+    slowest_whole_band_rsa = 0.0
+    for band_name in BANDS:
+        for occupancy in OCCUPANCIES:
+            links, path_obj = make_path(rng, band_name, args.hops, occupancy)
+            cache = OpticalLinksCache(links)
+
+            def pre_cold():
+                TopologyHelper.rsa_bitmap_pre_compute(
+                    path_obj, OpticalLinksCache(links), trace_level=TRACE_LEVEL_NONE)
+
+            def pre_warm():
+                TopologyHelper.rsa_bitmap_pre_compute(path_obj, cache, trace_level=TRACE_LEVEL_NONE)
+
+            def rsa(policy):
+                return TopologyHelper.perform_rsa(
+                    path_obj, BANDWIDTH_GBPS, cache, trace_level=TRACE_LEVEL_NONE, spectrum_policy=policy)
+
+            rsa_result = rsa(SPECTRUM_POLICY_FIRST_FIT)
+            width = rsa_result['reference_slots'] if rsa_result else 0
+            found = bool(rsa_result and rsa_result.get('success'))
+            timings = [
+                measure(pre_cold, args.repeat),
+                measure(pre_warm, args.repeat),
+                measure(lambda: rsa(SPECTRUM_POLICY_FIRST_FIT), args.repeat),
+                measure(lambda: rsa(SPECTRUM_POLICY_EXACT_FIT), args.repeat),
+                measure(lambda: apply_masks(rsa_result, cache), args.repeat) if found else 0.0,
+            ]
+            if band_name == 'WHOLE_BAND':
+                slowest_whole_band_rsa = max(slowest_whole_band_rsa, timings[2], timings[3])
+            print("{:>10} {:>6} {:>5} {:>5} ".format(band_name, width, occupancy, 'yes' if found else 'no') +
+                  " ".join("{:>11.3f}".format(t) for t in timings))
+
+    if args.max_rsa_ms is not None and slowest_whole_band_rsa > args.max_rsa_ms:
+        print("FAIL: perform_rsa() on the whole band took {:.3f} ms (budget {:.3f} ms)".format(
+            slowest_whole_band_rsa, args.max_rsa_ms))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
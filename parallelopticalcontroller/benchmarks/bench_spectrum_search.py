@@ -0,0 +1,121 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+[CHAFI-THESIS-START]
+Microbenchmark: contiguous free-slot search on RSA reference bitmaps
+
+Compares, per bitmap width and occupancy, the slot-by-slot scan that
+perform_rsa() used to run with the common.SpectrumTools finders:
+
+    scan_first    per-slot loop, stops at the first fit (old RSAHelper)
+    scan_all      per-slot loop collecting every start (old rsa_v2)
+    shift_and     feasible_starts() + lowest set bit
+    shift_and_all feasible_starts() + every start position
+    blocks        free_blocks() (all blocks with sizes)
+
+Widths include the real G.694.1 tables (C = 701, CL = 1198, whole = 7916
+slots), independent of the grid configured in ITUStandards. Every finder is
+checked against the scan before it is timed.
+
+Usage:
+    python parallelopticalcontroller/benchmarks/bench_spectrum_search.py [--repeat N] [--seed S]
+[CHAFI-THESIS-END]
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+# common/ lives next to this package in the repository (TFS's src/common when deployed)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.SpectrumTools import feasible_starts, free_blocks, lowest_set_bit, set_bit_positions  # noqa: E402
+from occupancy import make_bitmap  # noqa: E402
+
+WIDTHS = (20, 701, 1198, 7916)
+OCCUPANCIES = (0.3, 0.7)
+NUM_SLOTS = (5, 12, 64)
+
+
+def scan_first(bitmap, width, num_slots):
+    current_run = 0
+    for i in range(width):
+        if (bitmap >> i) & 1:
+            current_run += 1
+            if current_run == num_slots:
+                return i - num_slots + 1
+        else:
+            current_run = 0
+    return -1
+
+
+def scan_all(bitmap, width, num_slots):
+    starts = []
+    current_run = 0
+    for i in range(width):
+        if (bitmap >> i) & 1:
+            current_run += 1
+            if current_run >= num_slots:
+                starts.append(i - num_slots + 1)
+        else:
+            current_run = 0
+    return starts
+
+
+def check(bitmap, width, num_slots):
+    expected = scan_all(bitmap, width, num_slots)
+    starts = feasible_starts(bitmap, width, num_slots)
+    assert set_bit_positions(starts) == expected, "feasible_starts mismatch"
+    assert lowest_set_bit(starts) == scan_first(bitmap, width, num_slots), "first start mismatch"
+    fitting = [start for start, length in free_blocks(bitmap, width) if length >= num_slots]
+    expected_set = set(expected)
+    assert fitting == [s for s in expected if s - 1 not in expected_set], "free_blocks mismatch"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[2])
+    parser.add_argument('--repeat', type=int, default=200, help='Calls per measurement')
+    parser.add_argument('--seed', type=int, default=7, help='Bitmap generator seed')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    finders = (
+        ('scan_first', lambda b, w, n: scan_first(b, w, n)),
+        ('scan_all', lambda b, w, n: scan_all(b, w, n)),
+        ('shift_and', lambda b, w, n: lowest_set_bit(feasible_starts(b, w, n))),
+        ('shift_and_all', lambda b, w, n: set_bit_positions(feasible_starts(b, w, n))),
+        ('blocks', lambda b, w, n: free_blocks(b, w)),
+    )
+    print("{:>6} {:>5} {:>5} ".format('width', 'occ', 'slots') +
+          " ".join("{:>14}".format(name + ' us') for name, _ in finders))
+    for width in WIDTHS:
+        for occupancy in OCCUPANCIES:
+            bitmap = make_bitmap(rng, width, occupancy)
+            for num_slots in NUM_SLOTS:
+                if num_slots > width:
+                    continue
+                check(bitmap, width, num_slots)
+                timings = []
+                for _, finder in finders:
+                    seconds = timeit.timeit(lambda: finder(bitmap, width, num_slots), number=args.repeat)
+                    timings.append(seconds / args.repeat * 1e6)
+                print("{:>6} {:>5} {:>5} ".format(width, occupancy, num_slots) +
+                      " ".join("{:>14.2f}".format(t) for t in timings))
+
+
+if __name__ == '__main__':
+    main()
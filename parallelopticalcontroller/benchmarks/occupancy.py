@@ -0,0 +1,36 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+[CHAFI-THESIS-START]
+Synthetic spectrum occupancy shared by the benchmarks
+
+Functions:
+    - make_bitmap: Fragmented occupancy bitmap of a given width
+[CHAFI-THESIS-END]
+"""
+
+
+def make_bitmap(rng, width, occupancy):
+    """Fragmented occupancy: allocations of 4..16 slots until the target share is used."""
+    bitmap = (1 << width) - 1
+    used_target = int(width * occupancy)
+    used = 0
+    while used < used_target:
+        size = rng.randint(4, 16)
+        start = rng.randrange(0, max(width - size, 1))
+        mask = ((1 << size) - 1) << start
+        used += bin(bitmap & mask).count('1')
+        bitmap &= ~mask
+    return bitmap & ((1 << width) - 1)
@@ -18,10 +18,26 @@ ITU-T Standards for Optical Networks.
 This module contains ITU-T G.694.1 standards for optical spectrum allocation,
 including frequency bands, wavelength ranges, slot granularity, and slot counts.
 
+[CHAFI-THESIS] Band edges come from the grid profile selected by
+ITU_GRID_PROFILE (test | itu). Slot counts, band masks and the
+frequency -> slot index mapping are derived from them once at import.
+
 [CHAFI-THESIS-START]
 """
 
+import os
 from enum import Enum
+from typing import Dict, Tuple
+
+# [CHAFI-THESIS] Grid profile, read once at import (ITU_GRID_PROFILE):
+#   test - simplified grid of 20 slots per band (default, matches the test topologies)
+#   itu  - real ITU-T G.694.1 band edges, for runs and benchmarks at production width
+GRID_PROFILE_TEST = 'test'
+GRID_PROFILE_ITU = 'itu'
+GRID_PROFILES = (GRID_PROFILE_TEST, GRID_PROFILE_ITU)
+GRID_PROFILE = os.environ.get('ITU_GRID_PROFILE', GRID_PROFILE_TEST)
+if GRID_PROFILE not in GRID_PROFILES:
+    GRID_PROFILE = GRID_PROFILE_TEST
 
 
 class ITUStandards(Enum):
@@ -55,75 +71,71 @@ class Lambdas(Enum):
     """
     Wavelength ranges for each optical band in nanometers (nm).
 
-    [CHAFI-THESIS] SIMPLIFIED FOR TESTING - Dummy contiguous ranges.
-    Real values commented out for reference.
+    [CHAFI-THESIS] Values depend on GRID_PROFILE: dummy contiguous ranges
+    for the test grid, ITU-T values for the itu grid.
     """
-    # Single bands (dummy contiguous values for testing)
-    # Real: O_BAND = (1260, 1360), E_BAND = (1360, 1460), etc.
-    O_BAND = (1550, 1552)      # Dummy: highest freq band
-    E_BAND = (1552, 1554)
-    S_BAND = (1554, 1556)
-    C_BAND = (1556, 1558)
-    L_BAND = (1558, 1560)      # Dummy: lowest freq band
-    # Multi-band combinations
-    CL_BAND = (1556, 1560)     # C + L
-    SCL_BAND = (1554, 1560)    # S + C + L
-    WHOLE_BAND = (1550, 1560)  # All bands
+    if GRID_PROFILE == GRID_PROFILE_ITU:
+        O_BAND = (1260, 1360)
+        E_BAND = (1360, 1460)
+        S_BAND = (1460, 1530)
+        C_BAND = (1530, 1565)
+        L_BAND = (1565, 1625)
+        CL_BAND = (1530, 1625)
+        SCL_BAND = (1460, 1625)
+        WHOLE_BAND = (1260, 1625)
+    else:
+        O_BAND = (1550, 1552)      # Dummy: highest freq band
+        E_BAND = (1552, 1554)
+        S_BAND = (1554, 1556)
+        C_BAND = (1556, 1558)
+        L_BAND = (1558, 1560)      # Dummy: lowest freq band
+        CL_BAND = (1556, 1560)     # C + L
+        SCL_BAND = (1554, 1560)    # S + C + L
+        WHOLE_BAND = (1550, 1560)  # All bands
 
 
 class FreqeuncyRanges(Enum):
     """
     Frequency ranges for each optical band in Hz.
 
-    [CHAFI-THESIS] SIMPLIFIED FOR TESTING - 20 slots per band (125 GHz each).
-    Each band = 20 slots × 6.25 GHz = 125 GHz = 125,000,000,000 Hz
-    Contiguous bands starting at 193.0 THz for easy debugging.
-
-    Real ITU-T G.694.1 values commented out for reference.
+    [CHAFI-THESIS] Values depend on GRID_PROFILE:
+        test - 20 slots per band (125 GHz each), contiguous bands starting
+               at 193.0 THz for easy debugging
+        itu  - ITU-T G.694.1 ranges quantized to 6.25 GHz slot boundaries
+               (C = 701 slots, whole band = 7916 slots)
     """
-    # Single bands (min_hz, max_hz) - 20 slots each = 125 GHz
-    # Real: O_BAND = (220425000000000, 237925000000000)  # 2800 slots
-    # Real: E_BAND = (205325000000000, 220425000000000)  # 2416 slots
-    # Real: S_BAND = (195937500000000, 205325000000000)  # 1501 slots
-    # Real: C_BAND = (191556250000000, 195937500000000)  # 701 slots
-    # Real: L_BAND = (188450000000000, 191556250000000)  # 498 slots
-    # 193.000 - 193.125 THz (20 slots)
-    L_BAND = (193000000000000, 193125000000000)
-    # 193.125 - 193.250 THz (20 slots)
-    C_BAND = (193125000000000, 193250000000000)
-    # 193.250 - 193.375 THz (20 slots)
-    S_BAND = (193250000000000, 193375000000000)
-    # 193.375 - 193.500 THz (20 slots)
-    E_BAND = (193375000000000, 193500000000000)
-    # 193.500 - 193.625 THz (20 slots)
-    O_BAND = (193500000000000, 193625000000000)
-    # Multi-band combinations
-    CL_BAND = (193000000000000, 193250000000000)   # L + C = 40 slots
-    SCL_BAND = (193000000000000, 193375000000000)  # S + C + L = 60 slots
-    WHOLE_BAND = (193000000000000, 193625000000000)  # All = 100 slots
-
-
-class Slots(Enum):
-    """
-    Number of 6.25 GHz slots per optical band.
-
-    [CHAFI-THESIS] SIMPLIFIED FOR TESTING - 20 slots per single band.
-    Calculated as: (max_freq - min_freq) / SLOT_GRANULARITY
-
-    Real values commented out for reference.
-    """
-    # Single bands - 20 slots each for testing
-    # Real: O_BAND = 2800, E_BAND = 2416, S_BAND = 1501, C_BAND = 701, L_BAND = 498
-    O_BAND = 20
-    E_BAND = 20
-    S_BAND = 20
-    C_BAND = 20
-    L_BAND = 20
-    # Multi-band combinations
-    # Real: CL_BAND = 1199, SCL_BAND = 2701, WHOLE_BAND = 7917
-    CL_BAND = 40      # L + C
-    SCL_BAND = 60     # S + C + L
-    WHOLE_BAND = 100  # All 5 bands
+    if GRID_PROFILE == GRID_PROFILE_ITU:
+        # Single bands (min_hz, max_hz)
+        O_BAND = (220425000000000, 237925000000000)  # 2800 slots
+        E_BAND = (205325000000000, 220425000000000)  # 2416 slots
+        S_BAND = (195937500000000, 205325000000000)  # 1502 slots
+        C_BAND = (191556250000000, 195937500000000)  # 701 slots
+        L_BAND = (188450000000000, 191556250000000)  # 497 slots
+        # Multi-band combinations
+        CL_BAND = (188450000000000, 195937500000000)
+        SCL_BAND = (188450000000000, 205325000000000)
+        WHOLE_BAND = (188450000000000, 237925000000000)
+    else:
+        # Single bands (min_hz, max_hz) - 20 slots each = 125 GHz
+        L_BAND = (193000000000000, 193125000000000)  # 193.000 - 193.125 THz
+        C_BAND = (193125000000000, 193250000000000)  # 193.125 - 193.250 THz
+        S_BAND = (193250000000000, 193375000000000)  # 193.250 - 193.375 THz
+        E_BAND = (193375000000000, 193500000000000)  # 193.375 - 193.500 THz
+        O_BAND = (193500000000000, 193625000000000)  # 193.500 - 193.625 THz
+        # Multi-band combinations
+        CL_BAND = (193000000000000, 193250000000000)   # L + C = 40 slots
+        SCL_BAND = (193000000000000, 193375000000000)  # S + C + L = 60 slots
+        WHOLE_BAND = (193000000000000, 193625000000000)  # All = 100 slots
+
+
+def _band_slots(band: FreqeuncyRanges) -> int:
+    min_hz, max_hz = band.value
+    return (max_hz - min_hz) // ITUStandards.SLOT_GRANULARITY.value
+
+
+# [CHAFI-THESIS] Number of 6.25 GHz slots per optical band, derived from FreqeuncyRanges
+# as (max_freq - min_freq) / SLOT_GRANULARITY so it always matches the active profile.
+Slots = Enum('Slots', [(band.name, _band_slots(band)) for band in FreqeuncyRanges], module=__name__)
 
 
 class SlotStatus(Enum):
@@ -188,6 +200,53 @@ class SupportedModulationFormat(Enum):
         import math
         m = cls.get_symbols(modulation_name)
         return math.log2(m)
+
+
+# =============================================================================
+# [CHAFI-THESIS] DERIVED GRID TABLES (computed once for the active profile)
+# =============================================================================
+# Slot positions below are in the WHOLE_BAND frame: slot 0 starts at
+# FreqeuncyRanges.WHOLE_BAND min frequency, LSB = lowest frequency.
+# =============================================================================
+
+GRID_MIN_FREQUENCY_HZ = FreqeuncyRanges.WHOLE_BAND.value[0]
+
+# band name -> number of slots
+BAND_SLOTS = {band.name: _band_slots(band) for band in FreqeuncyRanges}  # type: Dict[str, int]
+
+# band name -> all-free bitmap of the band in its own frame ((1 << slots) - 1)
+BAND_FULL_MASKS = {name: (1 << slots) - 1 for name, slots in BAND_SLOTS.items()}  # type: Dict[str, int]
+
+# band name -> (first_slot, end_slot) in the WHOLE_BAND frame (end exclusive)
+BAND_SLOT_RANGES = {
+    band.name: ((band.value[0] - GRID_MIN_FREQUENCY_HZ) // ITUStandards.SLOT_GRANULARITY.value,
+                (band.value[1] - GRID_MIN_FREQUENCY_HZ) // ITUStandards.SLOT_GRANULARITY.value)
+    for band in FreqeuncyRanges
+}  # type: Dict[str, Tuple[int, int]]
+
+# band name -> mask of the band's slots in the WHOLE_BAND frame
+BAND_MASKS = {
+    name: ((1 << (end - first)) - 1) << first for name, (first, end) in BAND_SLOT_RANGES.items()
+}  # type: Dict[str, int]
+
+
+def frequency_to_slot(frequency_hz: int, band_name: str = 'WHOLE_BAND') -> int:
+    """
+    Index of the slot containing frequency_hz in a band's frame (-1 if outside the band).
+
+    Args:
+        frequency_hz: Frequency in Hz
+        band_name: FreqeuncyRanges member name of the frame
+    """
+    min_hz, max_hz = FreqeuncyRanges[band_name].value
+    if not min_hz <= frequency_hz < max_hz:
+        return -1
+    return (frequency_hz - min_hz) // ITUStandards.SLOT_GRANULARITY.value
+
+
+def slot_to_frequency(slot: int, band_name: str = 'WHOLE_BAND') -> int:
+    """Lower edge frequency in Hz of a slot of a band's frame."""
+    return FreqeuncyRanges[band_name].value[0] + slot * ITUStandards.SLOT_GRANULARITY.value
 # [CHAFI-THESIS-END]
 
 
@@ -24,6 +24,7 @@ This module provides helper functions for RSA operations including:
 """
 
 import logging
+from common.DeviceTypes import DeviceTypeEnum
 from common.ITUStandards import FreqeuncyRanges, Bands, Slots
 
 LOGGER = logging.getLogger(__name__)
@@ -339,6 +340,155 @@ def _determine_slot_availability(frequency_hz, channel_min_hz, channel_max_hz,
         return SlotStatus.IN_USE.value
 
 
+TRANSPONDER_DEVICE_TYPES = {
+    DeviceTypeEnum.OPTICAL_TRANSPONDER.value,
+    DeviceTypeEnum.EMULATED_OPTICAL_TRANSPONDER.value,
+}
+
+ROADM_DEVICE_TYPES = {
+    DeviceTypeEnum.OPTICAL_ROADM.value,
+    DeviceTypeEnum.EMULATED_OPTICAL_ROADM.value,
+    DeviceTypeEnum.OPEN_ROADM.value,
+    DeviceTypeEnum.EMULATED_OPEN_ROADM.value,
+}
+
+
+def _build_channel_result(channel, device_type):
+    """
+    [CHAFI-THESIS] Extracts channel_data and band_name from one OpticalConfig channel.
+
+    Returns:
+        dict: {'channel_data': {...}, 'band_name': str} or None if frequencies are missing
+    """
+    # Get frequency data - field names differ by device type:
+    # Transponder: min_frequency, max_frequency
+    # ROADM: lower_frequency, upper_frequency
+    if device_type in TRANSPONDER_DEVICE_TYPES:
+        min_freq = channel.get('min_frequency')
+        max_freq = channel.get('max_frequency')
+    else:
+        # ROADM types use lower/upper frequency
+        min_freq = channel.get('lower_frequency')
+        max_freq = channel.get('upper_frequency')
+
+    if not min_freq or not max_freq:
+        return None
+
+    channel_data = {
+        'frequency': int((int(min_freq) + int(max_freq)) / 2),
+        'min_frequency': int(min_freq),
+        'max_frequency': int(max_freq),
+        'flex_slots': channel.get('flex_slots'),
+        'bitmap_value': str(channel.get('bitmap_value', '0'))
+    }
+
+    # Detect band
+    band_info = detect_band_for_display(int(min_freq), int(max_freq))
+    band_name = band_info['band_name'] if band_info else None
+
+    return {
+        'channel_data': channel_data,
+        'band_name': band_name
+    }
+
+
+def index_optical_config_channels(config, device_type):
+    """
+    [CHAFI-THESIS] Indexes the channels of a parsed OpticalConfig by endpoint identifier.
+
+    Transponder channels are keyed by endpoint.index (via config['endpoints']),
+    ROADM channels by channel_index/name.index (== endpoint.name, as string).
+    Channels without frequency data are indexed as None so callers can tell
+    "found but incomplete" apart from "no channel".
+
+    Args:
+        config: Parsed OpticalConfig JSON (dict)
+        device_type: Device type string (e.g., 'optical-transponder', 'optical-roadm')
+
+    Returns:
+        dict: endpoint identifier -> {'channel_data', 'band_name'} (or None)
+    """
+    channel_index = {}
+
+    if device_type in TRANSPONDER_DEVICE_TYPES:
+        # Build channel_map: channel_name -> channel
+        channel_map = {}
+        for ch in config.get('channels', []):
+            ch_name_data = ch.get('name', {})
+            if isinstance(ch_name_data, dict):
+                ch_name = ch_name_data.get('index')
+                if ch_name:
+                    channel_map[ch_name] = ch
+
+        # endpoint_index -> channel_name -> channel
+        for ep in config.get('endpoints', []):
+            if isinstance(ep, dict):
+                ep_uuid = ep.get('endpoint_uuid', {})
+                if isinstance(ep_uuid, dict):
+                    ep_idx = ep_uuid.get('index')
+                    ep_chn = ep_uuid.get('channel')
+                    if ep_idx and ep_chn and ep_chn in channel_map:
+                        channel_index[ep_idx] = _build_channel_result(
+                            channel_map[ep_chn], device_type)
+
+    elif device_type in ROADM_DEVICE_TYPES:
+        # ROADM: channel_index == endpoint_name, first match wins
+        for channel in config.get('channels', []):
+            ch_index = channel.get('channel_index')
+            if not ch_index and isinstance(channel.get('name'), dict):
+                ch_index = channel['name'].get('index')
+            key = str(ch_index)
+            if key not in channel_index:
+                channel_index[key] = _build_channel_result(channel, device_type)
+
+    return channel_index
+
+
+def lookup_channel_data(channel_index, device_type, endpoint_identifier):
+    """
+    [CHAFI-THESIS] Resolves one endpoint from an index built by index_optical_config_channels().
+
+    Returns:
+        dict: {'channel_data', 'band_name'} or None if channel data not found
+    """
+    if device_type in ROADM_DEVICE_TYPES:
+        return channel_index.get(str(endpoint_identifier))
+    return channel_index.get(endpoint_identifier)
+
+
+def fetch_device_channel_index(device_uuid, device_type, context_client):
+    """
+    [CHAFI-THESIS] Fetches and parses a device's OpticalConfig once and indexes its channels.
+
+    Args:
+        device_uuid: Device UUID string
+        device_type: Device type string
+        context_client: ContextClient instance (already connected)
+
+    Returns:
+        dict: endpoint identifier -> channel result (see index_optical_config_channels),
+              or None if the device has no OpticalConfig
+    """
+    import json
+    from common.proto.context_pb2 import OpticalConfigId
+    from common.tools.context_queries.OpticalConfig import opticalconfig_uuid_get_duuid
+
+    opticalconfig_id = OpticalConfigId()
+    opticalconfig_id.opticalconfig_uuid = opticalconfig_uuid_get_duuid(device_uuid)
+
+    opticalconfig = context_client.SelectOpticalConfig(opticalconfig_id)
+
+    if not opticalconfig or not opticalconfig.opticalconfig_id.opticalconfig_uuid:
+        LOGGER.warning(
+            f"[CHAFI-RSA] No optical config found for device {device_uuid}")
+        return None
+
+    config = json.loads(opticalconfig.config) if isinstance(
+        opticalconfig.config, str) else opticalconfig.config
+
+    return index_optical_config_channels(config, device_type)
+
+
 def fetch_channel_data_for_endpoint(device_uuid, endpoint_identifier, device_type, context_client):
     """
     [CHAFI-THESIS] Universal function to fetch channel data for any endpoint (Transponder or ROADM).
@@ -346,6 +496,9 @@ def fetch_channel_data_for_endpoint(device_uuid, endpoint_identifier, device_typ
     This is a shared function that can be used by any service (parallelopticalcontroller, webui, etc.)
     to fetch channel frequency information from OpticalConfig.
 
+    When several endpoints of the same device are needed, prefer
+    fetch_device_channel_index() + lookup_channel_data() to fetch the config once.
+
     Args:
         device_uuid: Device UUID string
         endpoint_identifier: endpoint.index (for transponder) or endpoint.name (for ROADM)
@@ -358,120 +511,18 @@ def fetch_channel_data_for_endpoint(device_uuid, endpoint_identifier, device_typ
             'band_name': str (e.g., 'S, C, L')
         } or None if channel data not found
     """
-    import json
-    from common.proto.context_pb2 import OpticalConfigId
-    from common.tools.context_queries.OpticalConfig import opticalconfig_uuid_get_duuid
-    from common.DeviceTypes import DeviceTypeEnum
-
-    # LOGGER.debug(
-    #     f"[CHAFI-RSATools.py] fetch_channel_data_for_endpoint: device={device_uuid}, endpoint={endpoint_identifier}, type={device_type}")
-
     try:
-        # Step 1: Compute opticalconfig_uuid from device_uuid
-        opticalconfig_uuid = opticalconfig_uuid_get_duuid(device_uuid)
-
-        # Step 2: Fetch OpticalConfig using ContextClient
-        opticalconfig_id = OpticalConfigId()
-        opticalconfig_id.opticalconfig_uuid = opticalconfig_uuid
-
-        opticalconfig = context_client.SelectOpticalConfig(opticalconfig_id)
-
-        if not opticalconfig or not opticalconfig.opticalconfig_id.opticalconfig_uuid:
-            LOGGER.warning(
-                f"[CHAFI-RSA] No optical config found for device {device_uuid}")
+        channel_index = fetch_device_channel_index(
+            device_uuid, device_type, context_client)
+        if channel_index is None:
             return None
 
-        # Step 3: Parse config JSON
-        config = json.loads(opticalconfig.config) if isinstance(
-            opticalconfig.config, str) else opticalconfig.config
-
-        # Step 4: Match channel based on device type
-        target_channel = None
-
-        if device_type in [DeviceTypeEnum.OPTICAL_TRANSPONDER.value, DeviceTypeEnum.EMULATED_OPTICAL_TRANSPONDER.value]:
-            # Transponder: Match by endpoint.index
-            # Build endpoint_map: endpoint_index -> channel_name
-            endpoint_map = {}
-            for ep in config.get('endpoints', []):
-                if isinstance(ep, dict):
-                    ep_uuid = ep.get('endpoint_uuid', {})
-                    if isinstance(ep_uuid, dict):
-                        ep_idx = ep_uuid.get('index')
-                        ep_chn = ep_uuid.get('channel')
-                        if ep_idx and ep_chn:
-                            endpoint_map[ep_idx] = ep_chn
-
-            # Build channel_map: channel_name -> channel_data
-            channel_map = {}
-            for ch in config.get('channels', []):
-                ch_name_data = ch.get('name', {})
-                if isinstance(ch_name_data, dict):
-                    ch_name = ch_name_data.get('index')
-                    if ch_name:
-                        channel_map[ch_name] = ch
-
-            # Lookup: endpoint_index -> channel_name -> channel_data
-            target_channel_name = endpoint_map.get(endpoint_identifier)
-            if target_channel_name:
-                target_channel = channel_map.get(target_channel_name)
-
-        elif device_type in [DeviceTypeEnum.OPTICAL_ROADM.value, DeviceTypeEnum.EMULATED_OPTICAL_ROADM.value,
-                             DeviceTypeEnum.OPEN_ROADM.value, DeviceTypeEnum.EMULATED_OPEN_ROADM.value]:
-            # ROADM: Match by endpoint.name (channel_index == endpoint_name)
-            for channel in config.get('channels', []):
-                ch_index = channel.get('channel_index')
-                if not ch_index and isinstance(channel.get('name'), dict):
-                    ch_index = channel['name'].get('index')
-
-                if str(ch_index) == str(endpoint_identifier):
-                    target_channel = channel
-                    break
-
-        # Step 5: Extract channel data
-        if target_channel:
-            # Get frequency data - field names differ by device type:
-            # Transponder: min_frequency, max_frequency
-            # ROADM: lower_frequency, upper_frequency
-            if device_type in [DeviceTypeEnum.OPTICAL_TRANSPONDER.value, DeviceTypeEnum.EMULATED_OPTICAL_TRANSPONDER.value]:
-                min_freq = target_channel.get('min_frequency')
-                max_freq = target_channel.get('max_frequency')
-            else:
-                # ROADM types use lower/upper frequency
-                min_freq = target_channel.get('lower_frequency')
-                max_freq = target_channel.get('upper_frequency')
-
-            flex_slots = target_channel.get('flex_slots')
-            bitmap_value = target_channel.get('bitmap_value', '0')
-
-            if min_freq and max_freq:
-                channel_data = {
-                    'frequency': int((int(min_freq) + int(max_freq)) / 2),
-                    'min_frequency': int(min_freq),
-                    'max_frequency': int(max_freq),
-                    'flex_slots': flex_slots,
-                    'bitmap_value': str(bitmap_value)
-                }
-
-                # Detect band
-                band_info = detect_band_for_display(
-                    int(min_freq), int(max_freq))
-                band_name = band_info['band_name'] if band_info else None
-
-                # LOGGER.info(
-                #     f"[CHAFI-RSA] Channel data found: device={device_uuid}, endpoint={endpoint_identifier}, band={band_name}, slots={flex_slots}")
-
-                return {
-                    'channel_data': channel_data,
-                    'band_name': band_name
-                }
-            else:
-                LOGGER.warning(
-                    f"[CHAFI-RSA] Channel found but missing frequency data: {device_uuid}:{endpoint_identifier}")
-        else:
+        result = lookup_channel_data(
+            channel_index, device_type, endpoint_identifier)
+        if result is None:
             LOGGER.warning(
-                f"[CHAFI-RSA] No channel match for endpoint: {device_uuid}:{endpoint_identifier}")
-
-        return None
+                f"[CHAFI-RSA] No channel data for endpoint: {device_uuid}:{endpoint_identifier}")
+        return result
 
     except Exception as e:
         LOGGER.error(f"[CHAFI-RSA] fetch_channel_data_for_endpoint error: {e}")
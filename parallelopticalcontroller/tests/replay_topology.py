@@ -0,0 +1,88 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Small replayed topology for the snapshot tests, served through CONTEXT_CLIENT_POOL:
+
+    T1 --L0-- R1 --L2-- R2 --L3-- T2
+    T3 --L1-- R1        R2 --L4-- T4
+
+Every endpoint has one 20-slot C-band channel, all slots free. Endpoint
+uuids are "<device>-<endpoint>" (T1-1, R1-r1-a, ...), device uuids "u-<device>".
+"""
+
+import json
+
+from common.tools.context_queries.OpticalConfig import opticalconfig_uuid_get_duuid
+from parallelopticalcontroller.ContextClientPool import CONTEXT_CLIENT_POOL
+from parallelopticalcontroller.Replay import FakeContextClient, ReplayStore
+
+C_BAND_HZ = (193125000000000, 193250000000000)
+FLEX_SLOTS = 20
+ALL_FREE = (1 << FLEX_SLOTS) - 1
+
+_TRANSPONDER, _ROADM = 'optical-transponder', 'optical-roadm'
+_DEVICES = {
+    'T1': (_TRANSPONDER, ['1']), 'T2': (_TRANSPONDER, ['1']),
+    'T3': (_TRANSPONDER, ['1']), 'T4': (_TRANSPONDER, ['1']),
+    'R1': (_ROADM, ['r1-a', 'r1-b', 'r1-c']), 'R2': (_ROADM, ['r2-a', 'r2-b', 'r2-c']),
+}
+_LINKS = [('T1', '1', 'R1', 'r1-a'), ('T3', '1', 'R1', 'r1-b'), ('R1', 'r1-c', 'R2', 'r2-a'),
+          ('R2', 'r2-b', 'T2', '1'), ('R2', 'r2-c', 'T4', '1')]
+
+
+def _endpoint_id(device, endpoint):
+    return {'device_id': {'device_uuid': {'uuid': 'u-' + device}},
+            'endpoint_uuid': {'uuid': device + '-' + endpoint}}
+
+
+def _optical_config(device, device_type, endpoints):
+    if device_type == _TRANSPONDER:
+        config = {'type': device_type,
+                  'channels': [{'name': {'index': 'channel-1'}, 'min_frequency': C_BAND_HZ[0],
+                                'max_frequency': C_BAND_HZ[1], 'flex_slots': FLEX_SLOTS,
+                                'bitmap_value': str(ALL_FREE)}],
+                  'endpoints': [{'endpoint_uuid': {'index': '1', 'channel': 'channel-1'}}]}
+    else:
+        config = {'type': device_type,
+                  'channels': [{'channel_index': endpoint, 'name': {'index': endpoint},
+                                'lower_frequency': C_BAND_HZ[0], 'upper_frequency': C_BAND_HZ[1],
+                                'flex_slots': FLEX_SLOTS, 'bitmap_value': str(ALL_FREE)}
+                               for endpoint in endpoints]}
+    return {'opticalconfig_id': {'opticalconfig_uuid': opticalconfig_uuid_get_duuid('u-' + device)},
+            'device_id': {'device_uuid': {'uuid': 'u-' + device}},
+            'config': json.dumps(config)}
+
+
+def replay_snapshot():
+    """Snapshot dict in the record_context() layout."""
+    devices, configs = [], []
+    for device, (device_type, endpoints) in _DEVICES.items():
+        devices.append({
+            'device_id': {'device_uuid': {'uuid': 'u-' + device}}, 'name': device, 'device_type': device_type,
+            'device_endpoints': [{'endpoint_id': _endpoint_id(device, endpoint), 'name': endpoint,
+                                  'index': endpoint, 'transport_type': 'MWDM'} for endpoint in endpoints]})
+        configs.append(_optical_config(device, device_type, endpoints))
+    links = [{'link_id': {'link_uuid': {'uuid': 'L{}'.format(i)}}, 'name': '{}-{}'.format(src, dst),
+              'optical_details': {'src_port': src_endpoint, 'dst_port': dst_endpoint},
+              'link_endpoint_ids': [_endpoint_id(src, src_endpoint), _endpoint_id(dst, dst_endpoint)]}
+             for i, (src, src_endpoint, dst, dst_endpoint) in enumerate(_LINKS)]
+    return {'format': 1, 'devices': devices, 'optical_links': links, 'optical_configs': configs, 'services': []}
+
+
+def install_topology():
+    """Serve a fresh ReplayStore of the topology through CONTEXT_CLIENT_POOL and return it."""
+    store = ReplayStore(replay_snapshot())
+    CONTEXT_CLIENT_POOL.set_client_factory(lambda: FakeContextClient(store, {}))
+    return store
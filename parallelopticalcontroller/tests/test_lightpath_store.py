@@ -0,0 +1,54 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Expiry of resident flows: only PLANNED/FAILED flows nobody touched for
+ttl_sec are archived, never flows that hold slot reservations.
+"""
+
+import time
+
+from parallelopticalcontroller.LightpathStore import LightpathStore
+
+TTL_SEC = 60
+
+
+def _flows(updated_at):
+    return {
+        1: {'flow_id': 1, 'status': 'PLANNED', 'updated_at': updated_at},
+        2: {'flow_id': 2, 'status': 'FAILED', 'updated_at': updated_at},
+        3: {'flow_id': 3, 'status': 'ACTIVE', 'updated_at': updated_at},
+        4: {'flow_id': 4, 'status': 'PARTIAL', 'updated_at': updated_at},
+    }
+
+
+def test_expire_stale_flows():
+    flows = _flows(time.time() - 2 * TTL_SEC)
+    assert sorted(LightpathStore(ttl_sec=TTL_SEC).expire(flows)) == [1, 2]
+    assert sorted(flows) == [3, 4]
+
+
+def test_touched_flow_is_kept():
+    store = LightpathStore(ttl_sec=TTL_SEC)
+    flows = _flows(time.time() - 2 * TTL_SEC)
+    # PerformRSA is still reading flow 1
+    store.touch(flows[1])
+    assert store.expire(flows) == [2]
+    assert sorted(flows) == [1, 3, 4]
+
+
+def test_reserved_flow_is_kept():
+    flows = _flows(time.time() - 2 * TTL_SEC)
+    assert LightpathStore(ttl_sec=TTL_SEC).expire(flows, retained={2}) == [1]
+    assert sorted(flows) == [2, 3, 4]
@@ -0,0 +1,126 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Expiry/re-claim race of the reservation ledger: a flow whose reservation
+expired must not claim slots another flow has reserved or acquired since,
+and AcquireSlots must not clear slots already in use in Context.
+"""
+
+import json
+
+import pytest
+
+from common.proto.context_pb2 import OpticalConfig
+from parallelopticalcontroller.ReservationLedger import ReservationLedger
+from parallelopticalcontroller.SlotAcquisition import SlotConflictError, apply_device_allocations
+
+FLOW_A, FLOW_B = 1, 2
+MASKS = {'ep-1': 0b1111, 'ep-2': 0b1111}
+
+
+class _Bitmaps:
+    """Endpoint bitmaps standing in for the current snapshot (bit = 1 free)."""
+
+    def __init__(self):
+        self.bitmaps = {'ep-1': 0xFFFF, 'ep-2': 0xFFFF}
+
+    def acquire(self, endpoint_masks):
+        for endpoint_uuid, mask in endpoint_masks.items():
+            self.bitmaps[endpoint_uuid] &= ~mask
+
+    def slots_free(self, endpoint_masks):
+        return all(self.bitmaps[e] & mask == mask for e, mask in endpoint_masks.items())
+
+
+def _ledger(bitmaps, ttl_sec):
+    return ReservationLedger(lambda: 1, ttl_sec=ttl_sec, slots_free=bitmaps.slots_free)
+
+
+def test_claim_of_live_reservation():
+    ledger = _ledger(_Bitmaps(), ttl_sec=30)
+    assert ledger.reserve(FLOW_A, 'dijkstra', MASKS, 1) is not None
+    assert ledger.claim(FLOW_A, 'dijkstra', MASKS) is not None
+
+
+def test_expired_claim_conflicts_with_newer_reservation():
+    ledger = _ledger(_Bitmaps(), ttl_sec=0)
+    assert ledger.reserve(FLOW_A, 'dijkstra', MASKS, 1) is not None
+    # A's reservation expired: B reserves and claims the same slots
+    assert ledger.reserve(FLOW_B, 'dijkstra', MASKS, 1) is not None
+    assert ledger.claim(FLOW_B, 'dijkstra', MASKS) is not None
+    assert ledger.claim(FLOW_A, 'dijkstra', MASKS) is None
+
+
+def test_expired_claim_rejects_slots_acquired_meanwhile():
+    bitmaps = _Bitmaps()
+    ledger = _ledger(bitmaps, ttl_sec=0)
+    assert ledger.reserve(FLOW_A, 'dijkstra', MASKS, 1) is not None
+    assert ledger.reserve(FLOW_B, 'dijkstra', MASKS, 1) is not None
+    assert ledger.claim(FLOW_B, 'dijkstra', MASKS) is not None
+    # B's AcquireSlots patches the snapshot and drops its hold
+    bitmaps.acquire(MASKS)
+    ledger.release_flow(FLOW_B)
+    assert ledger.claim(FLOW_A, 'dijkstra', MASKS) is None
+    assert len(ledger) == 0
+
+
+def test_expired_claim_of_free_slots():
+    ledger = _ledger(_Bitmaps(), ttl_sec=0)
+    assert ledger.reserve(FLOW_A, 'dijkstra', MASKS, 1) is not None
+    assert ledger.claim(FLOW_A, 'dijkstra', MASKS) is not None
+
+
+class _ContextClient:
+    """SelectOpticalConfig/UpdateOpticalConfig over one transponder config."""
+
+    def __init__(self, bitmap_value):
+        self.config = {
+            'type': 'optical-transponder',
+            'channels': [{'name': {'index': 'channel-1'}, 'min_frequency': 193125000000000,
+                          'max_frequency': 193250000000000, 'flex_slots': 16, 'bitmap_value': str(bitmap_value)}],
+            'endpoints': [{'endpoint_uuid': {'index': '1', 'channel': 'channel-1'}}],
+        }
+        self.updates = []
+
+    def SelectOpticalConfig(self, request):
+        config = OpticalConfig()
+        config.opticalconfig_id.opticalconfig_uuid = request.opticalconfig_uuid
+        config.config = json.dumps(self.config)
+        return config
+
+    def UpdateOpticalConfig(self, request):
+        self.updates.append(json.loads(request.config))
+
+
+def _allocation(allocation_mask):
+    meta = {'endpoint_uuid': 'ep-1', 'endpoint_name': 'port-1', 'endpoint_index': '1',
+            'device_type': 'optical-transponder', 'offset_slots': 0, 'native_flex_slots': 16,
+            'aligned_bitmap': 0xFFFF}
+    return [(meta, allocation_mask, 16)]
+
+
+def test_acquisition_of_free_slots():
+    context_client = _ContextClient(0xFFFF)
+    _, endpoint_masks = apply_device_allocations(context_client, 'dev-1', _allocation(0b1111))
+    assert endpoint_masks == {'ep-1': 0b1111}
+    assert context_client.updates[0]['new_config']['channels'][0]['bitmap_value'] == str(0xFFF0)
+
+
+def test_acquisition_of_slots_in_use():
+    # Slot 0 was taken by another flow after the reservation expired
+    context_client = _ContextClient(0xFFFE)
+    with pytest.raises(SlotConflictError):
+        apply_device_allocations(context_client, 'dev-1', _allocation(0b1111))
+    assert context_client.updates == []
@@ -0,0 +1,148 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Context events reach the snapshot through LocalEventSource: link and
+optical-config updates patch it into a new version, structural changes
+invalidate it, and reconcile() repairs changes no event reported.
+"""
+
+import json
+import time
+from contextlib import contextmanager
+
+from common.proto.context_pb2 import EventTypeEnum, OpticalConfig
+from common.tools.context_queries.OpticalConfig import opticalconfig_uuid_get_duuid
+from parallelopticalcontroller.SnapshotEvents import DEVICE_EVENTS, LINK_EVENTS, SnapshotEventSubscriber
+from parallelopticalcontroller.TopologySnapshot import TopologySnapshotManager
+
+from .replay_topology import ALL_FREE, FLEX_SLOTS, install_topology
+
+TIMEOUT_SEC = 5
+
+
+def _wait_for(condition):
+    deadline = time.monotonic() + TIMEOUT_SEC
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out waiting for the subscriber'
+        time.sleep(0.01)
+
+
+@contextmanager
+def _following(manager):
+    """Subscriber on manager, with both event streams open."""
+    subscriber = SnapshotEventSubscriber(reconcile_sec=0, manager=manager)
+    subscriber.start()
+    try:
+        _wait_for(lambda: set(subscriber._streams) == {DEVICE_EVENTS, LINK_EVENTS})
+        yield subscriber
+    finally:
+        subscriber.stop()
+
+
+def _used_link(store, link_uuid):
+    link = store.get_optical_link(link_uuid)
+    link.optical_details.used = True
+    return link
+
+
+def _set_channel(store, device_uuid, **channel):
+    """Overwrite the T* channel of a device in the store, without any event."""
+    stored = store.optical_configs[opticalconfig_uuid_get_duuid(device_uuid)]
+    config = json.loads(stored.config)
+    config['channels'][0].update(channel)
+    stored.config = json.dumps(config)
+
+
+def test_link_event_patches_used_flag():
+    store = install_topology()
+    manager = TopologySnapshotManager()
+    held = manager.get_snapshot()
+
+    with _following(manager):
+        store.set_optical_link(_used_link(store, 'L0'))
+        _wait_for(lambda: manager.version > held.version)
+
+    current = manager.get_snapshot()
+    assert current.cache.get_link('L0').used
+    assert not current.views.G_free.has_edge('T1', 'R1')
+    assert not held.cache.get_link('L0').used
+    assert manager.is_valid()
+
+
+def test_optical_config_event_patches_bitmap():
+    store = install_topology()
+    manager = TopologySnapshotManager()
+    held = manager.get_snapshot()
+    bitmap = ALL_FREE & ~0b1111
+
+    update = OpticalConfig()
+    update.opticalconfig_id.opticalconfig_uuid = opticalconfig_uuid_get_duuid('u-T1')
+    update.config = json.dumps({'new_config': {'channels': [
+        {'name': {'index': 'channel-1'}, 'bitmap_value': str(bitmap), 'flex_slots': FLEX_SLOTS}]}})
+    with _following(manager):
+        store.update_optical_config(update)
+        _wait_for(lambda: manager.version > held.version)
+
+    assert manager.get_snapshot().cache.get_endpoint('T1-1').bitmap_value == bitmap
+    assert held.cache.get_endpoint('T1-1').bitmap_value == ALL_FREE
+
+
+def test_remove_event_invalidates():
+    store = install_topology()
+    manager = TopologySnapshotManager()
+    manager.get_snapshot()
+
+    with _following(manager) as subscriber:
+        store.events.publish_link_event('L2', EventTypeEnum.EVENTTYPE_REMOVE)
+        _wait_for(lambda: not manager.is_valid())
+    assert subscriber.invalidations == 1
+
+
+def test_structure_mismatch_invalidates():
+    store = install_topology()
+    manager = TopologySnapshotManager()
+    snapshot = manager.get_snapshot()
+    subscriber = SnapshotEventSubscriber(reconcile_sec=0, manager=manager)
+
+    _set_channel(store, 'u-T4', flex_slots=2 * FLEX_SLOTS, bitmap_value=str((1 << 2 * FLEX_SLOTS) - 1))
+    subscriber.reconcile()
+
+    assert not manager.is_valid()
+    assert manager.current_snapshot() is None
+    assert snapshot.cache.get_endpoint('T4-1').flex_slots == FLEX_SLOTS
+    assert subscriber.invalidations == 1 and subscriber.updates == 0
+
+
+def test_reconcile_repairs_drift():
+    store = install_topology()
+    manager = TopologySnapshotManager()
+    held = manager.get_snapshot()
+    subscriber = SnapshotEventSubscriber(reconcile_sec=0, manager=manager)
+
+    # Changed in Context with no event
+    bitmap = ALL_FREE >> 4
+    store.optical_links['L3'] = _used_link(store, 'L3')
+    _set_channel(store, 'u-T2', bitmap_value=str(bitmap))
+
+    subscriber.reconcile()
+    current = manager.get_snapshot()
+    assert current.version == held.version + 1
+    assert current.cache.get_link('L3').used
+    assert current.cache.get_endpoint('T2-1').bitmap_value == bitmap
+
+    # Nothing left to repair: the version stays
+    subscriber.reconcile()
+    assert manager.version == current.version
+    assert manager.is_valid()
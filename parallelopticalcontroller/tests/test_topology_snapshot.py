@@ -0,0 +1,83 @@
+# Copyright 2022-2025 ETSI SDG TeraFlowSDN (TFS) (https://tfs.etsi.org/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Published snapshots are immutable: patches install a new version and leave
+the snapshot a request already holds untouched.
+"""
+
+from parallelopticalcontroller.TopologySnapshot import TopologySnapshotManager
+
+from .replay_topology import ALL_FREE, install_topology
+
+MASK = 0b1111
+
+
+def test_acquisition_installs_a_new_version():
+    install_topology()
+    manager = TopologySnapshotManager()
+    held = manager.get_snapshot()
+    held_version = held.version
+
+    manager.apply_acquisition(['L0'], {'T1-1': MASK})
+
+    current = manager.get_snapshot()
+    assert current is not held
+    assert current.version == held_version + 1
+    assert current.cache.get_link('L0').used
+    assert current.cache.get_endpoint('T1-1').bitmap_value == ALL_FREE & ~MASK
+    assert not current.views.G_free.has_edge('T1', 'R1')
+
+    # The snapshot a reader already holds does not change
+    assert held.version == held_version
+    assert not held.cache.get_link('L0').used
+    assert held.cache.get_endpoint('T1-1').bitmap_value == ALL_FREE
+    assert held.views.G_free.has_edge('T1', 'R1')
+
+
+def test_deltas_bring_a_copy_to_the_current_version():
+    install_topology()
+    manager = TopologySnapshotManager()
+    replica = manager.get_snapshot().copy(manager.version)
+
+    manager.apply_acquisition(['L0'], {'T1-1': MASK})
+    manager.apply_update({'L3': True}, {'T2-1': ALL_FREE >> 1})
+
+    for delta in manager.deltas_since(replica.version):
+        delta.apply_to(replica)
+    current = manager.get_snapshot()
+    assert replica.version == current.version
+    for link_uuid in ('L0', 'L3'):
+        assert replica.cache.get_link(link_uuid).used == current.cache.get_link(link_uuid).used
+    for endpoint_uuid in ('T1-1', 'T2-1'):
+        assert replica.cache.get_endpoint(endpoint_uuid).bitmap_value == \
+            current.cache.get_endpoint(endpoint_uuid).bitmap_value
+
+
+def test_route_table_follows_versions():
+    install_topology()
+    manager = TopologySnapshotManager()
+    held = manager.get_snapshot()
+    routes = held.views.warm_routes()
+    assert routes > 0
+
+    # Bitmaps only: the FREE graph is unchanged, the next version keeps the routes
+    manager.apply_update({}, {'T2-1': ALL_FREE >> 1})
+    assert manager.get_snapshot().views.route_count() == routes
+
+    # A link becomes USED: only the new version's views change and drop their routes
+    manager.apply_acquisition(['L0'], {})
+    assert manager.get_snapshot().views.route_count() == 0
+    assert held.views.route_count() == routes
+    assert held.views.G_simple_free.has_edge('T1', 'R1')
@@ -19,13 +19,18 @@
 # [CHAFI-THESIS-END]
 
 import logging
+import os
 import time
 import networkx as nx
-from typing import Dict, List, Tuple, Optional, Any
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Tuple, Optional, Any
 
 # [CHAFI-THESIS-START] - TeraFlowSDN Context Client for querying devices and links
 from context.client.ContextClient import ContextClient
 from common.proto.context_pb2 import Empty, TopologyId
+from .ContextClientPool import CONTEXT_CLIENT_POOL
+from .Metrics import observe_phase
+from .TopologyRecords import EndpointRecord, LinkRecord
 from common.DeviceTypes import DeviceTypeEnum
 from common.Constants import TransportTypeEnum, get_standardized_transport_type
 # [CHAFI-THESIS-END]
@@ -52,6 +57,16 @@ OPTICAL_DEVICE_TYPES = {
     DeviceTypeEnum.EMULATED_OPTICAL_TRANSPONDER.value,  # 'emu-optical-transponder'
 }
 
+# [CHAFI-THESIS] Upper bound on concurrent SelectOpticalConfig calls per snapshot build
+CHANNEL_FETCH_MAX_WORKERS = 16
+
+# [CHAFI-THESIS] Bounds of the alternative path search in find_paths():
+# at most K node sequences, tried in hop-count order, within a wall-clock budget
+DEFAULT_K_PATHS = int(os.environ.get('RSA_K_PATHS', '20'))
+DEFAULT_PATH_SEARCH_BUDGET_SEC = float(os.environ.get('RSA_PATH_SEARCH_BUDGET_SEC', '2.0'))
+# [CHAFI-THESIS] Transponder pairs whose shortest route GetTopology precomputes (route table warm-up)
+ROUTE_WARMUP_MAX_PAIRS = int(os.environ.get('RSA_ROUTE_WARMUP_MAX_PAIRS', '10000'))
+
 
 # =============================================================================
 # [CHAFI-THESIS] DATA STRUCTURES COMPARISON
@@ -77,8 +92,11 @@ OPTICAL_DEVICE_TYPES = {
 
 def get_context_client() -> ContextClient:
     """
-    [CHAFI-THESIS] Create and return a ContextClient instance.
+    [CHAFI-THESIS] Create and return a dedicated ContextClient instance.
     This is our gateway to query TeraFlowSDN's context service.
+
+    The caller owns the connection and must close() it. Controller code should
+    borrow a warm client from CONTEXT_CLIENT_POOL instead.
     """
     ctx_client = ContextClient()
     ctx_client.connect()
@@ -147,10 +165,9 @@ def fetch_optical_links_as_json() -> List[Dict]:
         List of dictionaries containing optical link data
     """
 
-    ctx_client = get_context_client()
     links_json = []
 
-    try:
+    with CONTEXT_CLIENT_POOL.client() as ctx_client:
         optical_links = fetch_optical_links(ctx_client)
 
         for link in optical_links:
@@ -185,240 +202,421 @@ def fetch_optical_links_as_json() -> List[Dict]:
         # LOGGER.info(
         #    f"[CHAFI-TOPOLOGY] Links as JSON: {len(links_json)} processed")
 
-    finally:
-        ctx_client.close()
-
     return links_json
 
 
-def fetch_optical_links_for_rsa(optical_devices: List[Any]) -> List[Dict]:
+def fetch_channel_indexes(ctx_client: ContextClient, device_types: Dict[str, str]) -> Dict[str, Dict]:
+    """
+    [CHAFI-THESIS] Fetch and index the OpticalConfig of several devices concurrently.
+
+    Each device's config is fetched and parsed exactly once; the SelectOpticalConfig
+    calls for different devices are issued in parallel over the same gRPC channel.
+
+    Args:
+        ctx_client: ContextClient instance (already connected)
+        device_types: device_uuid -> device_type for every device to fetch
+
+    Returns:
+        device_uuid -> channel index (see RSATools.index_optical_config_channels).
+        Devices without config or whose fetch failed are omitted.
+    """
+    from common.RSATools import fetch_device_channel_index
+
+    channel_indexes = {}
+    if not device_types:
+        return channel_indexes
+
+    max_workers = min(CHANNEL_FETCH_MAX_WORKERS, len(device_types))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(fetch_device_channel_index, device_uuid, device_type, ctx_client): device_uuid
+            for device_uuid, device_type in device_types.items()
+        }
+        for future in as_completed(futures):
+            device_uuid = futures[future]
+            try:
+                channel_index = future.result()
+            except Exception as e:
+                LOGGER.error(
+                    f"[CHAFI-TOPOLOGY] Channel fetch error for device {device_uuid}: {e}")
+                continue
+            if channel_index is not None:
+                channel_indexes[device_uuid] = channel_index
+
+    return channel_indexes
+
+
+def fetch_optical_links_for_rsa(optical_devices: List[Any], ctx_client: Optional[ContextClient] = None) -> List[LinkRecord]:
     """
     [CHAFI-THESIS] Fetch optical links for RSA with channel data enrichment.
 
+    Channel data is fetched once per device (not once per endpoint) and all
+    devices are fetched concurrently, see fetch_channel_indexes(). Each
+    endpoint becomes one EndpointRecord shared by every link referencing it,
+    so its bitmap is parsed once.
+
     Args:
         optical_devices: List of optical device objects (pre-filtered)
+        ctx_client: Optional connected ContextClient. If None, one is borrowed from the pool.
 
     Returns:
-        List of optical link dictionaries with endpoint channel data
+        List of LinkRecords whose endpoints carry the channel data
     """
-    from common.RSATools import fetch_channel_data_for_endpoint
+    if ctx_client is None:
+        with CONTEXT_CLIENT_POOL.client() as pooled_client:
+            return fetch_optical_links_for_rsa(optical_devices, pooled_client)
+
+    from common.RSATools import ROADM_DEVICE_TYPES, lookup_channel_data
 
     # LOGGER.info("[CHAFI-TOPOLOGY] Fetching optical links for RSA...")
 
-    ctx_client = get_context_client()
     links_rsa = []
 
-    try:
-        # Step 1: Build device and endpoint lookup maps from pre-fetched optical devices
-        device_map = {}  # device_uuid -> device name
-        endpoint_map = {}  # endpoint_uuid -> basic endpoint info
-
-        for device in optical_devices:
-            device_uuid = device.device_id.device_uuid.uuid
-            device_name = device.name if device.name else device_uuid
-            device_type = device.device_type
-
-            # Store device name for lookup
-            device_map[device_uuid] = device_name
-
-            # Build endpoint lookup from this device
-            for ep in device.device_endpoints:
-                ep_uuid = ep.endpoint_id.endpoint_uuid.uuid
-                endpoint_map[ep_uuid] = {
-                    'device_uuid': device_uuid,
-                    'device_name': device_name,
-                    'device_type': device_type,
-                    'endpoint_name': ep.name,
-                    'endpoint_index': getattr(ep, 'index', None),
-                    'transport_type': getattr(ep, 'transport_type', None),
-                }
+    # Step 1: One endpoint record per endpoint of the pre-fetched optical devices
+    endpoint_records = {}  # endpoint_uuid -> EndpointRecord
 
-        # LOGGER.debug(
-        #     f"[CHAFI-TOPOLOGY] Lookup maps: {len(device_map)} devices, {len(endpoint_map)} endpoints")
+    for device in optical_devices:
+        device_uuid = device.device_id.device_uuid.uuid
+        device_name = device.name if device.name else device_uuid
+        device_type = device.device_type
 
-        # Step 2: Fetch optical links and enrich with device/endpoint info + channel data
-        optical_links = fetch_optical_links(ctx_client)
+        for ep in device.device_endpoints:
+            ep_uuid = ep.endpoint_id.endpoint_uuid.uuid
+            endpoint_records[ep_uuid] = EndpointRecord(
+                ep_uuid, device_uuid, device_name=device_name, device_type=device_type,
+                endpoint_index=getattr(ep, 'index', None), name=ep.name,
+                transport_type=getattr(ep, 'transport_type', None))
 
-        for link in optical_links:
-            # Build endpoints list with resolved names and channel data
-            endpoints = []
-            for ep_id in link.link_endpoint_ids:
-                ep_uuid = ep_id.endpoint_uuid.uuid
-                device_uuid = ep_id.device_id.device_uuid.uuid
-                ep_info = endpoint_map.get(ep_uuid, {})
+    # LOGGER.debug(
+    #     f"[CHAFI-TOPOLOGY] Lookup maps: {len(endpoint_records)} endpoints")
+
+    # Step 2: Fetch optical links and resolve their endpoints to records
+    optical_links = fetch_optical_links(ctx_client)
+
+    endpoint_identifiers = {}  # endpoint_uuid -> (EndpointRecord, endpoint_identifier)
+    device_types = {}  # device_uuid -> device_type (devices whose config we need)
+
+    for link in optical_links:
+        endpoints = []
+        for ep_id in link.link_endpoint_ids:
+            ep_uuid = ep_id.endpoint_uuid.uuid
+            record = endpoint_records.get(ep_uuid)
+            if record is None:
+                # Endpoint of a device outside the optical devices: identity only
+                record = endpoint_records[ep_uuid] = EndpointRecord(ep_uuid, ep_id.device_id.device_uuid.uuid)
+
+            # Use endpoint_name for ROADM, endpoint_index for Transponder
+            if record.device_type in ROADM_DEVICE_TYPES:
+                # ===> Refactor: should be verified that endpoint_name/s are not mixed and unified using the deviceuuid
+                endpoint_identifier = record.name
+            else:
+                endpoint_identifier = record.endpoint_index
 
-                # Build base endpoint info
-                endpoint_data = {
-                    'endpoint_uuid': ep_uuid,
-                    'device_uuid': device_uuid,
-                    'device_name': ep_info.get('device_name'),
-                    'device_type': ep_info.get('device_type'),
-                    'endpoint_index': ep_info.get('endpoint_index'),
-                    'endpoint_name': ep_info.get('endpoint_name'),
-                    'transport_type': ep_info.get('transport_type'),
-                }
+            if record.device_uuid and endpoint_identifier:
+                device_types[record.device_uuid] = record.device_type
+                endpoint_identifiers[ep_uuid] = (record, endpoint_identifier)
 
-                # Fetch channel data for this endpoint
-                device_type = ep_info.get('device_type')
-
-                # Use endpoint_name for ROADM, endpoint_index for Transponder
-                if device_type in ['optical-roadm', 'emu-optical-roadm', 'openroadm', 'emu-optical-openroadm']:
-                    # ===> Refactor: should be verified that endpoint_name/s are not mixed and unified using the deviceuuid
-                    endpoint_identifier = ep_info.get('endpoint_name')
-                else:
-                    endpoint_identifier = ep_info.get('endpoint_index')
-
-                if device_uuid and endpoint_identifier:
-                    channel_result = fetch_channel_data_for_endpoint(
-                        device_uuid,
-                        endpoint_identifier,
-                        device_type,
-                        ctx_client
-                    )
-
-                    if channel_result:
-                        endpoint_data['channel_data'] = channel_result.get(
-                            'channel_data')
-                        endpoint_data['band_name'] = channel_result.get(
-                            'band_name')
-                        # LOGGER.debug(
-                        #     f"[CHAFI-TOPOLOGY] Enriched endpoint: {ep_info.get('device_name')}:{endpoint_identifier}")
-
-                endpoints.append(endpoint_data)
-
-            # Include fields for RSA with channel_data
-            link_data = {
-                'link_uuid': link.link_id.link_uuid.uuid if link.link_id else None,
-                'name': link.name,
-                'src_port': link.optical_details.src_port,
-                'dst_port': link.optical_details.dst_port,
-                'used': link.optical_details.used,
-                'endpoints': endpoints,
-            }
+            endpoints.append(record)
 
-            links_rsa.append(link_data)
+        # Include fields for RSA; the endpoint records get their channel data below
+        links_rsa.append(LinkRecord(
+            link.link_id.link_uuid.uuid if link.link_id else None, link.name,
+            link.optical_details.src_port, link.optical_details.dst_port,
+            link.optical_details.used, endpoints))
 
-        # LOGGER.info(
-        #     f"[CHAFI-TOPOLOGY] RSA links fetched: {len(links_rsa)} with channel data enrichment")
+    # Step 3: Fetch each device's OpticalConfig once, concurrently across devices
+    channel_indexes = fetch_channel_indexes(ctx_client, device_types)
 
-    finally:
-        ctx_client.close()
+    # Step 4: Enrich each endpoint once with channel data from the per-device indexes
+    for record, endpoint_identifier in endpoint_identifiers.values():
+        channel_index = channel_indexes.get(record.device_uuid)
+        if channel_index is None:
+            continue
+
+        channel_result = lookup_channel_data(channel_index, record.device_type, endpoint_identifier)
+        if channel_result:
+            record.set_channel(channel_result.get('channel_data'), channel_result.get('band_name'))
+
+    # LOGGER.info(
+    #     f"[CHAFI-TOPOLOGY] RSA links fetched: {len(links_rsa)} with channel data enrichment")
 
     return links_rsa
 
 
-def build_graph(directed: bool = False, optical_devices: List[Any] = None, optical_links: List[Dict] = None) -> Tuple[nx.MultiGraph, List[Dict]]:
+def build_graph(directed: bool = False, optical_devices: List[Any] = None, optical_links: List[LinkRecord] = None) -> Tuple[nx.MultiGraph, List[LinkRecord]]:
+    """
+    [CHAFI-THESIS] Build the NetworkX graph of optical devices and links.
+
+    Pure computation when both optical_devices and optical_links are given;
+    a pooled ContextClient is only borrowed for whatever must be fetched.
+    """
     # LOGGER.info("[CHAFI-TOPOLOGY] Building NetworkX graph...")
 
+    # STEP 1: Fetch devices/links only if not provided
+    if optical_devices is None or optical_links is None:
+        with CONTEXT_CLIENT_POOL.client() as ctx_client:
+            if optical_devices is None:
+                # Fetch ALL devices and filter to optical devices
+                optical_devices = fetch_optical_devices(ctx_client)
+            if optical_links is None:
+                optical_links = fetch_optical_links_for_rsa(
+                    optical_devices, ctx_client)
+
     # Create graph based on flag
     G = nx.MultiDiGraph() if directed else nx.MultiGraph()
 
-    # Get context client
-    ctx_client = get_context_client()
-
-    try:
-        # STEP 1: Fetch devices if not provided
-        if optical_devices is None:
-            # Fetch ALL devices and filter to optical devices
-            all_devices = fetch_devices(ctx_client)
-            optical_devices = [
-                d for d in all_devices if d.device_type in OPTICAL_DEVICE_TYPES]
-            # LOGGER.info(
-            #     f"[CHAFI-TOPOLOGY] Optical devices: {len(optical_devices)}/{len(all_devices)} (filtered)")
+    # STEP 2: Add nodes (OPTICAL devices only)
+    for device in optical_devices:
+        # Use device.name if available, otherwise use UUID
+        device_name = device.name if device.name else device.device_id.device_uuid.uuid
+        device_uuid = device.device_id.device_uuid.uuid
+        device_type = device.device_type
+
+        # Categorize device type for display
+        if device_type in {DeviceTypeEnum.OPTICAL_ROADM.value,
+                           DeviceTypeEnum.EMULATED_OPTICAL_ROADM.value,
+                           DeviceTypeEnum.OPEN_ROADM.value,
+                           DeviceTypeEnum.EMULATED_OPEN_ROADM.value}:
+            category = "ROADM"
         else:
-            # Use pre-fetched optical devices
+            category = "TRANSPONDER"
+
+        G.add_node(device_name,
+                   type=device_type,
+                   uuid=device_uuid,
+                   category=category)
+
+    # LOGGER.info(f"[CHAFI-TOPOLOGY] Graph nodes: {G.number_of_nodes()}")
+
+    # STEP 3: Add edges (optical links)
+    for link in optical_links:
+        # Extract endpoints (should have exactly 2)
+        endpoints = link.endpoints
+        if len(endpoints) < 2:
+            LOGGER.warning(
+                f"[CHAFI-TOPOLOGY] Link {link.name} has less than 2 endpoints, skipping")
+            continue
+
+        # Get source and destination device names
+        src_device = endpoints[0].device_name
+        dst_device = endpoints[1].device_name
+
+        if not src_device or not dst_device:
+            LOGGER.warning(
+                f"[CHAFI-TOPOLOGY] Link {link.name} missing device names, skipping")
+            continue
+
+        # Check if both devices exist as nodes (only optical devices are in graph)
+        if src_device not in G.nodes:
             # LOGGER.debug(
-            #     f"[CHAFI-TOPOLOGY] Using pre-fetched optical devices: {len(optical_devices)}")
-            pass
-
-        # STEP 2: Add nodes (OPTICAL devices only)
-        for device in optical_devices:
-            # Use device.name if available, otherwise use UUID
-            device_name = device.name if device.name else device.device_id.device_uuid.uuid
-            device_uuid = device.device_id.device_uuid.uuid
-            device_type = device.device_type
-
-            # Categorize device type for display
-            if device_type in {DeviceTypeEnum.OPTICAL_ROADM.value,
-                               DeviceTypeEnum.EMULATED_OPTICAL_ROADM.value,
-                               DeviceTypeEnum.OPEN_ROADM.value,
-                               DeviceTypeEnum.EMULATED_OPEN_ROADM.value}:
-                category = "ROADM"
-            else:
-                category = "TRANSPONDER"
+            #     f"[CHAFI-TOPOLOGY] Skipping link {link.name}: src {src_device} not in graph")
+            continue
+        if dst_device not in G.nodes:
+            # LOGGER.debug(
+            #     f"[CHAFI-TOPOLOGY] Skipping link {link.name}: dst {dst_device} not in graph")
+            continue
+
+        # Determine transport_type (similar to otn_type check in rsa_project)
+        src_transport = endpoints[0].transport_type
+        dst_transport = endpoints[1].transport_type
+
+        if src_transport == dst_transport:
+            transport_type = src_transport
+        else:
+            transport_type = "MIXED"
+            LOGGER.warning(
+                f"[CHAFI-TOPOLOGY] Transport type mismatch on link {link.name}: {src_transport} vs {dst_transport}")
+
+        # The edge references the LinkRecord (name, ports, indexes, device names) instead of
+        # copying its fields; only what the graph views filter on is kept as attributes.
+        # transport_enum is classified once here so path finding never re-parses the string
+        G.add_edge(
+            src_device,
+            dst_device,
+            key=link.link_uuid,
+            link=link,
+            transport_type=transport_type,
+            transport_enum=standardize_transport_type(transport_type),
+            used=link.used
+        )
+
+    # LOGGER.info(f"[CHAFI-TOPOLOGY] Graph edges: {G.number_of_edges()}")
 
-            G.add_node(device_name,
-                       type=device_type,
-                       uuid=device_uuid,
-                       category=category)
+    return G, optical_links
 
-        # LOGGER.info(f"[CHAFI-TOPOLOGY] Graph nodes: {G.number_of_nodes()}")
 
-        # STEP 3: Add edges (optical links)
-        if optical_links is None:
-            optical_links = fetch_optical_links_for_rsa(optical_devices)
+# =============================================================================
+# [CHAFI-THESIS] LINK CLASSIFICATION AND GRAPH VIEWS
+# =============================================================================
+# OCH links MUST be FREE (cannot be shared), OMS links can be shared.
+# Unknown (NA) and MIXED links are treated like OCH.
+# =============================================================================
 
-        for link in optical_links:
-            # Extract endpoints (should have exactly 2)
-            endpoints = link.get('endpoints', [])
-            if len(endpoints) < 2:
-                LOGGER.warning(
-                    f"[CHAFI-TOPOLOGY] Link {link['name']} has less than 2 endpoints, skipping")
-                continue
+def standardize_transport_type(transport_type) -> TransportTypeEnum:
+    """[CHAFI-THESIS] get_standardized_transport_type() that always returns a TransportTypeEnum."""
+    standardized = get_standardized_transport_type(transport_type)
+    if isinstance(standardized, TransportTypeEnum):
+        return standardized
+    return TransportTypeEnum.NA
 
-            # Get source and destination device names
-            src_device = endpoints[0].get('device_name')
-            dst_device = endpoints[1].get('device_name')
 
-            if not src_device or not dst_device:
-                LOGGER.warning(
-                    f"[CHAFI-TOPOLOGY] Link {link['name']} missing device names, skipping")
-                continue
+def _edge_transport_enum(attr: Dict) -> TransportTypeEnum:
+    """Transport enum of an edge, classified at build time when available."""
+    transport_enum = attr.get('transport_enum')
+    if transport_enum is None:
+        transport_enum = standardize_transport_type(attr.get('transport_type'))
+    return transport_enum
 
-            # Check if both devices exist as nodes (only optical devices are in graph)
-            if src_device not in G.nodes:
-                # LOGGER.debug(
-                #     f"[CHAFI-TOPOLOGY] Skipping link {link['name']}: src {src_device} not in graph")
-                continue
-            if dst_device not in G.nodes:
-                # LOGGER.debug(
-                #     f"[CHAFI-TOPOLOGY] Skipping link {link['name']}: dst {dst_device} not in graph")
-                continue
 
-            # Determine transport_type (similar to otn_type check in rsa_project)
-            src_transport = endpoints[0].get('transport_type')
-            dst_transport = endpoints[1].get('transport_type')
+def _edge_ports(attr: Dict, u: str, v: str) -> Optional[Tuple[str, str, str, str]]:
+    """
+    (out_port, in_port, out_index, in_index) of an edge traversed from u to v.
 
-            if src_transport == dst_transport:
-                transport_type = src_transport
-            else:
-                transport_type = "MIXED"
-                LOGGER.warning(
-                    f"[CHAFI-TOPOLOGY] Transport type mismatch on link {link['name']}: {src_transport} vs {dst_transport}")
-
-            # Add edge with all attributes (mirrors rsa_project/topology.py)
-            G.add_edge(
-                src_device,
-                dst_device,
-                key=link['link_uuid'],
-                name=link['name'],
-                transport_type=transport_type,
-                original_src=src_device,
-                original_dst=dst_device,
-                src_port=endpoints[0].get('endpoint_name'),
-                dst_port=endpoints[1].get('endpoint_name'),
-                src_index=endpoints[0].get('endpoint_index'),
-                dst_index=endpoints[1].get('endpoint_index'),
-                used=link.get('used', False),
-                capacity=100  # Default capacity
-            )
-
-        # LOGGER.info(f"[CHAFI-TOPOLOGY] Graph edges: {G.number_of_edges()}")
-
-    finally:
-        ctx_client.close()
+    Returns:
+        tuple, or None if the edge's link does not join u and v in either direction
+    """
+    src_ep, dst_ep = attr['link'].endpoints[:2]
+    if src_ep.device_name == u and dst_ep.device_name == v:
+        return src_ep.name, dst_ep.name, src_ep.endpoint_index, dst_ep.endpoint_index
+    if src_ep.device_name == v and dst_ep.device_name == u:
+        return dst_ep.name, src_ep.name, dst_ep.endpoint_index, src_ep.endpoint_index
+    return None
 
-    return G, optical_links
+
+def is_free_link(transport_enum: TransportTypeEnum, used: bool) -> bool:
+    """[CHAFI-THESIS] True if a link can carry a new lightpath (belongs in G_free)."""
+    return transport_enum == TransportTypeEnum.OMS or not used
+
+
+def blocks_path(transport_enum: TransportTypeEnum, used: bool) -> bool:
+    """[CHAFI-THESIS] True if a link makes an expanded path invalid (used OCH/NA link)."""
+    return used and (transport_enum == TransportTypeEnum.OCH or transport_enum == TransportTypeEnum.NA)
+
+
+class GraphViews:
+    """
+    [CHAFI-THESIS] Precomputed views of a topology MultiGraph used by find_paths().
+
+    Attributes:
+        G: Full MultiGraph (FREE and USED links)
+        G_free: MultiGraph with only the links that can carry a new lightpath
+        G_simple_free: Simple Graph of G_free (unique device pairs, for Dijkstra)
+        G_simple: Simple Graph of G (unique device pairs, for all_simple_paths)
+
+    set_link_used() keeps all views consistent in O(1) per link instead of
+    rebuilding them. It changes the graphs in place, so it is only called on
+    views no other thread walks: those of a snapshot copy before it is
+    published (TopologySnapshotManager._patch()), of a BatchPlanner working
+    copy or of an RSA worker's private snapshot. Published views are only read.
+
+    Dijkstra node paths on G_simple_free are kept in a route table filled on
+    demand or by warm_routes(); it is cleared whenever G_simple_free changes.
+    A new snapshot version starts from the route table of the previous one
+    (inherit_routes()).
+    """
+
+    def __init__(self, G: nx.MultiGraph):
+        self.G = G
+        self._edge_index = {}  # link_uuid -> (u, v)
+        self._routes = {}  # (src_device, dst_device) -> node path on G_simple_free (None = no path)
+
+        self.G_free = nx.MultiGraph()
+        self.G_free.add_nodes_from(G.nodes(data=True))
+        for u, v, k, d in G.edges(keys=True, data=True):
+            self._edge_index[k] = (u, v)
+            if is_free_link(_edge_transport_enum(d), d.get('used', False)):
+                self.G_free.add_edge(u, v, key=k, **d)
+
+        self.G_simple_free = nx.Graph(self.G_free)
+        self.G_simple = nx.Graph(G)
+
+    def set_link_used(self, link_uuid: str, used: bool = True) -> bool:
+        """
+        Flip the 'used' flag of a link and update G_free/G_simple_free in place.
+
+        Returns:
+            bool: True if the link exists and its flag changed
+        """
+        edge = self._edge_index.get(link_uuid)
+        if edge is None:
+            return False
+        u, v = edge
+        attr = self.G[u][v][link_uuid]
+        was_used = attr.get('used', False)
+        if was_used == used:
+            return False
+
+        transport_enum = _edge_transport_enum(attr)
+        was_free = is_free_link(transport_enum, was_used)
+        is_free = is_free_link(transport_enum, used)
+        attr['used'] = used
+
+        if was_free and not is_free:
+            self.G_free.remove_edge(u, v, key=link_uuid)
+            if not self.G_free.has_edge(u, v):
+                self.G_simple_free.remove_edge(u, v)
+                self._routes.clear()
+        elif not was_free and is_free:
+            self.G_free.add_edge(u, v, key=link_uuid, **attr)
+            if not self.G_simple_free.has_edge(u, v):
+                self.G_simple_free.add_edge(u, v, **attr)
+                self._routes.clear()
+        elif self.G_free.has_edge(u, v, key=link_uuid):
+            # Shared OMS link: stays free, only its flag changes
+            self.G_free[u][v][link_uuid]['used'] = used
+
+        return True
+
+    def inherit_routes(self, other: 'GraphViews') -> None:
+        """Start from the route table of views over the same graph (before set_link_used() on these)."""
+        self._routes = dict(other._routes)
+
+    def shortest_node_path(self, src_device: str, dst_device: str) -> List[str]:
+        """
+        Dijkstra node path on G_simple_free, from the route table when present.
+
+        Raises:
+            nx.NetworkXNoPath: If the devices are not connected by FREE links
+        """
+        key = (src_device, dst_device)
+        if key in self._routes:
+            node_path = self._routes[key]
+        else:
+            try:
+                node_path = nx.shortest_path(self.G_simple_free, source=src_device, target=dst_device)
+            except nx.NetworkXNoPath:
+                node_path = None
+            self._routes[key] = node_path
+        if node_path is None:
+            raise nx.NetworkXNoPath(f"No FREE path between {src_device} and {dst_device}")
+        # Copy: expanded paths keep a reference to it and end up in db_flows
+        return list(node_path)
+
+    def warm_routes(self, max_pairs: int = ROUTE_WARMUP_MAX_PAIRS) -> int:
+        """
+        Fill the route table for ordered transponder pairs (at most max_pairs).
+
+        Returns:
+            int: Number of routes in the table
+        """
+        transponders = [n for n, a in self.G_simple_free.nodes(data=True) if a.get('category') == 'TRANSPONDER']
+        pairs = 0
+        for src_device in transponders:
+            for dst_device in transponders:
+                if src_device == dst_device:
+                    continue
+                if pairs >= max_pairs:
+                    return len(self._routes)
+                pairs += 1
+                try:
+                    self.shortest_node_path(src_device, dst_device)
+                except nx.NetworkXNoPath:
+                    pass
+        return len(self._routes)
+
+    def route_count(self) -> int:
+        """Number of (src, dst) entries in the route table."""
+        return len(self._routes)
 
 
 # =============================================================================
@@ -428,7 +626,9 @@ def build_graph(directed: bool = False, optical_devices: List[Any] = None, optic
 # and thesis/rsa_project/helpers.py:TopologyHelper.expand_path()
 # =============================================================================
 
-def find_paths(src_device: str, src_index: str, dst_device: str, dst_index: str, G: nx.MultiGraph = None, additional_hops: int = 0) -> Dict:
+def find_paths(src_device: str, src_index: str, dst_device: str, dst_index: str, G: nx.MultiGraph = None, additional_hops: int = 0,
+               views: Optional[GraphViews] = None, k_paths: Optional[int] = None,
+               time_budget_sec: Optional[float] = None) -> Dict:
     """
     [CHAFI-THESIS] Find all paths between source and destination devices.
 
@@ -442,11 +642,15 @@ def find_paths(src_device: str, src_index: str, dst_device: str, dst_index: str,
         dst_index: Destination endpoint index (e.g., 'TP2_11', can be None to allow any)
         G: Optional pre-built graph. If None, builds a new graph.
         additional_hops: Allowed additional hops beyond dijkstra shortest path (0 = use default)
+        views: Optional precomputed GraphViews of G (e.g. from the topology snapshot).
+               If None, the views are built for this call.
+        k_paths: Max node sequences tried for all_paths (None = DEFAULT_K_PATHS)
+        time_budget_sec: Wall-clock budget for all_paths (None = DEFAULT_PATH_SEARCH_BUDGET_SEC)
 
     Returns:
         Dictionary with:
         - dijkstra: List of shortest paths (FREE links only)
-        - all_paths: List of all simple paths with parallel link combinations
+        - all_paths: Up to k valid paths (one per node sequence), shortest first
     """
     DEFAULT_ADDITIONAL_HOPS = 1
     shortest_path_hops = None  # set after dijkstra succeeds
@@ -458,7 +662,9 @@ def find_paths(src_device: str, src_index: str, dst_device: str, dst_index: str,
     #     f"[CHAFI-TOPOLOGY] Finding paths: {src_device}:{src_index} -> {dst_device}:{dst_index}")
 
     # Build graph if not provided
-    if G is None:
+    if views is not None:
+        G = views.G
+    elif G is None:
         G, _ = build_graph(directed=False)
 
     # LOGGER.debug(
@@ -483,37 +689,17 @@ def find_paths(src_device: str, src_index: str, dst_device: str, dst_index: str,
 
     # --- 1. Dijkstra Shortest Path (FREE links only) ---
     # OCH links MUST be FREE (cannot be shared), OMS links can be shared
-    LOGGER.info("[CHAFI-CRASH-DEBUG] find_paths: building G_free for dijkstra")
-    t_dijkstra_start = time.time()
-    G_free = nx.MultiGraph()
-    G_free.add_nodes_from(G.nodes(data=True))
-
-    for u, v, k, d in G.edges(keys=True, data=True):
-        transport = d.get('transport_type', '')
-        used = d.get('used', False)
-
-        # Use get_standardized_transport_type from common/Constants.py
-        standardized = get_standardized_transport_type(transport)
-
-        if standardized == 'OCH' and not used:
-            G_free.add_edge(u, v, key=k, **d)
-        # OMS links can be shared unless they are FULL
-        elif standardized == 'OMS':
-            G_free.add_edge(u, v, key=k, **d)
-        # MIXED or other types - add if FREE
-        elif not used:
-            G_free.add_edge(u, v, key=k, **d)
-
-    # LOGGER.debug(f"[CHAFI-TOPOLOGY] G_free: {G_free.number_of_edges()} edges")
-
-    # Convert to simple graph for Dijkstra (unique device pairs)
-    G_simple_free = nx.Graph(G_free)
+    t_dijkstra_start = time.perf_counter()
+    if views is None:
+        LOGGER.info("[CHAFI-CRASH-DEBUG] find_paths: building graph views for dijkstra")
+        views = GraphViews(G)
+    G_free = views.G_free
+    G_simple_free = views.G_simple_free
     LOGGER.info("[CHAFI-CRASH-DEBUG] find_paths: G_free={} edges, G_simple_free={} edges | running dijkstra".format(
         G_free.number_of_edges(), G_simple_free.number_of_edges()))
 
     try:
-        dijkstra_node_path = nx.shortest_path(
-            G_simple_free, source=src_device, target=dst_device)
+        dijkstra_node_path = views.shortest_node_path(src_device, dst_device)
         # [CHAFI-THESIS] Store dijkstra hop count for dynamic cutoff
         shortest_path_hops = len(dijkstra_node_path) - 1
         # LOGGER.info(f"[CHAFI-TOPOLOGY] Dijkstra path: {dijkstra_node_path}")
@@ -534,13 +720,13 @@ def find_paths(src_device: str, src_index: str, dst_device: str, dst_index: str,
     except nx.NetworkXNoPath:
         pass  # No Dijkstra path on FREE graph
 
-    t_dijkstra_end = time.time()
+    t_dijkstra_end = time.perf_counter()
     LOGGER.info("[CHAFI-CRASH-DEBUG] find_paths: dijkstra DONE in {:.4f}s | found {} paths".format(
         t_dijkstra_end - t_dijkstra_start, len(paths_result['dijkstra'])))
 
     # --- 2. All Simple Paths (Include USED) ---
     # [CHAFI-THESIS] Dynamic cutoff: dijkstra hops + allowed additional hops
-    t_allpaths_start = time.time()
+    t_allpaths_start = time.perf_counter()
 
     if shortest_path_hops is not None:
         effective_additional_hops = additional_hops if additional_hops > 0 else DEFAULT_ADDITIONAL_HOPS
@@ -548,33 +734,19 @@ def find_paths(src_device: str, src_index: str, dst_device: str, dst_index: str,
         LOGGER.info("[CHAFI-CRASH-DEBUG] Dynamic cutoff: dijkstra_hops={} + additional={} = {}".format(
             shortest_path_hops, effective_additional_hops, HIGHEST_HOP))
 
-        G_simple = nx.Graph(G)
+        G_simple = views.G_simple
         LOGGER.info("[CHAFI-CRASH-DEBUG] find_paths: all_paths START | G has {} edges, G_simple has {} edges".format(
             G.number_of_edges(), G_simple.number_of_edges()))
 
-        try:
-            simple_node_paths = list(nx.all_simple_paths(
-                G_simple, source=src_device, target=dst_device, cutoff=HIGHEST_HOP))
-            LOGGER.info("[CHAFI-CRASH-DEBUG] find_paths: found {} node sequences".format(
-                len(simple_node_paths)))
-
-            total_edge_paths = 0
-            for i, node_path in enumerate(simple_node_paths):
-                # LOGGER.info("[CHAFI-CRASH-DEBUG] find_paths: expanding node_path {}/{} = {} | total_valid_so_far={}".format(
-                #     i+1, len(simple_node_paths), node_path, total_edge_paths))
-                first_valid = expand_path_first_valid(node_path, G, None, None)
-                if first_valid:
-                    paths_result['all_paths'].append(first_valid)
-                    total_edge_paths += 1
-                LOGGER.info("[CHAFI-CRASH-DEBUG] find_paths: node_path {}/{} result={}".format(
-                    i+1, len(simple_node_paths), "VALID" if first_valid else "no valid path"))
-
-        except nx.NetworkXNoPath:
-            pass  # No simple paths found
+        # [CHAFI-THESIS] Lazy k-shortest search instead of materializing all_simple_paths:
+        # memory and time stay bounded by k_paths / time_budget_sec on dense topologies
+        paths_result['all_paths'] = list(iter_k_shortest_paths(
+            views, src_device, dst_device, k=k_paths, max_hops=HIGHEST_HOP,
+            time_budget_sec=time_budget_sec))
     else:
         LOGGER.info("[CHAFI-CRASH-DEBUG] find_paths: skipping all_paths (no dijkstra path found)")
 
-    t_allpaths_end = time.time()
+    t_allpaths_end = time.perf_counter()
     LOGGER.info("[CHAFI-CRASH-DEBUG] find_paths: all_paths DONE in {:.4f}s | total_valid={}".format(
         t_allpaths_end - t_allpaths_start, len(paths_result['all_paths'])))
 
@@ -583,10 +755,61 @@ def find_paths(src_device: str, src_index: str, dst_device: str, dst_index: str,
         'dijkstra_sec': t_dijkstra_end - t_dijkstra_start,
         'all_paths_sec': t_allpaths_end - t_allpaths_start,
     }
+    observe_phase('dijkstra', paths_result['timing']['dijkstra_sec'])
+    observe_phase('all_paths', paths_result['timing']['all_paths_sec'])
 
     return paths_result
 
 
+def iter_k_shortest_paths(views: GraphViews, src_device: str, dst_device: str, k: Optional[int] = None,
+                          max_hops: Optional[int] = None, time_budget_sec: Optional[float] = None,
+                          src_index: str = None, dst_index: str = None) -> Iterator[Dict]:
+    """
+    [CHAFI-THESIS] Lazily yield valid edge paths in hop-count order (Yen's k-shortest paths).
+
+    Node sequences come from nx.shortest_simple_paths() on views.G_simple and are
+    expanded with expand_path_first_valid() on views.G (one valid path per node
+    sequence, see Plan A). Nothing is computed ahead of the caller, so it can stop
+    at the first path that passes RSA.
+
+    Args:
+        views: GraphViews of the topology
+        src_device: Source device name
+        dst_device: Destination device name
+        k: Max node sequences to try (None = DEFAULT_K_PATHS)
+        max_hops: Stop at node sequences longer than this (None = no cutoff)
+        time_budget_sec: Stop after this many seconds (None = DEFAULT_PATH_SEARCH_BUDGET_SEC)
+        src_index: Source endpoint index constraint (can be None to skip)
+        dst_index: Destination endpoint index constraint (can be None to skip)
+
+    Yields:
+        Path dicts with 'links', 'is_valid', 'node_path', 'hops'
+    """
+    k = DEFAULT_K_PATHS if k is None else k
+    time_budget_sec = DEFAULT_PATH_SEARCH_BUDGET_SEC if time_budget_sec is None else time_budget_sec
+    deadline = time.perf_counter() + time_budget_sec
+
+    tried = 0
+    try:
+        for node_path in nx.shortest_simple_paths(views.G_simple, source=src_device, target=dst_device):
+            if max_hops is not None and len(node_path) - 1 > max_hops:
+                break  # sequences come shortest first: nothing shorter is left
+            tried += 1
+            first_valid = expand_path_first_valid(node_path, views.G, src_index, dst_index)
+            LOGGER.debug("[CHAFI-TOPOLOGY] k-shortest: node_path {} {} result={}".format(
+                tried, node_path, "VALID" if first_valid else "no valid path"))
+            if first_valid:
+                yield first_valid
+            if tried >= k:
+                break
+            if time.perf_counter() > deadline:
+                LOGGER.warning("[CHAFI-TOPOLOGY] k-shortest: time budget {:.2f}s exhausted after {} node sequences".format(
+                    time_budget_sec, tried))
+                break
+    except (nx.NetworkXNoPath, nx.NodeNotFound):
+        return
+
+
 def expand_path(node_path: List[str], graph_to_use: nx.MultiGraph, src_index: str, dst_index: str) -> List[Dict]:
     """
     [CHAFI-THESIS] Converts a node path (list of device names) into detailed link paths.
@@ -604,6 +827,7 @@ def expand_path(node_path: List[str], graph_to_use: nx.MultiGraph, src_index: st
         List of path dictionaries, each with 'links' and 'is_valid' keys
     """
     valid_edge_paths = []
+    blocking_links = [0]  # number of blocking links in current_edge_path
 
     def backtrack(index, current_edge_path):
         if index == len(node_path) - 1:
@@ -611,24 +835,10 @@ def expand_path(node_path: List[str], graph_to_use: nx.MultiGraph, src_index: st
             # Path Validity Logic (mirrors rsa_project):
             # - OCH links MUST be FREE (they cannot be shared)
             # - OMS links can be shared unless FULL
-            is_valid = True
-            for link in current_edge_path:
-                transport = link.get('transport_type', '')
-                used = link.get('used', False)
-
-                standardized = get_standardized_transport_type(transport)
-
-                # [CHAFI-DEBUG] Log transport type for debugging
-                # LOGGER.debug(
-                #     f"[CHAFI-TOPOLOGY: expand_path] Link {link.get('name')} | Type: {transport} -> {standardized} | Used: {used}")
-
-                # OCH links must be FREE. Treat NA (unknown) as OCH for safety.
-                # Compare against Enum members, not strings
-                if (standardized == TransportTypeEnum.OCH or standardized == TransportTypeEnum.NA) and used:
-                    is_valid = False
-                    break
-                # For OMS, we'd check for FULL status, but we only have 'used'
-                # OMS can be shared, so 'used' doesn't invalidate the path
+            # OCH links must be FREE. Treat NA (unknown) as OCH for safety.
+            # For OMS, we'd check for FULL status, but we only have 'used'
+            # OMS can be shared, so 'used' doesn't invalidate the path
+            is_valid = blocking_links[0] == 0
 
             valid_edge_paths.append({
                 'links': list(current_edge_path),
@@ -651,23 +861,12 @@ def expand_path(node_path: List[str], graph_to_use: nx.MultiGraph, src_index: st
 
         for key, attr in edges.items():
             # Determine ports based on direction (mirrors rsa_project)
-            original_src = attr.get('original_src')
-            original_dst = attr.get('original_dst')
-
-            if original_src == u and original_dst == v:
-                out_port = attr.get('src_port')
-                in_port = attr.get('dst_port')
-                out_idx = attr.get('src_index')
-                in_idx = attr.get('dst_index')
-            elif original_src == v and original_dst == u:
-                out_port = attr.get('dst_port')
-                in_port = attr.get('src_port')
-                out_idx = attr.get('dst_index')
-                in_idx = attr.get('src_index')
-            else:
+            ports = _edge_ports(attr, u, v)
+            if ports is None:
                 # LOGGER.debug(
                 #     f"[CHAFI-TOPOLOGY] expand_path: Edge {key} direction mismatch")
                 continue
+            out_port, in_port, out_idx, in_idx = ports
 
             # Check endpoint index constraints (exact match)
             # First hop: must match src_index if specified
@@ -683,13 +882,15 @@ def expand_path(node_path: List[str], graph_to_use: nx.MultiGraph, src_index: st
                 continue
 
             # Add link to current path
+            blocking = blocks_path(_edge_transport_enum(attr), attr.get('used', False))
+            blocking_links[0] += blocking
             current_edge_path.append({
                 'id': str(key),
                 'src': u,
                 'dst': v,
                 'src_port': out_port,
                 'dst_port': in_port,
-                'name': attr.get('name'),
+                'name': attr['link'].name,
                 'transport_type': attr.get('transport_type'),
                 'used': attr.get('used', False),
                 'status': 'USED' if attr.get('used', False) else 'FREE'
@@ -697,6 +898,7 @@ def expand_path(node_path: List[str], graph_to_use: nx.MultiGraph, src_index: st
 
             backtrack(index + 1, current_edge_path)
             current_edge_path.pop()
+            blocking_links[0] -= blocking
 
     backtrack(0, [])
     return valid_edge_paths
@@ -724,22 +926,13 @@ def expand_path_first_valid(node_path: List[str], graph_to_use: nx.MultiGraph, s
             return
 
         if index == len(node_path) - 1:
-            is_valid = True
-            for link in current_edge_path:
-                transport = link.get('transport_type', '')
-                used = link.get('used', False)
-                standardized = get_standardized_transport_type(transport)
-                if (standardized == TransportTypeEnum.OCH or standardized == TransportTypeEnum.NA) and used:
-                    is_valid = False
-                    break
-
-            if is_valid:
-                result[0] = {
-                    'links': list(current_edge_path),
-                    'is_valid': True,
-                    'node_path': node_path,
-                    'hops': len(current_edge_path)
-                }
+            # Blocking links are pruned below, so every complete path is valid
+            result[0] = {
+                'links': list(current_edge_path),
+                'is_valid': True,
+                'node_path': node_path,
+                'hops': len(current_edge_path)
+            }
             return
 
         u = node_path[index]
@@ -754,21 +947,10 @@ def expand_path_first_valid(node_path: List[str], graph_to_use: nx.MultiGraph, s
             if result[0] is not None:
                 return
 
-            original_src = attr.get('original_src')
-            original_dst = attr.get('original_dst')
-
-            if original_src == u and original_dst == v:
-                out_port = attr.get('src_port')
-                in_port = attr.get('dst_port')
-                out_idx = attr.get('src_index')
-                in_idx = attr.get('dst_index')
-            elif original_src == v and original_dst == u:
-                out_port = attr.get('dst_port')
-                in_port = attr.get('src_port')
-                out_idx = attr.get('dst_index')
-                in_idx = attr.get('src_index')
-            else:
+            ports = _edge_ports(attr, u, v)
+            if ports is None:
                 continue
+            out_port, in_port, out_idx, in_idx = ports
 
             if index == 0 and src_index and out_idx != src_index:
                 continue
@@ -776,13 +958,17 @@ def expand_path_first_valid(node_path: List[str], graph_to_use: nx.MultiGraph, s
             if index == len(node_path) - 2 and dst_index and in_idx != dst_index:
                 continue
 
+            # A used OCH/NA link invalidates every path through it: prune it here
+            if blocks_path(_edge_transport_enum(attr), attr.get('used', False)):
+                continue
+
             current_edge_path.append({
                 'id': str(key),
                 'src': u,
                 'dst': v,
                 'src_port': out_port,
                 'dst_port': in_port,
-                'name': attr.get('name'),
+                'name': attr['link'].name,
                 'transport_type': attr.get('transport_type'),
                 'used': attr.get('used', False),
                 'status': 'USED' if attr.get('used', False) else 'FREE'
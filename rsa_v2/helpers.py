@@ -4,6 +4,7 @@ import networkx as nx
 from enums.OpticalBands import FreqeuncyRanges, Bands, Lambdas, FrequencyMeasurementUnit
 from enums.ITUStandards import ITUStandards
 from enums.Device import Constants
+from spectrum_tools import FreeSpectrum
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -1066,32 +1067,21 @@ class TopologyHelper:
 
         reference_bitmap, reference_slots, trace_steps, band_info, endpoints = result
 
-        # Step 2: Discover all valid contiguous slot blocks
-        available_blocks = []
-        current_run = 0
-
-        for i in range(reference_slots):
-            is_free = (reference_bitmap >> i) & 1
-
-            if is_free:
-                current_run += 1
-                if current_run >= num_slots:
-                    available_blocks.append(i - num_slots + 1)
-            else:
-                current_run = 0
+        # Step 2: Discover all valid contiguous slot blocks (shift-AND, no per-slot loop)
+        spectrum = FreeSpectrum(reference_bitmap, reference_slots, num_slots)
 
         # Step 3: Selection Phase based on strategy
         start_bit = -1
         # logger.info(
         #     f"[Strategy: spectrum assignment] {strategy}")
-        if available_blocks:
+        if spectrum:
             if strategy == 'last-fit':
-                start_bit = available_blocks[-1]
+                start_bit = spectrum.last_start()
             elif strategy == 'random':
                 import random
-                start_bit = random.choice(available_blocks)
+                start_bit = random.choice(spectrum.start_positions())
             else:  # default to first-fit
-                start_bit = available_blocks[0]
+                start_bit = spectrum.first_start()
 
         if start_bit != -1:
             mask = ((1 << num_slots) - 1) << start_bit
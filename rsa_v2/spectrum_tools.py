@@ -0,0 +1,138 @@
+"""
+Spectrum bitmap tools for the rsa_v2 engine.
+
+Copy of parallelopticalcontroller/common/SpectrumTools.py (keep both in sync).
+Bitmaps are ints with LSB = lowest frequency slot and bit = 1 for a free
+slot; feasible_starts() finds every start of num_slots contiguous free slots
+with O(log2(num_slots)) shift-ANDs and free_blocks() lists the free blocks
+with their sizes, so perform_rsa() never scans the bitmap slot by slot in
+Python.
+"""
+
+import re
+from typing import List, Tuple
+
+_FREE_RUN = re.compile('1+')
+
+
+def range_mask(start: int, num_slots: int) -> int:
+    """Mask with num_slots bits set from slot start upwards."""
+    if num_slots <= 0:
+        return 0
+    return ((1 << num_slots) - 1) << start
+
+
+def lowest_set_bit(value: int) -> int:
+    """Index of the lowest set bit of value (-1 if value is 0)."""
+    return (value & -value).bit_length() - 1
+
+
+def feasible_starts(bitmap: int, width: int, num_slots: int) -> int:
+    """
+    Start positions of num_slots contiguous free slots, as a mask.
+
+    Bit i of the result is set iff slots i .. i + num_slots - 1 are all free.
+    Each step ANDs the runs found so far with themselves shifted by the run
+    length already covered, doubling it, so O(log2(num_slots)) big-int
+    operations replace the slot-by-slot scan.
+
+    Args:
+        bitmap: Slot bitmap (1 = free, LSB = slot 0)
+        width: Number of slots (bits above width are ignored)
+        num_slots: Contiguous slots required
+
+    Returns:
+        int: Mask of feasible start slots (0 if the demand does not fit)
+    """
+    if num_slots <= 0 or num_slots > width:
+        return 0
+    starts = bitmap & range_mask(0, width)
+    covered = 1
+    while starts and covered * 2 <= num_slots:
+        starts &= starts >> covered
+        covered *= 2
+    if starts and covered < num_slots:
+        starts &= starts >> (num_slots - covered)
+    return starts
+
+
+def set_bit_positions(value: int) -> List[int]:
+    """Indexes of the set bits of value, in increasing order."""
+    positions = []
+    for start, length in free_blocks(value, value.bit_length()):
+        positions.extend(range(start, start + length))
+    return positions
+
+
+def free_blocks(bitmap: int, width: int) -> List[Tuple[int, int]]:
+    """
+    Maximal runs of free slots of a bitmap.
+
+    Args:
+        bitmap: Slot bitmap (1 = free, LSB = slot 0)
+        width: Number of slots (bits above width are ignored)
+
+    Returns:
+        list: (start_slot, length) per free block, in increasing slot order
+    """
+    # Reversed binary digits: string index = slot index
+    digits = format(bitmap & range_mask(0, width), 'b')[::-1]
+    return [(run.start(), run.end() - run.start()) for run in _FREE_RUN.finditer(digits)]
+
+
+def fitting_blocks(blocks: List[Tuple[int, int]], num_slots: int) -> List[Tuple[int, int]]:
+    """Free blocks with at least num_slots slots (order preserved)."""
+    return [block for block in blocks if block[1] >= num_slots]
+
+
+class FreeSpectrum:
+    """
+    Free spectrum of a bitmap for a demand of num_slots contiguous slots.
+
+    The feasible start mask is computed up front (a few shift-ANDs); the
+    block list is only built if a caller asks for it.
+
+    Attributes:
+        width: Number of slots of the bitmap
+        num_slots: Contiguous slots required
+        starts: Mask of feasible start slots (see feasible_starts())
+    """
+
+    def __init__(self, bitmap: int, width: int, num_slots: int):
+        self._bitmap = bitmap & range_mask(0, width)
+        self.width = width
+        self.num_slots = num_slots
+        self.starts = feasible_starts(self._bitmap, width, num_slots)
+        self._blocks = None
+
+    def __bool__(self):
+        return self.starts != 0
+
+    @property
+    def blocks(self) -> List[Tuple[int, int]]:
+        """All maximal free blocks as (start_slot, length)."""
+        if self._blocks is None:
+            self._blocks = free_blocks(self._bitmap, self.width)
+        return self._blocks
+
+    def fitting_blocks(self) -> List[Tuple[int, int]]:
+        """Free blocks with at least num_slots slots (from the runs of feasible starts)."""
+        # A run of k feasible starts from s is a free block of k + num_slots - 1 slots from s
+        return [(start, length + self.num_slots - 1) for start, length in free_blocks(self.starts, self.width)]
+
+    def first_start(self) -> int:
+        """Lowest feasible start slot (-1 if none)."""
+        return lowest_set_bit(self.starts)
+
+    def last_start(self) -> int:
+        """Highest feasible start slot (-1 if none)."""
+        return self.starts.bit_length() - 1
+
+    def first_start_within(self, low: int, high: int) -> int:
+        """Lowest start slot whose whole window lies in [low, high) (-1 if none)."""
+        low = max(low, 0)
+        return lowest_set_bit(self.starts & range_mask(low, high - low - self.num_slots + 1))
+
+    def start_positions(self) -> List[int]:
+        """Every feasible start slot, in increasing order."""
+        return set_bit_positions(self.starts)